@@ -6,11 +6,7 @@ from typing import List, Optional, Dict, Any
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-try:
-    from ultralytics import YOLO
-except ImportError:
-    logger.error("ultralytics not found. Please install it using `pip install ultralytics`")
-    YOLO = None
+from models.model_registry import model_registry
 
 try:
     import face_recognition
@@ -36,14 +32,7 @@ class CCTVSystem:
             self._load_known_faces(known_faces_dir)
 
     def _load_yolo_model(self, model_path: str):
-        if YOLO:
-            try:
-                logger.info(f"Loading YOLO model from {model_path}...")
-                return YOLO(model_path)
-            except Exception as e:
-                logger.error(f"Failed to load YOLO model: {e}")
-                return None
-        return None
+        return model_registry.get(model_path)
 
     def _load_known_faces(self, known_faces_dir: str):
         """Loads known face encodings from a directory."""
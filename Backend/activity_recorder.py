@@ -0,0 +1,273 @@
+"""
+Activity Recorder - Sampled, bulk-inserted movement positions with per-minute grid rollups
+"""
+import datetime
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import config
+from database import engine, ActivityLog, ActivityRollup, PersonTypeEnum, ZoneEnum
+from sqlalchemy import bindparam, delete, func, insert, literal, select, update
+
+logger = logging.getLogger(__name__)
+
+# (track_id, person_type, x, y) with x, y the foot point of the box
+Sample = Tuple[int, str, int, int]
+
+
+class ActivitySampler:
+    """
+    Thins one camera's per-frame detections down to one position per track
+    every `interval` seconds.
+    """
+
+    def __init__(self, interval: float = config.ACTIVITY_SAMPLE_INTERVAL):
+        self.interval = interval
+        self._last_sampled: Dict[int, float] = {}
+
+    def sample(self, detections: List[Dict[str, Any]], now: Optional[float] = None) -> List[Sample]:
+        now = time.monotonic() if now is None else now
+        samples = []
+        seen = set()
+        for det in detections:
+            track_id = det.get('track_id')
+            if track_id is None:
+                continue
+            seen.add(track_id)
+            last = self._last_sampled.get(track_id)
+            if last is not None and now - last < self.interval:
+                continue
+            self._last_sampled[track_id] = now
+            x1, _, x2, y2 = det['bbox']
+            person_type = det.get('person_type') or det.get('type') or 'unknown'
+            samples.append((track_id, person_type, int((x1 + x2) / 2), int(y2)))
+
+        # Forget tracks that left the frame
+        for track_id in self._last_sampled.keys() - seen:
+            del self._last_sampled[track_id]
+        return samples
+
+
+def _person_type(value: str) -> PersonTypeEnum:
+    try:
+        return PersonTypeEnum(value)
+    except ValueError:
+        return PersonTypeEnum.UNKNOWN
+
+
+def _floor_minute(moment: datetime.datetime) -> datetime.datetime:
+    return moment.replace(second=0, microsecond=0)
+
+
+_SET_MINUTE = (
+    update(ActivityLog)
+    .where(ActivityLog.id == bindparam('row_id'))
+    .values(minute=bindparam('row_minute'))
+)
+
+
+class ActivityRecorder:
+    """
+    Buffers sampled positions and writes them from a background thread.
+
+    Positions are inserted with one executemany per batch; a batch that
+    fails to insert goes back to the front of the buffer. Every
+    rollup_interval the thread aggregates the raw positions inserted since
+    the last run, by their minute bucket, into ActivityRollup with a single
+    INSERT ... SELECT ... GROUP BY, then deletes raw rows that are both
+    rolled up and older than the retention window. The watermark is the
+    highest raw row ID rolled up, so positions that are written late still
+    get rolled up, as an extra row for their minute. add_samples() is safe
+    to call from any thread.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = config.ACTIVITY_BATCH_SIZE,
+        flush_interval: float = config.ACTIVITY_FLUSH_INTERVAL,
+        buffer_size: int = config.ACTIVITY_BUFFER_SIZE,
+        rollup_interval: float = config.ACTIVITY_ROLLUP_INTERVAL,
+        grid_size: int = config.ACTIVITY_GRID_SIZE,
+        retention_hours: float = config.ACTIVITY_RAW_RETENTION_HOURS
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffer_size = buffer_size
+        self.rollup_interval = rollup_interval
+        self.grid_size = grid_size
+        self.retention = datetime.timedelta(hours=retention_hours)
+
+        self._buffer: Deque[Dict[str, Any]] = deque()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._running = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._rolled_id: Optional[int] = None
+
+        self.written = 0
+        self.dropped = 0
+        self.rolled_up = 0
+        self.pruned = 0
+        self.last_flush_ms = 0.0
+        self.last_rollup_ms = 0.0
+
+    def add_samples(self, camera: str, zone: Optional[str], samples: List[Sample],
+                    timestamp: Optional[datetime.datetime] = None):
+        """Buffer one camera's sampled positions."""
+        if not samples:
+            return
+        timestamp = timestamp or datetime.datetime.utcnow()
+        minute = _floor_minute(timestamp)
+        zone_value = ZoneEnum(zone) if zone else None
+        rows = [
+            {
+                'timestamp': timestamp, 'minute': minute, 'camera': camera, 'zone': zone_value,
+                'person_type': _person_type(person_type), 'x': x, 'y': y,
+                'track_id': track_id, 'activity_type': 'movement'
+            }
+            for track_id, person_type, x, y in samples
+        ]
+        with self._lock:
+            room = self.buffer_size - len(self._buffer)
+            if room < len(rows):
+                self.dropped += len(rows) - max(room, 0)
+                rows = rows[:max(room, 0)]
+            self._buffer.extend(rows)
+            pending = len(self._buffer)
+        if pending >= self.batch_size:
+            self._wake.set()
+
+    def start(self):
+        self._rolled_id = self._load_watermark()
+        self._backfill_minutes()
+        self._running.set()
+        self._thread = threading.Thread(target=self._run, name="activity-recorder", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the thread and write whatever is still buffered."""
+        self._running.clear()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Could not write {len(self._buffer)} buffered positions: {e}")
+
+    def _run(self):
+        next_rollup = time.monotonic() + self.rollup_interval
+        while self._running.is_set():
+            self._wake.wait(timeout=self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+                if time.monotonic() >= next_rollup:
+                    self.rollup()
+                    self.prune()
+                    next_rollup = time.monotonic() + self.rollup_interval
+            except Exception as e:
+                logger.error(f"Activity recorder error: {e}")
+
+    def flush(self):
+        """Insert everything buffered, batch_size rows per statement."""
+        while True:
+            with self._lock:
+                if not self._buffer:
+                    return
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+            start = time.perf_counter()
+            try:
+                with engine.begin() as conn:
+                    conn.execute(insert(ActivityLog), batch)
+            except Exception:
+                # Keep the batch, in order, for the next flush
+                with self._lock:
+                    self._buffer.extendleft(reversed(batch))
+                raise
+            self.last_flush_ms = (time.perf_counter() - start) * 1000
+            self.written += len(batch)
+
+    def _load_watermark(self) -> Optional[int]:
+        """Highest raw row ID rolled up, None if nothing was rolled up yet."""
+        with engine.connect() as conn:
+            rolled_id = conn.execute(select(func.max(ActivityRollup.last_log_id))).scalar()
+            if rolled_id is not None:
+                return rolled_id
+            # Rollups written before last_log_id existed covered whole minutes
+            newest = conn.execute(select(func.max(ActivityRollup.minute))).scalar()
+            if newest is None:
+                return None
+            return conn.execute(
+                select(func.max(ActivityLog.id))
+                .where(ActivityLog.timestamp < newest + datetime.timedelta(minutes=1))
+            ).scalar()
+
+    def _backfill_minutes(self):
+        """Set the minute bucket of positions written before the column existed and not yet rolled up."""
+        query = select(ActivityLog.id, ActivityLog.timestamp).where(ActivityLog.minute.is_(None))
+        if self._rolled_id is not None:
+            query = query.where(ActivityLog.id > self._rolled_id)
+        with engine.begin() as conn:
+            rows = [
+                {'row_id': row_id, 'row_minute': _floor_minute(timestamp)}
+                for row_id, timestamp in conn.execute(query) if timestamp is not None
+            ]
+            if rows:
+                conn.execute(_SET_MINUTE, rows)
+                logger.info(f"Set the minute bucket of {len(rows)} activity positions")
+
+    def rollup(self):
+        """Aggregate the raw positions inserted since the last rollup."""
+        with engine.connect() as conn:
+            last_id = conn.execute(select(func.max(ActivityLog.id))).scalar()
+        if last_id is None or (self._rolled_id is not None and last_id <= self._rolled_id):
+            return
+
+        cell_x = ActivityLog.x // self.grid_size
+        cell_y = ActivityLog.y // self.grid_size
+        query = select(
+            ActivityLog.minute, ActivityLog.camera, ActivityLog.zone, ActivityLog.person_type,
+            cell_x, cell_y, func.count(), literal(last_id)
+        ).where(ActivityLog.id <= last_id)
+        if self._rolled_id is not None:
+            query = query.where(ActivityLog.id > self._rolled_id)
+        query = query.group_by(
+            ActivityLog.minute, ActivityLog.camera, ActivityLog.zone, ActivityLog.person_type, cell_x, cell_y
+        )
+
+        start = time.perf_counter()
+        with engine.begin() as conn:
+            result = conn.execute(insert(ActivityRollup).from_select(
+                ['minute', 'camera', 'zone', 'person_type', 'cell_x', 'cell_y', 'count', 'last_log_id'], query
+            ))
+        self.last_rollup_ms = (time.perf_counter() - start) * 1000
+        self.rolled_up += max(result.rowcount, 0)
+        self._rolled_id = last_id
+
+    def prune(self, now: Optional[datetime.datetime] = None):
+        """Delete raw positions past the retention window that have been rolled up."""
+        if self._rolled_id is None:
+            return
+        now = now or datetime.datetime.utcnow()
+        with engine.begin() as conn:
+            result = conn.execute(delete(ActivityLog).where(
+                ActivityLog.id <= self._rolled_id, ActivityLog.timestamp < now - self.retention
+            ))
+        self.pruned += max(result.rowcount, 0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            buffered = len(self._buffer)
+        return {
+            'buffered': buffered,
+            'written': self.written,
+            'dropped': self.dropped,
+            'rollup_rows': self.rolled_up,
+            'pruned': self.pruned,
+            'rolled_up_to_id': self._rolled_id,
+            'last_flush_ms': round(self.last_flush_ms, 2),
+            'last_rollup_ms': round(self.last_rollup_ms, 2),
+        }
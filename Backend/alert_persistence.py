@@ -0,0 +1,317 @@
+"""
+Alert Persistence - Write-behind queue that batches alerts into bulk SQLite inserts
+"""
+import asyncio
+import base64
+import datetime
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+import config
+from config import Zone, ZONE_LABELS
+from database import engine, Alert, AlertSeverityEnum, ZoneEnum
+from sqlalchemy import bindparam, func, select, tuple_, update
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+
+def _enum_or_none(enum_cls, value):
+    try:
+        return enum_cls(value)
+    except ValueError:
+        return None
+
+
+def _parse_time(value) -> Optional[datetime.datetime]:
+    if isinstance(value, str):
+        return datetime.datetime.fromisoformat(value)
+    return value
+
+
+def alert_to_row(alert: Dict[str, Any]) -> Dict[str, Any]:
+    """Map an alert dict onto the columns of the alerts table."""
+    timestamp = _parse_time(alert.get('timestamp'))
+    return {
+        'id': alert['id'],
+        'timestamp': timestamp or datetime.datetime.now(),
+        'camera': alert.get('camera'),
+        'zone': _enum_or_none(ZoneEnum, alert.get('zone_key')),
+        'scenario': alert.get('scenario'),
+        'severity': _enum_or_none(AlertSeverityEnum, alert.get('severity')),
+        'event': alert.get('event'),
+        'details': alert.get('details'),
+        'status': alert.get('status'),
+        'confidence': alert.get('confidence'),
+        'occurrences': alert.get('occurrences', 1),
+        'last_seen': _parse_time(alert.get('last_seen')),
+    }
+
+
+def incident_update_row(alert: Dict[str, Any]) -> Dict[str, Any]:
+    """Parameters for the update written when an incident changes state."""
+    return {
+        'alert_id': alert['id'],
+        'status': alert.get('status'),
+        'occurrences': alert.get('occurrences', 1),
+        'last_seen': _parse_time(alert.get('last_seen')),
+    }
+
+
+_UPDATE_INCIDENT = (
+    update(Alert)
+    .where(Alert.id == bindparam('alert_id'))
+    .values(status=bindparam('status'), occurrences=bindparam('occurrences'), last_seen=bindparam('last_seen'))
+)
+
+
+def row_to_alert(row) -> Dict[str, Any]:
+    """Rebuild the alert dict served by the API from a stored row."""
+    zone_key = row.zone.value if row.zone else None
+    return {
+        'id': row.id,
+        'timestamp': row.timestamp.isoformat() if row.timestamp else None,
+        'camera': row.camera,
+        'zone': ZONE_LABELS.get(Zone(zone_key), zone_key) if zone_key else None,
+        'zone_key': zone_key,
+        'scenario': row.scenario,
+        'event': row.event,
+        'severity': row.severity.value if row.severity else None,
+        'details': row.details,
+        'status': row.status,
+        'confidence': row.confidence,
+        'occurrences': row.occurrences or 1,
+        'last_seen': row.last_seen.isoformat() if row.last_seen else None,
+    }
+
+
+def load_recent_alerts(
+    hours: float = config.ALERT_RELOAD_HOURS,
+    limit: int = config.ALERT_STORE_CAPACITY
+) -> List[Dict[str, Any]]:
+    """Alerts from the last `hours`, at most `limit`, oldest first."""
+    since = datetime.datetime.now() - datetime.timedelta(hours=hours)
+    query = (
+        select(Alert)
+        .where(Alert.timestamp >= since)
+        .order_by(Alert.id.desc())
+        .limit(limit)
+    )
+    with engine.connect() as conn:
+        rows = conn.execute(query).all()
+    return [row_to_alert(row) for row in reversed(rows)]
+
+
+def encode_cursor(timestamp: datetime.datetime, alert_id: int) -> str:
+    """Opaque token for the (timestamp, id) position of the last alert on a page."""
+    return base64.urlsafe_b64encode(f"{timestamp.isoformat()}|{alert_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    """Inverse of encode_cursor. Raises ValueError on a malformed token."""
+    try:
+        timestamp, alert_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.datetime.fromisoformat(timestamp), int(alert_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def query_alerts(
+    db: Session,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    camera: Optional[str] = None,
+    zone: Optional[str] = None,
+    scenario: Optional[str] = None,
+    severity: Optional[str] = None,
+    status: Optional[str] = None,
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None
+):
+    """
+    One page of stored alerts, newest first.
+
+    Pages are keyed on (timestamp, id) rather than an offset, so every page
+    is an index range scan starting at the cursor and costs the same
+    however deep it is.
+
+    Returns:
+        (alerts, next_cursor); next_cursor is None on the last page.
+    Raises:
+        ValueError: On an unknown zone/severity or a malformed cursor.
+    """
+    query = select(Alert)
+    if camera is not None:
+        query = query.where(Alert.camera == camera)
+    if zone is not None:
+        query = query.where(Alert.zone == ZoneEnum(zone))
+    if scenario is not None:
+        query = query.where(Alert.scenario == scenario)
+    if severity is not None:
+        query = query.where(Alert.severity == AlertSeverityEnum(severity))
+    if status is not None:
+        query = query.where(Alert.status == status)
+    if start is not None:
+        query = query.where(Alert.timestamp >= start)
+    if end is not None:
+        query = query.where(Alert.timestamp < end)
+    if cursor:
+        query = query.where(tuple_(Alert.timestamp, Alert.id) < tuple_(*decode_cursor(cursor)))
+
+    # Fetch one extra row to know whether another page follows
+    query = query.order_by(Alert.timestamp.desc(), Alert.id.desc()).limit(limit + 1)
+    rows = db.execute(query).scalars().all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].timestamp, rows[-1].id)
+    return [row_to_alert(row) for row in rows], next_cursor
+
+
+def max_alert_id() -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.max(Alert.id))).scalar() or 0
+
+
+class AlertWriter:
+    """
+    Takes alerts off the request path and writes them in batches.
+
+    enqueue() and enqueue_update() are non-blocking and must be called on
+    the event loop thread. A background task collects up to batch_size
+    writes, or whatever has arrived once flush_interval has passed, and
+    applies them with one executemany per statement in a single transaction
+    on a dedicated writer thread. Inserts run before updates.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = config.ALERT_DB_BATCH_SIZE,
+        flush_interval: float = config.ALERT_DB_FLUSH_INTERVAL,
+        max_queue: int = config.ALERT_DB_QUEUE_SIZE
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="alert-writer")
+        self._pending: List[Tuple[str, Dict[str, Any]]] = []
+        self._collecting: List[Tuple[str, Dict[str, Any]]] = []
+
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_commit_ms = 0.0
+        self.max_commit_ms = 0.0
+        self._total_commit_ms = 0.0
+
+    def start(self):
+        """Start the flush task on the running event loop."""
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        # Alerts recorded before startup (e.g. seeding) are written first
+        for item in self._pending:
+            self._queue.put_nowait(item)
+        self._pending = []
+        self._task = asyncio.create_task(self._run())
+
+    def enqueue(self, alert: Dict[str, Any]):
+        """Queue an alert for writing; drops it if the writer is too far behind."""
+        self._put(('insert', alert_to_row(alert)))
+
+    def enqueue_update(self, alert: Dict[str, Any]):
+        """Queue the status, occurrence count and last-seen time of an already queued alert."""
+        self._put(('update', incident_update_row(alert)))
+
+    def _put(self, item: Tuple[str, Dict[str, Any]]):
+        if self._queue is None:
+            self._pending.append(item)
+            return
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"Alert write queue full, dropped {self.dropped} writes so far")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = self._collecting = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+            self._collecting = []
+            await loop.run_in_executor(self._executor, self._write_batch, batch)
+
+    def _write_batch(self, rows: List[Tuple[str, Dict[str, Any]]]):
+        """Runs on the writer thread."""
+        inserts = [row for kind, row in rows if kind == 'insert']
+        updates = [row for kind, row in rows if kind == 'update']
+        start = time.perf_counter()
+        try:
+            with engine.begin() as conn:
+                if inserts:
+                    conn.execute(Alert.__table__.insert(), inserts)
+                if updates:
+                    conn.execute(_UPDATE_INCIDENT, updates)
+        except Exception as e:
+            self.failed += len(rows)
+            logger.error(f"Failed to persist {len(rows)} alert writes: {e}")
+            return
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.written += len(rows)
+        self.batches += 1
+        self.last_commit_ms = elapsed_ms
+        self.max_commit_ms = max(self.max_commit_ms, elapsed_ms)
+        self._total_commit_ms += elapsed_ms
+
+    async def stop(self):
+        """Cancel the flush task and write everything still queued."""
+        if self._task:
+            # A cancel that lands just as wait_for's get() completes is swallowed
+            # (before Python 3.12), so repeat it until the task has ended
+            while not self._task.done():
+                self._task.cancel()
+                await asyncio.wait({self._task}, timeout=0.1)
+            self._task = None
+
+        # A batch already handed to the writer thread finishes there first
+        remaining = self._collecting + self._pending
+        self._collecting, self._pending = [], []
+        if self._queue is not None:
+            while not self._queue.empty():
+                remaining.append(self._queue.get_nowait())
+        loop = asyncio.get_running_loop()
+        for i in range(0, len(remaining), self.batch_size):
+            await loop.run_in_executor(self._executor, self._write_batch, remaining[i:i + self.batch_size])
+        self._executor.shutdown(wait=True)
+        logger.info(f"Alert writer stopped: {self.written} alert writes in {self.batches} batches")
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and commit latency, for /health."""
+        return {
+            'queue_depth': (self._queue.qsize() if self._queue is not None else 0) + len(self._pending),
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'batches': self.batches,
+            'last_commit_ms': round(self.last_commit_ms, 2),
+            'avg_commit_ms': round(self._total_commit_ms / self.batches, 2) if self.batches else 0.0,
+            'max_commit_ms': round(self.max_commit_ms, 2),
+        }
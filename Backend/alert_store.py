@@ -0,0 +1,107 @@
+"""
+Alert Store - Bounded, indexed in-memory view of recent alerts with incremental counters
+"""
+import itertools
+import logging
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional
+import config
+
+logger = logging.getLogger(__name__)
+
+# Alert fields that get a running breakdown
+COUNTED_FIELDS = ('severity', 'status', 'zone_key', 'camera')
+
+
+class AlertStore:
+    """
+    Keeps the newest `capacity` alerts in a ring buffer with a dict index by ID.
+
+    Appending, lookup by ID and the severity/status/zone/camera breakdowns are
+    all O(1); listing the newest N alerts is O(N). IDs are assigned here from
+    a monotonic counter, so they never collide.
+    """
+
+    def __init__(self, capacity: int = config.ALERT_STORE_CAPACITY, start_id: int = 1):
+        self.capacity = capacity
+        self._alerts: Deque[Dict[str, Any]] = deque()
+        self._by_id: Dict[int, Dict[str, Any]] = {}
+        self._counters: Dict[str, Counter] = {field: Counter() for field in COUNTED_FIELDS}
+        self._ids = itertools.count(start_id)
+        self.total_recorded = 0
+
+    def __len__(self) -> int:
+        return len(self._alerts)
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    def continue_after(self, last_id: int):
+        """Assign IDs from last_id + 1 on, e.g. after the highest ID already in the database."""
+        self._ids = itertools.count(last_id + 1)
+
+    def add(self, alert: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Add an alert as the newest entry, assigning it an ID if it has none.
+
+        Returns:
+            The stored alert.
+        """
+        if alert.get('id') is None:
+            alert['id'] = self.next_id()
+
+        if len(self._alerts) >= self.capacity:
+            self._evict(self._alerts.popleft())
+
+        self._alerts.append(alert)
+        self._by_id[alert['id']] = alert
+        for field in COUNTED_FIELDS:
+            self._counters[field][alert.get(field)] += 1
+        self.total_recorded += 1
+        return alert
+
+    def _evict(self, alert: Dict[str, Any]):
+        self._by_id.pop(alert['id'], None)
+        for field in COUNTED_FIELDS:
+            counter = self._counters[field]
+            counter[alert.get(field)] -= 1
+            if counter[alert.get(field)] <= 0:
+                del counter[alert.get(field)]
+
+    def get(self, alert_id: int) -> Optional[Dict[str, Any]]:
+        return self._by_id.get(alert_id)
+
+    def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Newest alerts first."""
+        return list(itertools.islice(reversed(self._alerts), max(0, limit)))
+
+    def update_status(self, alert_id: int, status: str) -> Optional[Dict[str, Any]]:
+        """Change an alert's status, keeping the status breakdown in step."""
+        alert = self._by_id.get(alert_id)
+        if alert is None:
+            return None
+        counter = self._counters['status']
+        counter[alert.get('status')] -= 1
+        if counter[alert.get('status')] <= 0:
+            del counter[alert.get('status')]
+        alert['status'] = status
+        counter[status] += 1
+        return alert
+
+    def breakdown(self, field: str) -> Dict[Any, int]:
+        """Current count per value of one of COUNTED_FIELDS."""
+        return dict(self._counters[field])
+
+    def get_stats(self) -> Dict[str, int]:
+        """Same shape as MockAlertGenerator.get_stats, without scanning the alerts."""
+        severity = self._counters['severity']
+        status = self._counters['status']
+        return {
+            'total_alerts': len(self._alerts),
+            'critical': severity['critical'],
+            'high': severity['high'],
+            'medium': severity['medium'],
+            'low': severity['low'],
+            'active': status['active'],
+            'resolved': status['resolved']
+        }
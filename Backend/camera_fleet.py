@@ -0,0 +1,235 @@
+"""
+Camera Fleet - Simulates many FakeCameraFeed cameras across worker processes
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional, Callable
+import cv2
+import config
+from activity_recorder import ActivitySampler
+from config import Zone, ZONE_LABELS
+from fake_camera import FakeCameraFeed
+from frame_broadcaster import FrameBroadcaster
+from models.heatmap import HeatmapAccumulator
+
+logger = logging.getLogger(__name__)
+
+# Seconds an unwatched camera collects heatmap points before sending them
+POINT_FLUSH_INTERVAL = 0.5
+
+
+def build_camera_specs(count: int = config.SIMULATOR_CAMERA_COUNT) -> List[Dict[str, Any]]:
+    """
+    Describe the simulated cameras.
+
+    Cameras listed in CAMERA_ZONES keep their zone; extra cameras take the
+    configured zones in turn so a fleet of any size has a realistic mix.
+    """
+    zones = list(config.CAMERA_ZONES.values()) or [Zone.OUTDOOR_PLAY]
+    specs = []
+    for camera_id in range(count):
+        width, height = config.CAMERA_RESOLUTIONS.get(camera_id, config.SIMULATOR_RESOLUTION)
+        specs.append({
+            'camera_id': camera_id,
+            'zone': config.CAMERA_ZONES.get(camera_id, zones[camera_id % len(zones)]),
+            'width': width,
+            'height': height,
+            'fps': config.STREAM_FPS,
+        })
+    return specs
+
+
+def _fleet_worker(specs, frame_queue, viewer_counts, stop_event, jpeg_quality: int, always_on: bool):
+    """
+    Simulate a share of the fleet in its own process.
+
+    Each camera keeps its own frame clock and its detections are sampled on
+    every frame. Frames are only rendered and encoded for cameras with
+    viewers. Encoded frames, sampled positions (for the activity log) and
+    alerts are put on the shared queue together with every person's
+    foot-point since the last message (for the heatmap), and dropped if the
+    parent is not keeping up. Unwatched cameras send their foot-points at
+    least every POINT_FLUSH_INTERVAL seconds.
+    """
+    cv2.setNumThreads(1)
+    cameras = [
+        (spec['camera_id'], FakeCameraFeed(
+            width=spec['width'], height=spec['height'], fps=spec['fps'],
+            zone=spec['zone'], camera_id=spec['camera_id']
+        ))
+        for spec in specs
+    ]
+    samplers = {camera_id: ActivitySampler() for camera_id, _ in cameras}
+    encode_params = [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality]
+    next_due = {camera_id: time.monotonic() for camera_id, _ in cameras}
+    pending_points: Dict[int, list] = {camera_id: [] for camera_id, _ in cameras}
+    last_sent = {camera_id: 0.0 for camera_id, _ in cameras}
+
+    while not stop_event.is_set():
+        now = time.monotonic()
+        for camera_id, camera in cameras:
+            if now < next_due[camera_id]:
+                continue
+            next_due[camera_id] = max(next_due[camera_id] + 1 / camera.fps, now)
+
+            detections, (alert_triggered, alert_message) = camera.step()
+            points = pending_points[camera_id]
+            points.extend(((d['bbox'][0] + d['bbox'][2]) / 2, d['bbox'][3]) for d in detections)
+            samples = samplers[camera_id].sample(detections, now)
+
+            jpeg = None
+            if always_on or viewer_counts[camera_id] > 0:
+                ret, buffer = cv2.imencode('.jpg', camera.render(), encode_params)
+                if ret:
+                    jpeg = buffer.tobytes()
+            if jpeg is None and not samples and not alert_triggered \
+                    and now - last_sent[camera_id] < POINT_FLUSH_INTERVAL:
+                continue
+            pending_points[camera_id] = []
+            last_sent[camera_id] = now
+            try:
+                frame_queue.put_nowait((
+                    camera_id, jpeg, alert_message if alert_triggered else None, points, samples
+                ))
+            except queue.Full:
+                pass
+
+        time.sleep(max(0.0, min(next_due.values()) - time.monotonic()))
+
+
+class CameraFleet:
+    """
+    Runs the simulated cameras across a process pool and exposes each one
+    through its own FrameBroadcaster.
+    """
+
+    def __init__(
+        self,
+        specs: Optional[List[Dict[str, Any]]] = None,
+        processes: int = config.SIMULATOR_PROCESSES,
+        always_on: bool = config.SIMULATOR_ALWAYS_ON,
+        on_alert: Optional[Callable[[int, str], None]] = None,
+        on_activity: Optional[Callable[[int, Zone, list], None]] = None
+    ):
+        self.specs = specs if specs is not None else build_camera_specs()
+        self.processes = min(processes or os.cpu_count() or 1, max(1, len(self.specs)))
+        self.always_on = always_on
+        self.on_alert = on_alert
+        self.on_activity = on_activity  # Called on the drain thread
+
+        self.broadcasters: Dict[int, FrameBroadcaster] = {
+            spec['camera_id']: FrameBroadcaster(camera_id=spec['camera_id'], fps=spec['fps'])
+            for spec in self.specs
+        }
+        self.heatmaps: Dict[int, HeatmapAccumulator] = {
+            spec['camera_id']: HeatmapAccumulator(spec['width'], spec['height'])
+            for spec in self.specs
+        }
+
+        self._zones: Dict[int, Zone] = {spec['camera_id']: spec['zone'] for spec in self.specs}
+
+        self._ctx = multiprocessing.get_context("spawn")
+        self._frame_queue = None
+        self._viewer_counts = None
+        self._stop_event = None
+        self._workers: List[Any] = []
+        self._drain_thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def __len__(self) -> int:
+        return len(self.specs)
+
+    def get(self, camera_id: int) -> Optional[FrameBroadcaster]:
+        return self.broadcasters.get(camera_id)
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """Start the worker processes and the thread that publishes their frames."""
+        self._loop = loop
+        for broadcaster in self.broadcasters.values():
+            broadcaster.start(loop)
+
+        max_camera_id = max((spec['camera_id'] for spec in self.specs), default=0)
+        self._frame_queue = self._ctx.Queue(maxsize=4 * max(1, len(self.specs)))
+        self._viewer_counts = self._ctx.Array('i', max_camera_id + 1, lock=False)
+        self._stop_event = self._ctx.Event()
+
+        for i in range(self.processes):
+            share = self.specs[i::self.processes]
+            if not share:
+                continue
+            worker = self._ctx.Process(
+                target=_fleet_worker,
+                args=(share, self._frame_queue, self._viewer_counts, self._stop_event,
+                      config.STREAM_JPEG_QUALITY, self.always_on),
+                name=f"camera-fleet-{i}",
+                daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+
+        self._drain_thread = threading.Thread(target=self._drain, name="camera-fleet-drain", daemon=True)
+        self._drain_thread.start()
+        logger.info(f"Camera fleet started: {len(self.specs)} cameras across {len(self._workers)} processes")
+
+    def _drain(self):
+        last_sync = 0.0
+        while not self._stop_event.is_set():
+            # Tell the workers which cameras have viewers
+            now = time.monotonic()
+            if now - last_sync >= 0.25:
+                for camera_id, broadcaster in self.broadcasters.items():
+                    self._viewer_counts[camera_id] = broadcaster.viewers
+                last_sync = now
+
+            try:
+                camera_id, jpeg, alert_message, points, samples = self._frame_queue.get(timeout=0.25)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            try:
+                if jpeg is not None:
+                    self.broadcasters[camera_id].push_frame(jpeg)
+                if points:
+                    self.heatmaps[camera_id].add_points(points)
+                if samples and self.on_activity:
+                    self.on_activity(camera_id, self._zones[camera_id], samples)
+                if alert_message and self.on_alert:
+                    self._loop.call_soon_threadsafe(self.on_alert, camera_id, alert_message)
+            except RuntimeError:
+                # Event loop closed during shutdown
+                break
+
+    def stop(self):
+        """Stop the workers and end every open stream. Call from the event loop thread."""
+        if self._stop_event is not None:
+            self._stop_event.set()
+        for broadcaster in self.broadcasters.values():
+            broadcaster.stop()
+        for worker in self._workers:
+            worker.join(timeout=2)
+            if worker.is_alive():
+                worker.terminate()
+        if self._drain_thread:
+            self._drain_thread.join(timeout=2)
+        self._workers = []
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Zone, resolution, viewers and achieved fps for every camera."""
+        return [
+            {
+                'camera_id': spec['camera_id'],
+                'zone': spec['zone'].value,
+                'zone_label': ZONE_LABELS.get(spec['zone'], spec['zone'].value),
+                'resolution': f"{spec['width']}x{spec['height']}",
+                'target_fps': spec['fps'],
+                'fps': round(self.broadcasters[spec['camera_id']].fps_achieved, 1),
+                'viewers': self.broadcasters[spec['camera_id']].viewers,
+            }
+            for spec in self.specs
+        ]
@@ -2,7 +2,7 @@
 Centralized configuration for the Childcare Safety Monitoring System.
 """
 import os
-from typing import List, Dict
+from typing import List, Dict, Tuple, Union
 from enum import Enum
 
 # --- General Settings ---
@@ -16,12 +16,29 @@ class Zone(str, Enum):
     HALLWAY = "hallway"
     ENTRANCE = "entrance"
 
+# Display names for the dashboard and camera overlays
+ZONE_LABELS: Dict[Zone, str] = {
+    Zone.OUTDOOR_PLAY: "Outdoor Play Area",
+    Zone.CLASSROOM: "Classroom",
+    Zone.STAFF_ROOM: "Staff Room",
+    Zone.HALLWAY: "Main Hallway",
+    Zone.ENTRANCE: "Main Entrance",
+}
+
 # Zone to Camera Mapping (camera_id: zone)
 CAMERA_ZONES = {
     0: Zone.OUTDOOR_PLAY,  # Default webcam for testing
+    1: Zone.CLASSROOM,
+    2: Zone.HALLWAY,
+    3: Zone.STAFF_ROOM,
     # Add more cameras as needed
 }
 
+# Named polygon sub-zones per camera_id: {camera_id: {name: (Zone, [(x, y), ...])}}, with points
+# at the camera's stream resolution. Later polygons win where they overlap; the rest of the
+# frame belongs to the camera's CAMERA_ZONES zone.
+CAMERA_SUBZONES: Dict[int, Dict[str, Tuple[Zone, List[Tuple[int, int]]]]] = {}
+
 # --- AI Model Settings ---
 
 # YOLO Model for general object detection
@@ -31,22 +48,67 @@ YOLO_MODEL_PATH: str = "yolov8s.pt"
 FENCE_MODEL_PATH: str = os.path.join(BASE_DIR, "models", "fence_defect.pt")
 FENCE_DEFECT_CLASSES: List[str] = ['HOLE', 'BENT', 'BROKEN', 'COLLAPSED']
 
+# Inference backend: "ultralytics" (PyTorch), or "onnxruntime" / "openvino" on ONNX exports (CPU)
+INFERENCE_BACKEND: str = "ultralytics"
+INFERENCE_INT8: bool = False  # ONNX backends: use the INT8 models from export_models.py --int8
+INFERENCE_IMAGE_SIZE: int = 640  # ONNX export and inference input size
+INFERENCE_IOU_THRESHOLD: float = 0.45  # NMS IoU on every backend, so switching backends keeps detections comparable
+INFERENCE_THREADS: int = 0  # Intra-op threads for the ONNX backends, 0 = runtime default
+ONNX_MODEL_DIR: str = os.path.join(BASE_DIR, "models", "onnx")
+QUANT_CALIBRATION_DIR: str = os.path.join(BASE_DIR, "data", "training_images")
+QUANT_CALIBRATION_IMAGES: int = 200
+
 # Person Classification
 PERSON_HEIGHT_THRESHOLD: int = 120  # pixels - approximate child vs adult differentiation
 CHILD_MAX_HEIGHT: int = 120  # Max height in pixels for child classification
 
+# Supervision
+SUPERVISION_RADIUS: int = 250  # pixels between a child's and a staff member's feet, at stream resolution
+SUPERVISION_TIME_CONSTANT: float = 3.0  # seconds; smooths each child track's supervision state
+SUPERVISION_ALERT_LEVEL: float = 0.8  # Smoothed unsupervised level (0-1) that raises an alert
+
 # Face Recognition
 KNOWN_FACES_DIR: str = os.path.join(BASE_DIR, "data", "known_faces")
 STAFF_FACES_DIR: str = os.path.join(KNOWN_FACES_DIR, "staff")
 CHILDREN_FACES_DIR: str = os.path.join(KNOWN_FACES_DIR, "children")
+FACE_MATCH_TOLERANCE: float = 0.6  # Max encoding distance for a match
+FACE_INDEX_PARTITIONS: int = 0  # >0 enables clustered approximate search for large rosters
+FACE_INDEX_PROBES: int = 4  # Clusters searched per face in approximate mode
 
 # Uniform Detection
 UNIFORM_MODEL_PATH: str = os.path.join(BASE_DIR, "models", "uniform_detector.pt")
 
+# Classes that raise a "Critical Object" alert when detected
+CRITICAL_CLASSES: List[str] = ['person', 'knife', 'gun', 'fire']
+
 # --- Detection Thresholds ---
 DETECTION_CONFIDENCE_THRESHOLD: float = 0.5
 FENCE_DEFECT_THRESHOLD: float = 0.6
-CLIMBING_HAZARD_DISTANCE: int = 50  # pixels from fence
+FENCE_CHECK_INTERVAL: float = 5.0  # seconds between fence model passes per camera (fences change slowly)
+CLIMBING_HAZARD_DISTANCE: int = 50  # pixels from fence, at the camera's stream resolution
+
+# Fence polylines per camera_id as (x, y) points at the camera's stream resolution
+# (CAMERA_RESOLUTIONS or SIMULATOR_RESOLUTION). Repeat the first point to close a polygon.
+# Cameras not listed treat the frame border as the fence.
+FENCE_LINES: Dict[int, List[List[Tuple[int, int]]]] = {}
+
+# Emergency route polygons per camera_id, at the camera's stream resolution like FENCE_LINES.
+# Cameras not listed fall back to flagging any large obstruction.
+EMERGENCY_ROUTES: Dict[int, List[List[Tuple[int, int]]]] = {}
+ROUTE_BLOCK_COVERAGE: float = 0.25  # Share of a route an obstruction must cover to block it
+ROUTE_BLOCK_PERSIST_SECONDS: float = 10.0  # A route must stay blocked this long before alerting
+ROUTE_BLOCK_CLEAR_SECONDS: float = 3.0  # ...and clear for this long before the timer resets
+
+# --- Tracking ---
+TRACKER_IOU_THRESHOLD: float = 0.3  # Min IoU to continue a track
+TRACKER_MAX_AGE: int = 30  # frames a track survives without a detection
+FACE_REVERIFY_INTERVAL: int = 90  # frames between face re-checks on a known track
+
+# --- Motion Gating ---
+MOTION_GATE_WIDTH: int = 160  # Width frames are downscaled to before differencing
+MOTION_GATE_PIXEL_THRESHOLD: int = 25  # Grayscale change counted as motion
+MOTION_GATE_MIN_CHANGED: float = 0.002  # Fraction of changed pixels that triggers inference
+MOTION_GATE_REFRESH_SECONDS: float = 5.0  # Force inference at least this often
 
 # --- Alert Severity Levels ---
 class AlertSeverity(str, Enum):
@@ -65,13 +127,62 @@ SCENARIO_SEVERITY: Dict[str, AlertSeverity] = {
     "emergency_route_blocked": AlertSeverity.CRITICAL,
     "uniform_violation": AlertSeverity.MEDIUM,
     "staff_location": AlertSeverity.LOW,
+    "critical_object": AlertSeverity.HIGH,
+    "unknown_person": AlertSeverity.HIGH,
+}
+
+# --- Alert Throttling ---
+# Repeats of an alert (same camera, scenario and track/region) within this
+# many seconds of the last one merge into the open incident instead of alerting again
+ALERT_COOLDOWN_SECONDS: Dict[AlertSeverity, float] = {
+    AlertSeverity.CRITICAL: 30.0,
+    AlertSeverity.HIGH: 60.0,
+    AlertSeverity.MEDIUM: 120.0,
+    AlertSeverity.LOW: 300.0,
 }
+ALERT_REGION_SIZE: int = 128  # pixels; untracked objects are throttled per grid cell of this size
+
+# --- Alert Storage ---
+ALERT_STORE_CAPACITY: int = 10000  # Newest alerts kept in memory
+ALERT_DB_BATCH_SIZE: int = 200  # Alerts per bulk insert
+ALERT_DB_FLUSH_INTERVAL: float = 1.0  # seconds before a partial batch is written
+ALERT_DB_QUEUE_SIZE: int = 50000  # Pending alerts before new ones are dropped
+ALERT_RELOAD_HOURS: int = 24  # Window reloaded into memory on startup
+
+# --- Activity Logging ---
+ACTIVITY_SAMPLE_INTERVAL: float = 1.0  # seconds between stored positions of one track
+ACTIVITY_BATCH_SIZE: int = 1000  # Positions per bulk insert
+ACTIVITY_FLUSH_INTERVAL: float = 2.0  # seconds before a partial batch is written
+ACTIVITY_BUFFER_SIZE: int = 100000  # Pending positions before new ones are dropped
+ACTIVITY_ROLLUP_INTERVAL: int = 60  # seconds between rollup runs
+ACTIVITY_GRID_SIZE: int = 32  # pixels per side of a rollup grid cell
+ACTIVITY_RAW_RETENTION_HOURS: int = 24  # Raw positions older than this are deleted; rollups are kept
 
 # --- Backend/Stream Settings ---
 CAMERA_INDEX: int = 0
 SERVER_HOST: str = "0.0.0.0"
 SERVER_PORT: int = 8000
+STREAM_FPS: int = 30
+STREAM_JPEG_QUALITY: int = 85
+STREAM_MAX_VIEWERS: int = 10  # MJPEG viewers per camera
+WS_SEND_QUEUE_SIZE: int = 100  # Messages buffered per WebSocket client
+WS_OVERFLOW_POLICY: str = "drop_oldest"  # "drop_oldest" or "disconnect" when a client's queue is full
+WS_SEND_TIMEOUT: float = 10.0  # seconds a single send may take before the client is dropped
+
+# --- Live Camera Monitor (camera_monitor.py) ---
+CAMERA_SOURCES: Dict[int, Union[int, str]] = {CAMERA_INDEX: CAMERA_INDEX}  # camera_id: device index or stream URL
+MONITOR_PORT: int = 8001  # Port of the monitor's /health endpoint
+MONITOR_ALERT_URL: str = f"http://127.0.0.1:{SERVER_PORT}/alerts"  # Server endpoint new incidents are posted to
+
+# --- Camera Simulator ---
+SIMULATOR_CAMERA_COUNT: int = len(CAMERA_ZONES)  # Cameras past CAMERA_ZONES reuse its zones in turn
+SIMULATOR_PROCESSES: int = 0  # 0 = one per CPU core, capped at the camera count
+SIMULATOR_RESOLUTION: Tuple[int, int] = (640, 480)
+SIMULATOR_ALWAYS_ON: bool = False  # Render cameras even with no viewers (load tests)
+CAMERA_RESOLUTIONS: Dict[int, Tuple[int, int]] = {}  # Per-camera overrides of SIMULATOR_RESOLUTION
 
 # --- Heatmap Settings ---
-HEATMAP_DECAY_RATE: float = 0.95  # How quickly activity fades
-HEATMAP_UPDATE_INTERVAL: int = 30  # seconds
\ No newline at end of file
+HEATMAP_DECAY_RATE: float = 0.95  # How quickly activity fades (share kept per second)
+HEATMAP_UPDATE_INTERVAL: int = 30  # seconds
+HEATMAP_CELL_SIZE: int = 8  # pixels per side of a heatmap cell
+HEATMAP_KERNEL_SIGMA: float = 1.5  # Gaussian splat width in cells
\ No newline at end of file
@@ -1,14 +1,27 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Float, ForeignKey, Enum as SQLEnum
+from sqlalchemy import create_engine, event, inspect, text, Index, Column, Integer, String, DateTime, Float, ForeignKey, Enum as SQLEnum
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 import datetime
 import enum
+import os
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./childcare_monitoring.db"
+SQLALCHEMY_DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./childcare_monitoring.db")
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
+
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        """WAL lets the dashboard read while alerts are being written"""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")  # Safe with WAL, fsyncs only at checkpoints
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA cache_size=-20000")  # ~20 MB page cache
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.close()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -44,6 +57,19 @@ class Alert(Base):
     event = Column(String, index=True)
     details = Column(String)
     status = Column(String, default="Review")
+    confidence = Column(Float, nullable=True)
+    occurrences = Column(Integer, default=1)  # Repeats merged into this incident
+    last_seen = Column(DateTime, nullable=True)
+
+    # Keyset pagination walks (timestamp, id) newest first, optionally behind one equality filter
+    __table_args__ = (
+        Index('ix_alerts_timestamp_id', 'timestamp', 'id'),
+        Index('ix_alerts_camera_timestamp_id', 'camera', 'timestamp', 'id'),
+        Index('ix_alerts_zone_timestamp_id', 'zone', 'timestamp', 'id'),
+        Index('ix_alerts_scenario_timestamp_id', 'scenario', 'timestamp', 'id'),
+        Index('ix_alerts_severity_timestamp_id', 'severity', 'timestamp', 'id'),
+        Index('ix_alerts_status_timestamp_id', 'status', 'timestamp', 'id'),
+    )
 
 class Person(Base):
     __tablename__ = "persons"
@@ -66,9 +92,34 @@ class ActivityLog(Base):
     x = Column(Integer)  # Position for heatmap
     y = Column(Integer)
     activity_type = Column(String)  # e.g., "movement", "interaction"
+    track_id = Column(Integer, nullable=True)  # Tracker ID within the camera
+    minute = Column(DateTime, nullable=True)  # timestamp floored to the minute, the rollup bucket
 
     person = relationship("Person")
 
+class ActivityRollup(Base):
+    """
+    Per-minute position counts per camera, zone, person type and grid cell.
+    Positions that arrive after their minute was rolled up add another row
+    for that minute, so sum count over a minute's rows.
+    """
+    __tablename__ = "activity_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    minute = Column(DateTime, index=True)
+    camera = Column(String)
+    zone = Column(SQLEnum(ZoneEnum))
+    person_type = Column(SQLEnum(PersonTypeEnum))
+    cell_x = Column(Integer)
+    cell_y = Column(Integer)
+    count = Column(Integer)
+    last_log_id = Column(Integer, nullable=True)  # Highest activity_logs.id covered by the rollup run
+
+    __table_args__ = (
+        Index('ix_activity_rollups_camera_minute', 'camera', 'minute'),
+        Index('ix_activity_rollups_zone_minute', 'zone', 'minute'),
+    )
+
 class StaffLocation(Base):
     __tablename__ = "staff_locations"
 
@@ -82,6 +133,20 @@ class StaffLocation(Base):
 
 def init_db():
     Base.metadata.create_all(bind=engine)
+    _upgrade_schema()
+
+def _upgrade_schema():
+    """create_all never alters existing tables, so add columns and indexes introduced since the DB was created"""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {col['name'] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    col_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}'))
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
 
 def get_db():
     db = SessionLocal()
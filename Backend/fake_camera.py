@@ -5,31 +5,131 @@ import cv2
 import numpy as np
 import time
 import random
+import argparse
 from datetime import datetime
-from typing import Tuple, List, Dict
+from typing import Optional, Tuple, List, Dict
+from config import Zone, ZONE_LABELS
+
+BANNER_HEIGHT = 40
+
+# Default (children, staff) simulated in each zone
+ZONE_OCCUPANCY: Dict[Zone, Tuple[int, int]] = {
+    Zone.OUTDOOR_PLAY: (2, 1),
+    Zone.CLASSROOM: (6, 1),
+    Zone.STAFF_ROOM: (0, 2),
+    Zone.HALLWAY: (1, 1),
+    Zone.ENTRANCE: (1, 1),
+}
+
+PERSON_COLORS = {'child': (100, 200, 255), 'staff': (100, 255, 100)}
+
+# Noisy background pools by (zone, width, height, pool size), shared by every
+# camera of a process with the same scene; frames only ever copy from them
+_noise_pools: Dict[Tuple[Zone, int, int, int], List[np.ndarray]] = {}
 
 
 class FakeCameraFeed:
-    def __init__(self, width: int = 640, height: int = 480, fps: int = 30):
+    def __init__(
+        self,
+        width: int = 640,
+        height: int = 480,
+        fps: int = 30,
+        noise_pool_size: int = 8,
+        zone: Zone = Zone.OUTDOOR_PLAY,
+        camera_id: int = 0,
+        occupancy: Optional[Tuple[int, int]] = None
+    ):
         self.width = width
         self.height = height
         self.fps = fps
         self.frame_count = 0
+        self.zone = Zone(zone)
+        self.camera_id = camera_id
         
         # Simulated people (x, y, width, height, speed_x, speed_y, person_type)
-        self.people = [
-            {'x': 100, 'y': 200, 'w': 40, 'h': 80, 'vx': 1.5, 'vy': 0.5, 'type': 'child', 'color': (100, 200, 255)},
-            {'x': 300, 'y': 250, 'w': 50, 'h': 100, 'vx': -1.0, 'vy': 0.3, 'type': 'staff', 'color': (100, 255, 100)},
-            {'x': 450, 'y': 180, 'w': 35, 'h': 70, 'vx': 0.8, 'vy': -0.6, 'type': 'child', 'color': (100, 200, 255)},
-        ]
+        num_children, num_staff = occupancy or ZONE_OCCUPANCY.get(self.zone, (2, 1))
+        self.people = self._spawn_people(num_children, num_staff)
         
         # Alert scenarios
         self.alert_probability = 0.02  # 2% chance per frame
         self.last_alert_time = time.time()
         
-    def generate_background(self) -> np.ndarray:
-        """Generate a playground-like background"""
-        frame = np.ones((self.height, self.width, 3), dtype=np.uint8) * 40
+        # The scene never changes, so render it once and precompute a pool of
+        # noisy variants, shared with other cameras of the same zone and
+        # resolution; each frame then starts from a single copy
+        pool_key = (self.zone, width, height, max(1, noise_pool_size))
+        if pool_key not in _noise_pools:
+            _noise_pools[pool_key] = self._build_noise_pool(noise_pool_size)
+        self._noisy_backgrounds = _noise_pools[pool_key]
+        self._timestamp_second = None
+        self._timestamp_text = ""
+        
+    def _spawn_people(self, num_children: int, num_staff: int) -> List[Dict]:
+        """Place people on the floor area, sized relative to a 480-line frame"""
+        rng = random.Random(self.camera_id)
+        scale = self.height / 480
+        people = []
+        for person_type, count in (('child', num_children), ('staff', num_staff)):
+            for _ in range(count):
+                w = int(rng.randint(35, 40) * scale) if person_type == 'child' else int(50 * scale)
+                h = 2 * w
+                people.append({
+                    'x': rng.uniform(0, self.width - w),
+                    'y': rng.uniform(self.height // 2, self.height - h),
+                    'w': w, 'h': h,
+                    'vx': rng.uniform(-1.5, 1.5) * scale,
+                    'vy': rng.uniform(-0.6, 0.6) * scale,
+                    'type': person_type,
+                    'color': PERSON_COLORS[person_type]
+                })
+        return people
+    
+    def _render_static_background(self) -> np.ndarray:
+        """Draw the zone's scene without noise"""
+        if self.zone == Zone.OUTDOOR_PLAY:
+            return self._render_playground()
+        return self._render_indoor()
+    
+    def _render_indoor(self) -> np.ndarray:
+        """Draw an indoor room: wall, floor and zone-specific furniture"""
+        w, h = self.width, self.height
+        frame = np.full((h, w, 3), 40, dtype=np.uint8)
+        
+        # Wall (top half) and floor (bottom half)
+        wall_color = (190, 200, 210) if self.zone != Zone.HALLWAY else (170, 170, 170)
+        floor_color = (70, 110, 150) if self.zone in (Zone.CLASSROOM, Zone.STAFF_ROOM) else (150, 150, 150)
+        cv2.rectangle(frame, (0, 0), (w, h // 2), wall_color, -1)
+        cv2.rectangle(frame, (0, h // 2), (w, h), floor_color, -1)
+        
+        if self.zone == Zone.CLASSROOM:
+            # Whiteboard and low tables
+            cv2.rectangle(frame, (w // 4, h // 8), (3 * w // 4, 3 * h // 8), (245, 245, 245), -1)
+            cv2.rectangle(frame, (w // 4, h // 8), (3 * w // 4, 3 * h // 8), (90, 90, 90), 2)
+            for i in range(3):
+                x = w // 8 + i * w // 3
+                cv2.rectangle(frame, (x, 5 * h // 8), (x + w // 6, 5 * h // 8 + h // 16), (60, 90, 140), -1)
+        elif self.zone == Zone.STAFF_ROOM:
+            # Sofa and table
+            cv2.rectangle(frame, (w // 10, 3 * h // 8), (w // 2, h // 2 + h // 16), (80, 60, 120), -1)
+            cv2.rectangle(frame, (6 * w // 10, 5 * h // 8), (8 * w // 10, 11 * h // 16), (50, 80, 120), -1)
+        elif self.zone == Zone.HALLWAY:
+            # Doors along the wall and perspective lines on the floor
+            for i in range(4):
+                x = w // 10 + i * w // 4
+                cv2.rectangle(frame, (x, h // 6), (x + w // 10, h // 2), (60, 90, 140), -1)
+            cv2.line(frame, (0, h), (w // 3, h // 2), (120, 120, 120), 2)
+            cv2.line(frame, (w, h), (2 * w // 3, h // 2), (120, 120, 120), 2)
+        elif self.zone == Zone.ENTRANCE:
+            # Glass double door
+            cv2.rectangle(frame, (w // 3, h // 8), (2 * w // 3, h // 2), (200, 170, 120), -1)
+            cv2.line(frame, (w // 2, h // 8), (w // 2, h // 2), (80, 80, 80), 3)
+            cv2.rectangle(frame, (w // 3, h // 8), (2 * w // 3, h // 2), (80, 80, 80), 3)
+        
+        return frame
+    
+    def _render_playground(self) -> np.ndarray:
+        """Draw the playground scene"""
+        frame = np.full((self.height, self.width, 3), 40, dtype=np.uint8)
         
         # Draw grass area (bottom half)
         cv2.rectangle(frame, (0, self.height//2), (self.width, self.height), (60, 120, 60), -1)
@@ -51,12 +151,24 @@ class FakeCameraFeed:
         for x in range(0, self.width, 30):
             cv2.line(frame, (x, self.height//2 - 50), (x, self.height//2 + 50), (139, 90, 60), 2)
         
-        # Add some texture/noise for realism
-        noise = np.random.randint(-10, 10, (self.height, self.width, 3), dtype=np.int16)
-        frame = np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8)
-        
         return frame
     
+    def _build_noise_pool(self, size: int) -> List[np.ndarray]:
+        """Background with texture/noise for realism, in a few precomputed variants"""
+        background = self._render_static_background().astype(np.int16)
+        rng = np.random.default_rng()
+        pool = []
+        for _ in range(max(1, size)):
+            noise = rng.integers(-10, 10, background.shape, dtype=np.int16)
+            pool.append(np.clip(background + noise, 0, 255).astype(np.uint8))
+        return pool
+    
+    def generate_background(self) -> np.ndarray:
+        """Generate a playground-like background"""
+        # Offset by camera so cameras sharing a pool do not show the same noise
+        index = (self.frame_count + self.camera_id) % len(self._noisy_backgrounds)
+        return self._noisy_backgrounds[index].copy()
+    
     def update_people_positions(self):
         """Update positions of simulated people"""
         for person in self.people:
@@ -118,21 +230,23 @@ class FakeCameraFeed:
     
     def add_overlay_info(self, frame: np.ndarray) -> np.ndarray:
         """Add timestamp and zone information"""
-        # Semi-transparent overlay at top
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (0, 0), (self.width, 40), (0, 0, 0), -1)
-        frame = cv2.addWeighted(overlay, 0.6, frame, 0.4, 0)
+        # Semi-transparent black banner at top, darkened in place
+        banner = frame[:BANNER_HEIGHT]
+        cv2.convertScaleAbs(banner, dst=banner, alpha=0.4)
         
-        # Timestamp
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        cv2.putText(frame, timestamp, (10, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        # Timestamp, formatted once per second
+        now = int(time.time())
+        if now != self._timestamp_second:
+            self._timestamp_second = now
+            self._timestamp_text = datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M:%S")
+        cv2.putText(frame, self._timestamp_text, (10, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
         
         # Zone label
-        zone_text = "ZONE: Outdoor Play Area"
-        cv2.putText(frame, zone_text, (self.width - 250, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        zone_text = f"ZONE: {ZONE_LABELS.get(self.zone, self.zone.value)}"
+        cv2.putText(frame, zone_text, (self.width - 330, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
         
         # Camera ID
-        cam_text = "CAM-01"
+        cam_text = f"CAM-{self.camera_id + 1:02d}"
         cv2.circle(frame, (self.width - 30, 20), 8, (255, 0, 0), -1)
         cv2.putText(frame, cam_text, (self.width - 80, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
         
@@ -161,12 +275,13 @@ class FakeCameraFeed:
     def get_detections(self) -> List[Dict]:
         """Get current detection data"""
         detections = []
-        for person in self.people:
+        for track_id, person in enumerate(self.people, start=1):
             x, y, w, h = int(person['x']), int(person['y']), person['w'], person['h']
             box_y = y - person['w']
             box_h = h + person['w']
             
             detections.append({
+                'track_id': track_id,
                 'type': person['type'],
                 'bbox': [x - 5, box_y - 5, x + w + 5, box_y + box_h + 5],
                 'confidence': random.uniform(0.85, 0.98)
@@ -174,19 +289,9 @@ class FakeCameraFeed:
         
         return detections
     
-    def generate_frame(self) -> Tuple[np.ndarray, List[Dict], Tuple[bool, str]]:
-        """Generate a single frame with detections"""
-        # Create background
-        frame = self.generate_background()
-        
-        # Update and draw people
+    def step(self) -> Tuple[List[Dict], Tuple[bool, str]]:
+        """Advance the simulation by one frame without rendering it"""
         self.update_people_positions()
-        for person in self.people:
-            frame = self.draw_person(frame, person)
-            frame = self.draw_detection_box(frame, person, detected=True)
-        
-        # Add overlay information
-        frame = self.add_overlay_info(frame)
         
         # Check for alerts
         alert_triggered, alert_message = self.should_generate_alert()
@@ -196,10 +301,51 @@ class FakeCameraFeed:
         
         self.frame_count += 1
         
-        return frame, detections, (alert_triggered, alert_message)
+        return detections, (alert_triggered, alert_message)
+    
+    def render(self) -> np.ndarray:
+        """Draw the people at their current positions"""
+        # Create background
+        frame = self.generate_background()
+        
+        for person in self.people:
+            frame = self.draw_person(frame, person)
+            frame = self.draw_detection_box(frame, person, detected=True)
+        
+        # Add overlay information
+        return self.add_overlay_info(frame)
+    
+    def generate_frame(self) -> Tuple[np.ndarray, List[Dict], Tuple[bool, str]]:
+        """Generate a single frame with detections"""
+        detections, alert = self.step()
+        return self.render(), detections, alert
+
+
+def benchmark(resolutions: List[Tuple[int, int]], frames: int = 300) -> List[Dict]:
+    """Measure generate_frame throughput at each resolution"""
+    results = []
+    for width, height in resolutions:
+        camera = FakeCameraFeed(width=width, height=height)
+        camera.generate_frame()  # Warm up
+        start = time.perf_counter()
+        for _ in range(frames):
+            camera.generate_frame()
+        elapsed = time.perf_counter() - start
+        results.append({'resolution': f"{width}x{height}", 'fps': frames / elapsed})
+    return results
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake camera feed")
+    parser.add_argument('--benchmark', action='store_true', help="Report frames/sec instead of showing the feed")
+    parser.add_argument('--frames', type=int, default=300, help="Frames per resolution when benchmarking")
+    args = parser.parse_args()
+    
+    if args.benchmark:
+        for result in benchmark([(640, 480), (1920, 1080)], args.frames):
+            print(f"{result['resolution']:>10}: {result['fps']:8.1f} frames/sec")
+        raise SystemExit
+    
     # Test the fake camera
     camera = FakeCameraFeed()
     
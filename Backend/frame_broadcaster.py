@@ -0,0 +1,103 @@
+"""
+Frame Broadcaster - Each camera's frames JPEG-encoded once and shared by every MJPEG viewer
+"""
+import asyncio
+import time
+import logging
+from collections import deque
+from typing import AsyncIterator, Deque, Optional, Tuple
+import config
+
+logger = logging.getLogger(__name__)
+
+MJPEG_BOUNDARY = "frame"
+
+
+class FrameBroadcaster:
+    """
+    Fans a camera's latest JPEG out to async viewers. Frames are encoded
+    elsewhere (e.g. a simulator process) and fed in with push_frame().
+
+    Frames land in a small ring buffer; viewers that fall behind skip straight
+    to the newest frame instead of queueing. The viewer count tells the
+    producer whether anyone is watching.
+    """
+
+    def __init__(
+        self,
+        camera_id: int = 0,
+        fps: int = config.STREAM_FPS,
+        max_viewers: int = config.STREAM_MAX_VIEWERS,
+        buffer_size: int = 4
+    ):
+        self.camera_id = camera_id
+        self.fps = fps
+        self.max_viewers = max_viewers
+
+        self.frames: Deque[Tuple[int, bytes]] = deque(maxlen=buffer_size)
+        self.viewers = 0
+        self.frames_produced = 0
+        self.fps_achieved = 0.0
+        self._fps_window_start = time.monotonic()
+        self._fps_window_frames = 0
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._new_frame: Optional[asyncio.Event] = None
+        self._running = False
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """Start publishing into the given event loop."""
+        self._loop = loop
+        self._new_frame = asyncio.Event()
+        self._running = True
+
+    def stop(self):
+        """End every open stream. Call from the event loop thread."""
+        self._running = False
+        if self._new_frame:
+            self._new_frame.set()
+
+    def push_frame(self, jpeg: bytes):
+        """Publish an already encoded frame. Safe to call from any thread."""
+        self._loop.call_soon_threadsafe(self._publish, jpeg)
+
+    def _publish(self, jpeg: bytes):
+        """Runs on the event loop thread."""
+        self.frames_produced += 1
+        self.frames.append((self.frames_produced, jpeg))
+        event, self._new_frame = self._new_frame, asyncio.Event()
+        event.set()
+
+        self._fps_window_frames += 1
+        now = time.monotonic()
+        if now - self._fps_window_start >= 1.0:
+            self.fps_achieved = self._fps_window_frames / (now - self._fps_window_start)
+            self._fps_window_start = now
+            self._fps_window_frames = 0
+
+    def is_full(self) -> bool:
+        """Whether the camera is at its viewer limit."""
+        return self.viewers >= self.max_viewers
+
+    async def stream(self) -> AsyncIterator[bytes]:
+        """
+        MJPEG multipart stream of the latest frames.
+
+        The viewer slot is taken when the stream starts and released when the
+        client disconnects, so a client that drops before the first frame
+        never holds a slot. Ends at once if the camera filled up in between.
+        """
+        if self.is_full():
+            return
+        self.viewers += 1
+        last_seq = 0
+        try:
+            while self._running:
+                if not self.frames or self.frames[-1][0] == last_seq:
+                    await self._new_frame.wait()
+                    continue
+                last_seq, jpeg = self.frames[-1]
+                yield (b'--' + MJPEG_BOUNDARY.encode() + b'\r\n'
+                       b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+        finally:
+            self.viewers -= 1
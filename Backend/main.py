@@ -1,65 +1,36 @@
-import cv2
 import uvicorn
 import asyncio
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Depends, Query, Response, Body
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 import time
 import logging
 import numpy as np
 import config
+from config import AlertSeverity, Zone
 from sqlalchemy.orm import Session
-from database import SessionLocal, engine, init_db, Alert
+from database import SessionLocal, init_db, Alert
 import datetime
-from fake_camera import FakeCameraFeed
+from camera_fleet import CameraFleet
+from frame_broadcaster import MJPEG_BOUNDARY
 from mock_alerts import MockAlertGenerator
-from typing import List
+from alert_store import AlertStore
+from activity_recorder import ActivityRecorder
+from alert_persistence import AlertWriter, load_recent_alerts, max_alert_id, query_alerts, row_to_alert
+from websocket_manager import manager
+from models.alert_throttle import AlertThrottle
+from typing import Optional
 import json
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize DB
-init_db()
-
 app = FastAPI(title="CCTV Safety Monitoring System", version="2.0")
 
-# Initialize fake camera and alert generator
-fake_camera = FakeCameraFeed(width=640, height=480, fps=30)
+# Initialize alert generator
 alert_generator = MockAlertGenerator()
 
-# WebSocket connection manager
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        logger.info(f"WebSocket connected. Total connections: {len(self.active_connections)}")
-
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-        logger.info(f"WebSocket disconnected. Total connections: {len(self.active_connections)}")
-
-    async def broadcast(self, message: dict):
-        """Broadcast message to all connected clients"""
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except Exception as e:
-                logger.error(f"Error broadcasting to client: {e}")
-                disconnected.append(connection)
-        
-        # Remove disconnected clients
-        for conn in disconnected:
-            if conn in self.active_connections:
-                self.active_connections.remove(conn)
-
-manager = ConnectionManager()
-
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -67,6 +38,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Dependency
@@ -79,53 +51,77 @@ def get_db():
 
 # Global variables for stats
 stats = {
-    "active_cameras": 4,
+    "active_cameras": 0,
     "total_alerts": 0,
     "uptime": 0,
     "start_time": time.time()
 }
 
-# Store historical alerts in memory
-historical_alerts = alert_generator.generate_historical_alerts(50)
+# Recent alerts, indexed by ID with running breakdowns; IDs continue from the database on startup
+alert_store = AlertStore()
 
-def generate_frames():
+# Alerts are written to the database in batches, off the request path
+alert_writer = AlertWriter()
+
+def record_alert(alert_data: dict) -> dict:
+    """Store a new alert under a fresh monotonic ID and queue it for persistence"""
+    alert_data['id'] = alert_store.next_id()
+    alert_store.add(alert_data)
+    alert_writer.enqueue(alert_data)
+    return alert_data
+
+def load_alerts():
+    """Reload the recent window, or seed with historical alerts (oldest first) on a fresh database"""
+    alert_store.continue_after(max_alert_id())
+    for stored_alert in load_recent_alerts():
+        alert_store.add(stored_alert)
+    if not len(alert_store):
+        for historical_alert in reversed(alert_generator.generate_historical_alerts(50)):
+            record_alert(historical_alert)
+
+# Repeats of an open incident are merged into it instead of being raised again
+alert_throttle = AlertThrottle()
+
+def raise_alert(alert_data: dict) -> Optional[dict]:
     """
-    Generator function to create fake video frames
+    Record and broadcast an alert unless it repeats an open incident for the
+    same camera, scenario and zone.
+
+    Returns:
+        The alert if it opened a new incident, None if it was merged.
     """
-    global historical_alerts
+    incident, is_new = alert_throttle.observe(
+        alert_data['camera'], alert_data['scenario'], alert_data.get('zone_key'), alert_data
+    )
+    if not is_new:
+        return None
+    record_alert(incident)
     
-    while True:
-        try:
-            # Generate frame from fake camera
-            frame, detections, (alert_triggered, alert_message) = fake_camera.generate_frame()
-            
-            # If alert triggered, broadcast to WebSocket clients
-            if alert_triggered:
-                alert_data = alert_generator.generate_alert()
-                historical_alerts.insert(0, alert_data)
-                
-                # Broadcast to WebSocket
-                asyncio.create_task(manager.broadcast(alert_data))
-                
-                logger.info(f"Alert generated: {alert_message}")
-            
-            # Encode frame
-            ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
-            if not ret:
-                logger.error("Failed to encode frame")
-                continue
-                
-            frame_bytes = buffer.tobytes()
-            
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-            
-            # Control frame rate
-            time.sleep(1/30)  # 30 FPS
-            
-        except Exception as e:
-            logger.error(f"Error generating frame: {e}")
-            time.sleep(0.1)
+    # Broadcast to subscribed WebSocket clients
+    manager.broadcast_alert(incident)
+    return incident
+
+def handle_camera_alert(camera_id: int, alert_message: str):
+    """
+    Raise an alert from a simulated camera.
+    Called on the event loop thread by the camera fleet.
+    """
+    alert_data = alert_generator.generate_alert()
+    alert_data['camera'] = f"CAM-{camera_id + 1:02d}"
+    if raise_alert(alert_data):
+        logger.info(f"Alert generated: {alert_message}")
+
+# Sampled movement positions, bulk-inserted and rolled up per minute
+activity_recorder = ActivityRecorder()
+
+def handle_camera_activity(camera_id: int, zone: config.Zone, samples: list):
+    """Called on the camera fleet's drain thread with sampled person positions"""
+    activity_recorder.add_samples(f"CAM-{camera_id + 1:02d}", zone.value, samples)
+
+# Simulated cameras, one shared producer per camera. Built on startup: the fleet's
+# spawned workers re-import this module when it is run directly, and must not
+# repeat the database setup or start fleets of their own
+camera_fleet: Optional[CameraFleet] = None
 
 @app.get("/")
 async def root():
@@ -138,20 +134,30 @@ async def root():
 
 @app.get("/video_feed")
 async def video_feed():
-    """Stream fake video feed"""
+    """Stream fake video feed of the default camera"""
+    return await camera_video_feed(config.CAMERA_INDEX)
+
+@app.get("/video_feed/{camera_id}")
+async def camera_video_feed(camera_id: int):
+    """Stream fake video feed of one camera"""
+    broadcaster = camera_fleet.get(camera_id)
+    if broadcaster is None:
+        raise HTTPException(status_code=404, detail="Camera not found")
+    if broadcaster.is_full():
+        raise HTTPException(status_code=503, detail="Viewer limit reached for this camera")
     return StreamingResponse(
-        generate_frames(),
-        media_type="multipart/x-mixed-replace; boundary=frame"
+        broadcaster.stream(),
+        media_type=f"multipart/x-mixed-replace; boundary={MJPEG_BOUNDARY}"
     )
 
 @app.get("/stats")
 async def get_stats():
     """Get system statistics"""
     stats["uptime"] = int(time.time() - stats["start_time"])
-    stats["total_alerts"] = len(historical_alerts)
+    stats["total_alerts"] = len(alert_store)
     
-    # Calculate severity breakdown
-    severity_stats = alert_generator.get_stats(historical_alerts)
+    # Severity breakdown is maintained incrementally by the store
+    severity_stats = alert_store.get_stats()
     
     return {
         **stats,
@@ -164,21 +170,113 @@ async def get_stats():
         "status_breakdown": {
             "active": severity_stats.get('active', 0),
             "resolved": severity_stats.get('resolved', 0)
-        }
+        },
+        "zone_breakdown": alert_store.breakdown('zone_key'),
+        "camera_breakdown": alert_store.breakdown('camera')
     }
 
+@app.get("/cameras")
+async def get_cameras():
+    """Get simulated cameras with their zone, resolution, viewers and achieved fps"""
+    return camera_fleet.stats()
+
+@app.get("/heatmap/{camera_id}")
+async def get_heatmap(camera_id: int, format: str = Query("png", pattern="^(png|raw)$")):
+    """
+    Decaying activity heatmap of one camera, refreshed every HEATMAP_UPDATE_INTERVAL seconds.
+    png: colour-mapped RGBA overlay at camera resolution; raw: the float grid.
+    """
+    heatmap = camera_fleet.heatmaps.get(camera_id)
+    if heatmap is None:
+        raise HTTPException(status_code=404, detail="Camera not found")
+    if format == "raw":
+        return heatmap.grid()
+    # Colour-mapping and PNG encoding are CPU work, keep them off the event loop
+    png = await asyncio.get_running_loop().run_in_executor(None, heatmap.png)
+    return Response(content=png, media_type="image/png")
+
 @app.get("/alerts")
-async def get_alerts(limit: int = 50):
-    """Get recent alerts"""
-    return historical_alerts[:limit]
+def get_alerts(
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    camera: Optional[str] = None,
+    zone: Optional[str] = None,
+    scenario: Optional[str] = None,
+    severity: Optional[str] = None,
+    status: Optional[str] = None,
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Get stored alerts, newest first, optionally filtered.
+    Pass the X-Next-Cursor response header back as `cursor` for the next page.
+    """
+    try:
+        alerts, next_cursor = query_alerts(
+            db, limit=limit, cursor=cursor, camera=camera, zone=zone, scenario=scenario,
+            severity=severity, status=status, start=start, end=end
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return alerts
+
+MONITOR_ALERT_FIELDS = ('timestamp', 'camera', 'zone', 'zone_key', 'scenario', 'event',
+                        'severity', 'details', 'status', 'confidence')
+
+@app.post("/alerts", status_code=201)
+async def create_alert(alert: dict = Body(...)):
+    """
+    Raise an alert from the live camera monitor (camera_monitor.py).
+    Repeats of an open incident are merged into it like any other alert.
+    """
+    missing = [field for field in ('camera', 'scenario', 'event') if not alert.get(field)]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Missing fields: {missing}")
+    try:
+        if alert.get('severity') is not None:
+            AlertSeverity(alert['severity'])
+        if alert.get('zone_key') is not None:
+            Zone(alert['zone_key'])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    incident = raise_alert({field: alert[field] for field in MONITOR_ALERT_FIELDS if field in alert})
+    if incident:
+        logger.info(f"Monitor alert: {incident['event']} on {incident['camera']}")
+    return {"id": incident['id'] if incident else None, "merged": incident is None}
 
 @app.get("/alerts/{alert_id}")
-async def get_alert(alert_id: int):
-    """Get specific alert by ID"""
-    alert = next((a for a in historical_alerts if a['id'] == alert_id), None)
-    if alert:
+def get_alert(alert_id: int, db: Session = Depends(get_db)):
+    """Get specific alert by ID, from the recent window or the database"""
+    alert = alert_store.get(alert_id)
+    if alert is not None:
         return alert
-    return {"error": "Alert not found"}, 404
+    row = db.get(Alert, alert_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Alert not found")
+    return row_to_alert(row)
+
+def handle_client_message(websocket: WebSocket, data: str):
+    """
+    Apply a subscribe message, e.g.
+    {"type": "subscribe", "zones": ["classroom"], "min_severity": "high"}.
+    Omitted fields match everything; the latest subscribe replaces the previous one.
+    """
+    try:
+        message = json.loads(data)
+    except json.JSONDecodeError:
+        return
+    if not isinstance(message, dict) or message.get("type") != "subscribe":
+        return
+    try:
+        filters = manager.subscribe(websocket, message)
+    except ValueError as e:
+        manager.send(websocket, {"type": "error", "message": str(e)})
+        return
+    manager.send(websocket, {"type": "subscribed", "filters": filters})
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
@@ -187,7 +285,7 @@ async def websocket_endpoint(websocket: WebSocket):
     
     try:
         # Send initial connection message
-        await websocket.send_json({
+        manager.send(websocket, {
             "type": "connection",
             "message": "Connected to CCTV Monitoring System",
             "timestamp": datetime.datetime.now().isoformat()
@@ -196,16 +294,18 @@ async def websocket_endpoint(websocket: WebSocket):
         # Keep connection alive and listen for messages
         while True:
             try:
-                # Wait for messages from client (ping/pong)
+                # Wait for messages from client (ping/pong, subscribe)
                 data = await asyncio.wait_for(websocket.receive_text(), timeout=30.0)
                 
                 # Echo back or handle client messages
                 if data == "ping":
-                    await websocket.send_json({"type": "pong"})
+                    manager.send(websocket, {"type": "pong"})
+                else:
+                    handle_client_message(websocket, data)
                     
             except asyncio.TimeoutError:
                 # Send keepalive
-                await websocket.send_json({
+                manager.send(websocket, {
                     "type": "keepalive",
                     "timestamp": datetime.datetime.now().isoformat()
                 })
@@ -223,45 +323,76 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": datetime.datetime.now().isoformat(),
-        "active_connections": len(manager.active_connections)
+        "active_connections": len(manager),
+        "websocket_clients": manager.stats(),
+        "video_viewers": sum(b.viewers for b in camera_fleet.broadcasters.values()),
+        "alert_writer": alert_writer.stats(),
+        "activity_recorder": activity_recorder.stats(),
+        "alert_throttle": alert_throttle.stats()
     }
 
 # Background task to periodically generate alerts
 async def periodic_alert_generator():
     """Generate alerts periodically"""
-    global historical_alerts
-    
     while True:
         try:
             await asyncio.sleep(15)  # Every 15 seconds
             
             # 30% chance to generate an alert
             if np.random.random() < 0.3:
-                alert_data = alert_generator.generate_alert()
-                historical_alerts.insert(0, alert_data)
-                
-                # Broadcast to all connected clients
-                await manager.broadcast(alert_data)
-                
-                logger.info(f"Periodic alert: {alert_data['event']}")
+                alert_data = raise_alert(alert_generator.generate_alert())
+                if alert_data:
+                    logger.info(f"Periodic alert: {alert_data['event']}")
                 
         except Exception as e:
             logger.error(f"Error in periodic alert generator: {e}")
 
+async def incident_sweeper():
+    """Resolve incidents that went quiet for their cooldown and publish the change"""
+    while True:
+        try:
+            await asyncio.sleep(alert_throttle.sweep_interval)
+            for incident in alert_throttle.expire():
+                # The store may have evicted the incident; update_status then only skips its counters
+                alert_store.update_status(incident['id'], 'resolved')
+                incident['status'] = 'resolved'
+                alert_writer.enqueue_update(incident)
+                manager.broadcast_alert({**incident, "type": "incident_update"})
+                logger.info(f"Incident resolved: {incident['event']} on {incident['camera']} "
+                            f"after {incident['occurrences']} occurrences")
+        except Exception as e:
+            logger.error(f"Error in incident sweeper: {e}")
+
 @app.on_event("startup")
 async def startup_event():
     """Run on application startup"""
+    global camera_fleet
     logger.info("Starting CCTV Monitoring System...")
-    logger.info(f"Fake camera initialized: {fake_camera.width}x{fake_camera.height}")
-    logger.info(f"Historical alerts loaded: {len(historical_alerts)}")
+    init_db()
+    load_alerts()
+    logger.info(f"Historical alerts loaded: {len(alert_store)}")
+    
+    # Start writing queued alerts to the database
+    alert_writer.start()
+    activity_recorder.start()
+    
+    # Start the simulated cameras
+    camera_fleet = CameraFleet(on_alert=handle_camera_alert, on_activity=handle_camera_activity)
+    stats["active_cameras"] = len(camera_fleet)
+    camera_fleet.start(asyncio.get_running_loop())
     
     # Start periodic alert generator
     asyncio.create_task(periodic_alert_generator())
+    asyncio.create_task(incident_sweeper())
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Run on application shutdown"""
     logger.info("Shutting down CCTV Monitoring System...")
+    if camera_fleet:
+        camera_fleet.stop()
+    activity_recorder.stop()
+    await alert_writer.stop()
 
 if __name__ == "__main__":
     uvicorn.run(
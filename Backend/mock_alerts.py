@@ -14,7 +14,7 @@ class MockAlertGenerator:
                 'event': 'Unsupervised Child Detected',
                 'severity': 'CRITICAL',
                 'details': 'Child detected without staff supervision in play area',
-                'zones': ['outdoor_play', 'classroom_a']
+                'zones': ['outdoor_play', 'classroom']
             },
             {
                 'scenario': 'restricted_area_entry',
@@ -49,7 +49,7 @@ class MockAlertGenerator:
                 'event': 'Uniform Policy Violation',
                 'severity': 'MEDIUM',
                 'details': 'Staff member not wearing required uniform',
-                'zones': ['classroom_a', 'outdoor_play']
+                'zones': ['classroom', 'outdoor_play']
             },
             {
                 'scenario': 'unusual_activity',
@@ -63,13 +63,13 @@ class MockAlertGenerator:
                 'event': 'Person Count Changed',
                 'severity': 'LOW',
                 'details': 'Number of people in zone has changed',
-                'zones': ['outdoor_play', 'classroom_a']
+                'zones': ['outdoor_play', 'classroom']
             }
         ]
         
         self.zone_names = {
             'outdoor_play': 'Outdoor Play Area',
-            'classroom_a': 'Classroom A',
+            'classroom': 'Classroom',
             'staff_room': 'Staff Room',
             'hallway': 'Main Hallway',
             'entrance': 'Main Entrance'
@@ -0,0 +1,110 @@
+"""
+Alert Throttle - Coalesces repeated alerts into incidents with per-severity cooldowns
+"""
+import datetime
+import time
+import logging
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+import config
+from config import AlertSeverity
+
+logger = logging.getLogger(__name__)
+
+
+def region_key(bbox: List[float], size: int = config.ALERT_REGION_SIZE) -> str:
+    """Grid cell of a box centre, the throttling subject for objects without a track."""
+    x1, y1, x2, y2 = bbox
+    return f"{int((x1 + x2) / 2) // size},{int((y1 + y2) / 2) // size}"
+
+
+class AlertThrottle:
+    """
+    Turns a stream of per-frame alerts into incidents.
+
+    The first alert for a (camera, scenario, subject) key opens an incident.
+    Repeats while it is open only bump its 'occurrences' and 'last_seen'.
+    The incident closes once nothing has been seen for the cooldown of its
+    severity. Callers act only on the open and close transitions, so logs,
+    WebSockets and the database see one event per incident rather than one
+    per frame.
+    """
+
+    def __init__(
+        self,
+        cooldowns: Dict[AlertSeverity, float] = config.ALERT_COOLDOWN_SECONDS,
+        sweep_interval: float = 1.0
+    ):
+        self.cooldowns = {AlertSeverity(severity).value: seconds for severity, seconds in cooldowns.items()}
+        self.sweep_interval = sweep_interval
+        self.open: Dict[Tuple[Any, str, Hashable], Dict[str, Any]] = {}
+        self._last_seen: Dict[Tuple[Any, str, Hashable], float] = {}
+        self._last_sweep = 0.0
+
+        self.opened = 0
+        self.suppressed = 0
+
+    def _severity(self, alert: Dict[str, Any], scenario: str) -> str:
+        severity = alert.get('severity') or config.SCENARIO_SEVERITY.get(scenario, AlertSeverity.MEDIUM)
+        return AlertSeverity(severity).value
+
+    def observe(
+        self,
+        camera: Any,
+        scenario: str,
+        subject: Hashable,
+        alert: Dict[str, Any],
+        now: Optional[float] = None
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        Record one occurrence of an alert.
+
+        Returns:
+            (incident, is_new). A new incident is `alert` itself with
+            'occurrences' and 'last_seen' added; a repeat returns the open
+            incident it was merged into.
+        """
+        now = time.monotonic() if now is None else now
+        key = (camera, scenario, subject)
+        incident = self.open.get(key)
+        if incident is not None and now - self._last_seen[key] <= self.cooldowns[incident['severity']]:
+            incident['occurrences'] += 1
+            incident['last_seen'] = datetime.datetime.now().isoformat()
+            self._last_seen[key] = now
+            self.suppressed += 1
+            return incident, False
+
+        alert['severity'] = self._severity(alert, scenario)
+        alert['occurrences'] = 1
+        alert['last_seen'] = datetime.datetime.now().isoformat()
+        self.open[key] = alert
+        self._last_seen[key] = now
+        self.opened += 1
+        return alert, True
+
+    def expire(self, now: Optional[float] = None, force: bool = False) -> List[Dict[str, Any]]:
+        """
+        Close incidents that have been quiet for longer than their cooldown.
+        Sweeps at most every sweep_interval seconds unless forced.
+
+        Returns:
+            The incidents that just closed; marking them resolved is up to the caller.
+        """
+        now = time.monotonic() if now is None else now
+        if not force and now - self._last_sweep < self.sweep_interval:
+            return []
+        self._last_sweep = now
+
+        closed = []
+        for key, incident in list(self.open.items()):
+            if now - self._last_seen[key] > self.cooldowns[incident['severity']]:
+                del self.open[key]
+                del self._last_seen[key]
+                closed.append(incident)
+        return closed
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'open_incidents': len(self.open),
+            'incidents_opened': self.opened,
+            'repeats_suppressed': self.suppressed,
+        }
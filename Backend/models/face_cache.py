@@ -0,0 +1,153 @@
+"""
+Face Encoding Cache - Persists roster encodings so startup only re-encodes new or changed photos
+"""
+import os
+import json
+import logging
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    import face_recognition
+except ImportError:
+    logger.warning("face_recognition not found")
+    face_recognition = None
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+# Sidecar files written next to the photos in each faces directory
+CACHE_ENCODINGS_FILE = ".face_cache.npy"
+CACHE_INDEX_FILE = ".face_cache.json"
+
+
+def _encode_image(filepath: str) -> Tuple[bool, Optional[np.ndarray]]:
+    """
+    Encode the first face in an image.
+
+    Returns:
+        (ok, encoding): encoding is None if no face was found; ok is False
+        if the image could not be read, so the result must not be cached.
+    """
+    try:
+        image = face_recognition.load_image_file(filepath)
+        encodings = face_recognition.face_encodings(image)
+    except Exception as e:
+        logger.error(f"Error processing face image {filepath}: {e}")
+        return False, None
+    return True, np.asarray(encodings[0], dtype=np.float32) if encodings else None
+
+
+def _read_cache(directory: str) -> Tuple[dict, Optional[np.ndarray]]:
+    index_path = os.path.join(directory, CACHE_INDEX_FILE)
+    encodings_path = os.path.join(directory, CACHE_ENCODINGS_FILE)
+    if not (os.path.exists(index_path) and os.path.exists(encodings_path)):
+        return {}, None
+    try:
+        with open(index_path) as f:
+            index = json.load(f)
+        return index, np.load(encodings_path, mmap_mode='r')
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable face cache in {directory}: {e}")
+        return {}, None
+
+
+def _write_cache(directory: str, index: dict, encodings: np.ndarray):
+    """
+    Write both sidecar files atomically so a crash never leaves a torn cache.
+    Each writer uses its own temporary files, so processes loading the same
+    roster at once never write into each other's files.
+    """
+    index_path = os.path.join(directory, CACHE_INDEX_FILE)
+    encodings_path = os.path.join(directory, CACHE_ENCODINGS_FILE)
+    temporary = []
+    try:
+        fd, encodings_tmp = tempfile.mkstemp(dir=directory, suffix=".npy.tmp")
+        temporary.append(encodings_tmp)
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, encodings)
+        fd, index_tmp = tempfile.mkstemp(dir=directory, suffix=".json.tmp")
+        temporary.append(index_tmp)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(index, f)
+        os.replace(encodings_tmp, encodings_path)
+        os.replace(index_tmp, index_path)
+    except OSError as e:
+        logger.warning(f"Could not write face cache in {directory}: {e}")
+    finally:
+        for path in temporary:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def load_face_encodings(directory: str, workers: Optional[int] = None) -> List[Tuple[str, np.ndarray]]:
+    """
+    Load one encoding per face image in a directory.
+
+    Encodings are cached in sidecar files keyed by file name, size and mtime.
+    Only images that are new or changed since the last run are encoded, in
+    parallel across worker processes.
+
+    Returns:
+        List of (name, encoding) pairs, name being the file name without extension.
+    """
+    if not os.path.exists(directory):
+        return []
+
+    start = time.perf_counter()
+    index, cached = _read_cache(directory)
+
+    entries = {}
+    stale = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        stat = os.stat(os.path.join(directory, filename))
+        key = [stat.st_size, stat.st_mtime_ns]
+        entry = index.get(filename)
+        # A row past the end means the index belongs to a different encodings file
+        if cached is not None and entry and entry['key'] == key and entry['row'] < len(cached):
+            row = entry['row']
+            entries[filename] = (key, cached[row] if row >= 0 else None)
+        else:
+            stale.append((filename, key))
+
+    cached_count = len(entries)
+    if stale and face_recognition:
+        logger.info(f"Encoding {len(stale)} new or changed face images in {directory}")
+        paths = [os.path.join(directory, filename) for filename, _ in stale]
+        if len(paths) > 1 and workers != 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                encoded = list(pool.map(_encode_image, paths, chunksize=8))
+        else:
+            encoded = [_encode_image(path) for path in paths]
+        for (filename, key), (ok, encoding) in zip(stale, encoded):
+            if not ok:
+                continue  # Read errors are retried on the next load
+            if encoding is None:
+                logger.warning(f"No face found in {filename}")
+            entries[filename] = (key, encoding)
+
+    # Rewrite the cache when anything was encoded or photos were removed
+    if len(entries) > cached_count or len(entries) != len(index):
+        new_index = {}
+        rows = []
+        for filename, (key, encoding) in entries.items():
+            new_index[filename] = {'key': key, 'row': len(rows) if encoding is not None else -1}
+            if encoding is not None:
+                rows.append(encoding)
+        matrix = np.stack(rows).astype(np.float32) if rows else np.empty((0, 128), dtype=np.float32)
+        _write_cache(directory, new_index, matrix)
+
+    faces = [
+        (os.path.splitext(filename)[0], np.asarray(encoding, dtype=np.float32))
+        for filename, (_, encoding) in entries.items()
+        if encoding is not None
+    ]
+    logger.info(f"Loaded {len(faces)} face encodings from {directory} "
+                f"({cached_count} cached) in {time.perf_counter() - start:.2f}s")
+    return faces
@@ -0,0 +1,149 @@
+"""
+Face Index - Nearest-neighbour matching of face encodings against the known roster
+"""
+import logging
+from typing import List, Dict, Any, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class FaceIndex:
+    """
+    Holds every known encoding in one contiguous float32 matrix with parallel
+    name and person-type arrays, so all faces in a frame are matched with a
+    single matrix distance computation.
+
+    With num_partitions > 0 and a roster larger than partition_threshold, the
+    encodings are clustered with k-means and each query only searches the
+    num_probes closest clusters (an IVF-style approximate search).
+    """
+
+    def __init__(
+        self,
+        tolerance: float = 0.6,
+        num_partitions: int = 0,
+        num_probes: int = 4,
+        partition_threshold: int = 2000
+    ):
+        self.tolerance = tolerance
+        self.num_partitions = num_partitions
+        self.num_probes = num_probes
+        self.partition_threshold = partition_threshold
+
+        self._pending_encodings: List[np.ndarray] = []
+        self._pending_names: List[str] = []
+        self._pending_types: List[str] = []
+
+        self.encodings = np.empty((0, 128), dtype=np.float32)
+        self.names = np.empty(0, dtype=object)
+        self.person_types = np.empty(0, dtype=object)
+        self._sq_norms = np.empty(0, dtype=np.float32)
+        self._centroids: Optional[np.ndarray] = None
+        self._partitions: List[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return len(self.names) + len(self._pending_names)
+
+    def add(self, encoding: np.ndarray, name: str, person_type: str):
+        """Queue an encoding; the matrix is rebuilt on the next query."""
+        self._pending_encodings.append(np.asarray(encoding, dtype=np.float32))
+        self._pending_names.append(name)
+        self._pending_types.append(person_type)
+
+    def _build(self):
+        if not self._pending_names:
+            return
+
+        self.encodings = np.ascontiguousarray(
+            np.vstack([self.encodings, np.stack(self._pending_encodings)]), dtype=np.float32
+        )
+        self.names = np.concatenate([self.names, np.array(self._pending_names, dtype=object)])
+        self.person_types = np.concatenate([self.person_types, np.array(self._pending_types, dtype=object)])
+        self._sq_norms = np.einsum('ij,ij->i', self.encodings, self.encodings)
+        self._pending_encodings.clear()
+        self._pending_names.clear()
+        self._pending_types.clear()
+
+        if self.num_partitions > 0 and len(self.names) >= self.partition_threshold:
+            self._build_partitions()
+        else:
+            self._centroids = None
+            self._partitions = []
+
+    def _build_partitions(self, iterations: int = 10):
+        """Cluster the roster with a few rounds of k-means."""
+        k = min(self.num_partitions, len(self.names))
+        rng = np.random.default_rng(0)
+        centroids = self.encodings[rng.choice(len(self.encodings), k, replace=False)].copy()
+
+        for _ in range(iterations):
+            labels = self._pairwise_distances(self.encodings, centroids).argmin(axis=1)
+            for c in range(k):
+                members = self.encodings[labels == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+
+        labels = self._pairwise_distances(self.encodings, centroids).argmin(axis=1)
+        self._centroids = centroids
+        self._partitions = [np.flatnonzero(labels == c) for c in range(k)]
+        logger.info(f"Face index partitioned {len(self.names)} encodings into {k} clusters")
+
+    @staticmethod
+    def _pairwise_distances(queries: np.ndarray, encodings: np.ndarray,
+                            enc_sq_norms: Optional[np.ndarray] = None) -> np.ndarray:
+        """Euclidean distances via |q|^2 + |e|^2 - 2 q.e, as one matrix product."""
+        if enc_sq_norms is None:
+            enc_sq_norms = np.einsum('ij,ij->i', encodings, encodings)
+        q_sq_norms = np.einsum('ij,ij->i', queries, queries)
+        sq = q_sq_norms[:, None] + enc_sq_norms[None, :] - 2.0 * queries @ encodings.T
+        return np.sqrt(np.maximum(sq, 0.0))
+
+    def match(self, face_encodings: List[np.ndarray]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Find the best match for every query face.
+
+        Returns:
+            For each query, a dict with name, person_type and distance, or None
+            when the closest known face is further than the tolerance.
+        """
+        self._build()
+        if not len(face_encodings) or not len(self.names):
+            return [None] * len(face_encodings)
+
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, self.encodings.shape[1])
+
+        if self._centroids is None:
+            distances = self._pairwise_distances(queries, self.encodings, self._sq_norms)
+            best = distances.argmin(axis=1)
+            best_distances = distances[np.arange(len(queries)), best]
+        else:
+            best, best_distances = self._match_partitioned(queries)
+
+        return [
+            {
+                'name': self.names[idx],
+                'person_type': self.person_types[idx],
+                'distance': float(dist)
+            } if dist <= self.tolerance else None
+            for idx, dist in zip(best.tolist(), best_distances.tolist())
+        ]
+
+    def _match_partitioned(self, queries: np.ndarray):
+        probes = min(self.num_probes, len(self._partitions))
+        centroid_distances = self._pairwise_distances(queries, self._centroids)
+        nearest_clusters = np.argsort(centroid_distances, axis=1)[:, :probes]
+
+        best = np.zeros(len(queries), dtype=np.int64)
+        best_distances = np.full(len(queries), np.inf, dtype=np.float32)
+        for q, clusters in enumerate(nearest_clusters):
+            candidates = np.concatenate([self._partitions[c] for c in clusters])
+            if not len(candidates):
+                continue
+            distances = self._pairwise_distances(
+                queries[q:q + 1], self.encodings[candidates], self._sq_norms[candidates]
+            )[0]
+            i = distances.argmin()
+            best[q] = candidates[i]
+            best_distances[q] = distances[i]
+        return best, best_distances
@@ -5,35 +5,24 @@ import cv2
 import logging
 from typing import List, Dict, Any
 import config
+from config import AlertSeverity
+from models.model_registry import model_registry
 
 logger = logging.getLogger(__name__)
 
-try:
-    from ultralytics import YOLO
-except ImportError:
-    logger.error("ultralytics not found")
-    YOLO = None
-
 class FenceDefectDetector:
     def __init__(self):
         self.model = self._load_model()
         self.critical_classes = config.FENCE_DEFECT_CLASSES
     
     def _load_model(self):
-        """Load fence defect detection model"""
-        if YOLO:
-            try:
-                # Try to load custom fence model, fallback to general YOLO
-                if config.FENCE_MODEL_PATH and os.path.exists(config.FENCE_MODEL_PATH):
-                    logger.info(f"Loading fence defect model from {config.FENCE_MODEL_PATH}")
-                    return YOLO(config.FENCE_MODEL_PATH)
-                else:
-                    logger.warning("Fence model not found, using general YOLO")
-                    return YOLO(config.YOLO_MODEL_PATH)
-            except Exception as e:
-                logger.error(f"Failed to load fence model: {e}")
-                return None
-        return None
+        """Load fence defect detection model from the shared registry"""
+        # Try to load custom fence model, fallback to general YOLO
+        if config.FENCE_MODEL_PATH and model_registry.available(config.FENCE_MODEL_PATH):
+            logger.info(f"Using fence defect model from {config.FENCE_MODEL_PATH}")
+            return model_registry.get(config.FENCE_MODEL_PATH)
+        logger.warning("Fence model not found, using general YOLO")
+        return model_registry.get(config.YOLO_MODEL_PATH)
     
     def detect_defects(self, frame: Any) -> List[Dict[str, Any]]:
         """
@@ -47,7 +36,8 @@ class FenceDefectDetector:
             return defects
         
         try:
-            results = self.model(frame, verbose=False)
+            with model_registry.predict_lock(self.model):
+                results = self.model(frame, iou=config.INFERENCE_IOU_THRESHOLD, verbose=False)
             for result in results:
                 for box in result.boxes:
                     cls_id = int(box.cls[0])
@@ -60,12 +50,9 @@ class FenceDefectDetector:
                             'type': label,
                             'confidence': conf,
                             'bbox': box.xyxy[0].tolist(),
-                            'severity': 'CRITICAL'
+                            'severity': AlertSeverity.CRITICAL.value
                         })
         except Exception as e:
             logger.error(f"Error detecting fence defects: {e}")
         
         return defects
-
-# Import os at the top
-import os
@@ -0,0 +1,74 @@
+"""
+Fence Geometry - Per-camera fence lines with a precomputed distance map for proximity checks
+"""
+import logging
+from typing import List, Optional, Sequence, Tuple
+import cv2
+import numpy as np
+import config
+
+logger = logging.getLogger(__name__)
+
+Point = Tuple[float, float]
+
+
+class FenceGeometry:
+    """
+    Distance from every pixel of a camera's frame to the nearest fence line.
+
+    The fence lines are drawn once into a mask and run through a distance
+    transform, so checking any number of points costs one array gather
+    instead of a geometry test per point and fence segment. Distances are
+    divided by scale, the frame's pixels per stream pixel, so thresholds
+    mean the same on downscaled frames.
+    """
+
+    def __init__(self, width: int, height: int, lines: Sequence[Sequence[Point]], scale: float = 1.0):
+        self.width = width
+        self.height = height
+        mask = np.full((height, width), 255, dtype=np.uint8)
+        for line in lines:
+            pts = np.round(np.asarray(line, dtype=np.float32)).astype(np.int32).reshape(-1, 1, 2)
+            cv2.polylines(mask, [pts], isClosed=False, color=0, thickness=1)
+        self.distance = cv2.distanceTransform(mask, cv2.DIST_L2, cv2.DIST_MASK_PRECISE)
+        if scale != 1.0:
+            self.distance /= scale
+
+    @classmethod
+    def for_camera(cls, camera_id: Optional[int], width: int, height: int) -> 'FenceGeometry':
+        """
+        Geometry for a camera's frames of the given size.
+
+        FENCE_LINES are in the camera's stream resolution and are scaled to
+        the frame. Cameras without configured lines treat the frame border
+        as the fence.
+        """
+        stream_width, stream_height = config.CAMERA_RESOLUTIONS.get(camera_id, config.SIMULATOR_RESOLUTION)
+        sx, sy = width / stream_width, height / stream_height
+        lines = config.FENCE_LINES.get(camera_id)
+        if not lines:
+            lines = [[(0, 0), (stream_width - 1, 0), (stream_width - 1, stream_height - 1),
+                      (0, stream_height - 1), (0, 0)]]
+        scaled = [[(x * sx, y * sy) for x, y in line] for line in lines]
+        return cls(width, height, scaled, scale=(sx + sy) / 2)
+
+    def distances(self, points: np.ndarray) -> np.ndarray:
+        """Distance in stream pixels to the nearest fence for an (N, 2) array of frame (x, y) points."""
+        points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        xs = np.clip(points[:, 0].astype(np.int32), 0, self.width - 1)
+        ys = np.clip(points[:, 1].astype(np.int32), 0, self.height - 1)
+        return self.distance[ys, xs]
+
+    def near(self, bboxes: List[List[float]], max_distance: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Which boxes have their centre within max_distance of a fence.
+
+        Returns:
+            (mask, distances), one entry per box.
+        """
+        if not bboxes:
+            return np.zeros(0, dtype=bool), np.zeros(0, dtype=np.float32)
+        boxes = np.asarray(bboxes, dtype=np.float32)
+        centres = (boxes[:, :2] + boxes[:, 2:4]) / 2
+        distances = self.distances(centres)
+        return distances <= max_distance, distances
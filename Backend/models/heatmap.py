@@ -0,0 +1,138 @@
+"""
+Heatmap - Per-camera decaying activity grid fed with detection foot-points
+"""
+import math
+import threading
+import time
+import logging
+from typing import Any, Dict, Iterable, Optional, Tuple
+import cv2
+import numpy as np
+import config
+
+logger = logging.getLogger(__name__)
+
+# Rebase the grid before the inflated weights lose float32 precision
+_MAX_SCALE = 1e6
+
+
+class HeatmapAccumulator:
+    """
+    Fixed-size grid of HEATMAP_CELL_SIZE cells where every foot-point adds a
+    small Gaussian splat.
+
+    Decay is never applied to the whole grid on update. New splats are
+    weighted up by decay_rate^-(t - t_ref) instead, and a read multiplies the
+    grid once by decay_rate^(now - t_ref), so an update costs O(points) and
+    is independent of the frame size. The grid is rebased occasionally to
+    keep the weights in range.
+
+    Reads are cached for update_interval seconds. Safe to update and read
+    from different threads.
+    """
+
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        cell_size: int = config.HEATMAP_CELL_SIZE,
+        decay_rate: float = config.HEATMAP_DECAY_RATE,
+        sigma: float = config.HEATMAP_KERNEL_SIGMA,
+        update_interval: float = config.HEATMAP_UPDATE_INTERVAL
+    ):
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.update_interval = update_interval
+        self._log_decay = math.log(decay_rate)
+
+        self._grid = np.zeros((math.ceil(height / cell_size), math.ceil(width / cell_size)), dtype=np.float32)
+        self._ref_time: Optional[float] = None
+
+        self._radius = max(1, math.ceil(3 * sigma))
+        axis = np.arange(-self._radius, self._radius + 1, dtype=np.float32)
+        gauss = np.exp(-axis ** 2 / (2 * sigma ** 2))
+        kernel = np.outer(gauss, gauss)
+        self._kernel = (kernel / kernel.sum()).astype(np.float32)  # Each point adds 1 in total
+
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Tuple[float, Any]] = {}
+        self.points_added = 0
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self._grid.shape
+
+    def add_points(self, points: Iterable[Tuple[float, float]], now: Optional[float] = None, weight: float = 1.0):
+        """Splat (x, y) pixel positions, typically the bottom centre of each person box."""
+        now = time.monotonic() if now is None else now
+        rows, cols = self._grid.shape
+        r = self._radius
+        with self._lock:
+            if self._ref_time is None:
+                self._ref_time = now
+            scale = math.exp(-self._log_decay * (now - self._ref_time))
+            if scale > _MAX_SCALE:
+                self._rebase(now)
+                scale = 1.0
+            splat = self._kernel * (weight * scale)
+
+            for x, y in points:
+                cx = min(max(int(x // self.cell_size), 0), cols - 1)
+                cy = min(max(int(y // self.cell_size), 0), rows - 1)
+                y0, y1 = max(cy - r, 0), min(cy + r + 1, rows)
+                x0, x1 = max(cx - r, 0), min(cx + r + 1, cols)
+                self._grid[y0:y1, x0:x1] += splat[y0 - cy + r:y1 - cy + r, x0 - cx + r:x1 - cx + r]
+                self.points_added += 1
+
+    def _rebase(self, now: float):
+        self._grid *= math.exp(self._log_decay * (now - self._ref_time))
+        self._ref_time = now
+
+    def snapshot(self, now: Optional[float] = None) -> np.ndarray:
+        """Decayed grid as of now (a copy)."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self._ref_time is None:
+                return np.zeros_like(self._grid)
+            return self._grid * np.float32(math.exp(self._log_decay * (now - self._ref_time)))
+
+    def _cached(self, key: str, now: Optional[float], build):
+        now = time.monotonic() if now is None else now
+        cached = self._cache.get(key)
+        if cached is not None and now - cached[0] < self.update_interval:
+            return cached[1]
+        value = build(now)
+        self._cache[key] = (now, value)
+        return value
+
+    def grid(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """Raw decayed grid with its geometry, refreshed every update_interval."""
+        def build(at):
+            grid = self.snapshot(at)
+            return {
+                'width': self.width,
+                'height': self.height,
+                'cell_size': self.cell_size,
+                'max': float(grid.max()),
+                'grid': np.round(grid, 4).tolist(),
+            }
+        return self._cached('grid', now, build)
+
+    def png(self, now: Optional[float] = None) -> bytes:
+        """
+        Colour-mapped heatmap at camera resolution as an RGBA PNG, transparent
+        where there is no activity, for overlaying on the video feed.
+        """
+        def build(at):
+            grid = self.snapshot(at)
+            peak = float(grid.max())
+            norm = (grid / peak if peak > 0 else grid) * 255
+            intensity = cv2.resize(norm.astype(np.uint8), (self.width, self.height), interpolation=cv2.INTER_LINEAR)
+            overlay = cv2.cvtColor(cv2.applyColorMap(intensity, cv2.COLORMAP_JET), cv2.COLOR_BGR2BGRA)
+            overlay[..., 3] = (intensity.astype(np.uint16) * 200 // 255).astype(np.uint8)
+            ret, buffer = cv2.imencode('.png', overlay)
+            if not ret:
+                raise RuntimeError("Failed to encode heatmap")
+            return buffer.tobytes()
+        return self._cached('png', now, build)
@@ -0,0 +1,182 @@
+"""
+Model Registry - Process-wide cache so every detector shares one loaded model per weights file
+"""
+import os
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import config
+from models.onnx_detector import OnnxDetector, BACKENDS as ONNX_BACKENDS
+from models.onnx_export import export_onnx, onnx_path_for
+
+logger = logging.getLogger(__name__)
+
+try:
+    from ultralytics import YOLO
+except ImportError:
+    logger.error("ultralytics not found")
+    YOLO = None
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of this process in MB, where the platform reports it."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak / (1024 * 1024) if os.uname().sysname == "Darwin" else peak / 1024
+
+
+def _parameter_mb(model: Any) -> Optional[float]:
+    """Size of the model weights in MB."""
+    if isinstance(model, OnnxDetector):
+        return os.path.getsize(model.onnx_path) / (1024 * 1024)
+    try:
+        return sum(p.numel() * p.element_size() for p in model.model.parameters()) / (1024 * 1024)
+    except Exception:
+        return None
+
+
+class ModelRegistry:
+    """
+    Lazily loads YOLO models and hands the same instance to every caller.
+
+    Models are keyed by (absolute weights path, device, backend). With the
+    "onnxruntime" or "openvino" backend the weights file's ONNX export is
+    loaded instead (exported on first use if ultralytics is available); it is
+    called the same way as an ultralytics model. Loading is guarded by a
+    per-key lock so concurrent callers wait for one load instead of racing.
+    Inference on a shared model is not thread-safe in ultralytics, so every
+    model gets a predict lock (predict_lock()) that callers hold while
+    running it.
+    """
+
+    def __init__(self):
+        self._models: Dict[Tuple[str, str, str], Any] = {}
+        self._stats: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        self._key_locks: Dict[Tuple[str, str, str], threading.Lock] = {}
+        self._predict_locks: Dict[int, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(weights_path: str, device: Optional[str], backend: Optional[str]) -> Tuple[str, str, str]:
+        # Bare names like "yolov8s.pt" are resolved by ultralytics, keep them as-is
+        path = os.path.abspath(weights_path) if os.path.exists(weights_path) else weights_path
+        return path, device or "auto", backend or config.INFERENCE_BACKEND
+
+    def get(self, weights_path: str, device: Optional[str] = None, backend: Optional[str] = None) -> Optional[Any]:
+        """
+        Get the shared model for a weights file, loading it on first use.
+
+        Args:
+            backend: "ultralytics", "onnxruntime" or "openvino"; INFERENCE_BACKEND by default.
+
+        Returns:
+            The loaded model, or None if the backend is missing or loading failed.
+        """
+        key = self._key(weights_path, device, backend)
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._stats[key]['users'] += 1
+                return model
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                model = self._models.get(key)
+                if model is not None:
+                    self._stats[key]['users'] += 1
+                    return model
+            return self._load(key)
+
+    def predict_lock(self, model: Any) -> threading.Lock:
+        """
+        Lock to hold while running a model. Detectors sharing a model get the
+        same lock, so their predict calls never overlap.
+        """
+        with self._lock:
+            return self._predict_locks.setdefault(id(model), threading.Lock())
+
+    def _load(self, key: Tuple[str, str, str]) -> Optional[Any]:
+        path, device, backend = key
+        if backend not in ONNX_BACKENDS and not YOLO:
+            return None
+
+        peak_before = _peak_rss_mb()
+        start = time.perf_counter()
+        try:
+            if backend in ONNX_BACKENDS:
+                model = self._load_onnx(path, backend)
+            else:
+                logger.info(f"Loading YOLO model from {path} (device: {device})...")
+                model = YOLO(path)
+                if device != "auto":
+                    model.to(device)
+        except Exception as e:
+            logger.error(f"Failed to load {backend} model {path}: {e}")
+            return None
+
+        load_seconds = time.perf_counter() - start
+        peak_after = _peak_rss_mb()
+        stats = {
+            'weights_path': path,
+            'device': device,
+            'backend': backend,
+            'load_seconds': round(load_seconds, 3),
+            'parameter_mb': _parameter_mb(model),
+            # Growth of the process's peak RSS during the load. Only the load
+            # that raises the peak shows up, so models loaded after a bigger
+            # one (or after other large allocations) read 0
+            'peak_rss_delta_mb': (peak_after - peak_before) if peak_before is not None else None,
+            'users': 1,
+        }
+        with self._lock:
+            self._models[key] = model
+            self._stats[key] = stats
+            self._predict_locks.setdefault(id(model), threading.Lock())
+        logger.info(f"Loaded {path} in {load_seconds:.2f}s "
+                    f"(weights: {stats['parameter_mb'] or 0:.1f} MB, "
+                    f"peak resident: +{stats['peak_rss_delta_mb'] or 0:.1f} MB)")
+        return model
+
+    @staticmethod
+    def available(weights_path: str, backend: Optional[str] = None) -> bool:
+        """Whether a weights file, or the ONNX export an ONNX backend would load, exists on disk."""
+        if os.path.exists(weights_path):
+            return True
+        return ((backend or config.INFERENCE_BACKEND) in ONNX_BACKENDS
+                and os.path.exists(onnx_path_for(weights_path, int8=config.INFERENCE_INT8)))
+
+    @staticmethod
+    def _load_onnx(weights_path: str, backend: str) -> OnnxDetector:
+        onnx_path = onnx_path_for(weights_path, int8=config.INFERENCE_INT8)
+        if not os.path.exists(onnx_path):
+            if config.INFERENCE_INT8:
+                raise FileNotFoundError(f"{onnx_path} not found, run export_models.py --int8 first")
+            if not YOLO:
+                raise FileNotFoundError(f"{onnx_path} not found and ultralytics is not installed to export it")
+            export_onnx(weights_path, output_path=onnx_path)
+        logger.info(f"Loading {onnx_path} with {backend}...")
+        return OnnxDetector(onnx_path, backend=backend)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Load time, weights size, peak RSS growth and user count for every loaded model."""
+        with self._lock:
+            return [dict(s) for s in self._stats.values()]
+
+    def clear(self):
+        """Drop every cached model so the next get() reloads it."""
+        with self._lock:
+            self._models.clear()
+            self._stats.clear()
+            self._key_locks.clear()
+            self._predict_locks.clear()
+
+model_registry = ModelRegistry()
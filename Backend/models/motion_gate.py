@@ -0,0 +1,79 @@
+"""
+Motion Gate - Skips inference on frames where nothing changed since the last inferred frame
+"""
+import time
+import logging
+from typing import Any, Dict, Optional
+import cv2
+import numpy as np
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class MotionGate:
+    """
+    Per-camera frame differencing on a downscaled, blurred grayscale frame.
+
+    Each frame is compared to the frame that last went through inference, so
+    slow changes still add up to a refresh. A refresh is also forced every
+    refresh_interval seconds regardless of motion.
+    """
+
+    def __init__(
+        self,
+        pixel_threshold: int = config.MOTION_GATE_PIXEL_THRESHOLD,
+        min_changed_fraction: float = config.MOTION_GATE_MIN_CHANGED,
+        refresh_interval: float = config.MOTION_GATE_REFRESH_SECONDS,
+        width: int = config.MOTION_GATE_WIDTH
+    ):
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_fraction = min_changed_fraction
+        self.refresh_interval = refresh_interval
+        self.width = width
+
+        self._reference: Optional[np.ndarray] = None
+        self._last_inference = 0.0
+        self.inferred_frames = 0
+        self.gated_frames = 0
+
+    def _prepare(self, frame: Any) -> np.ndarray:
+        height, width = frame.shape[:2]
+        small = cv2.resize(frame, (self.width, max(1, height * self.width // width)), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def should_infer(self, frame: Any, now: Optional[float] = None) -> bool:
+        """
+        Decide whether a frame needs inference.
+
+        Returns:
+            True if the frame changed enough or a refresh is due, False to reuse the last results.
+        """
+        now = time.monotonic() if now is None else now
+        gray = self._prepare(frame)
+
+        if self._reference is None or self._reference.shape != gray.shape \
+                or now - self._last_inference >= self.refresh_interval:
+            changed = True
+        else:
+            diff = cv2.absdiff(gray, self._reference)
+            changed_fraction = np.count_nonzero(diff > self.pixel_threshold) / diff.size
+            changed = bool(changed_fraction >= self.min_changed_fraction)
+
+        if changed:
+            self._reference = gray
+            self._last_inference = now
+            self.inferred_frames += 1
+        else:
+            self.gated_frames += 1
+        return changed
+
+    def stats(self) -> Dict[str, Any]:
+        """Inferred and gated frame counts, for tuning the thresholds."""
+        total = self.inferred_frames + self.gated_frames
+        return {
+            'inferred_frames': self.inferred_frames,
+            'gated_frames': self.gated_frames,
+            'gated_ratio': round(self.gated_frames / total, 3) if total else 0.0
+        }
@@ -0,0 +1,240 @@
+"""
+ONNX Detector - CPU inference of exported YOLO models through ONNX Runtime or OpenVINO
+"""
+import os
+import json
+import ast
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import cv2
+import numpy as np
+import config
+
+logger = logging.getLogger(__name__)
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+try:
+    import openvino
+except ImportError:
+    openvino = None
+
+BACKENDS = ("onnxruntime", "openvino")
+
+# Boxes of different classes are shifted this far apart so one NMS pass keeps them separate
+_CLASS_OFFSET = 4096
+
+
+def letterbox(frame: np.ndarray, size: int) -> Tuple[np.ndarray, float, Tuple[float, float]]:
+    """
+    Resize a BGR frame to fit size x size, keeping its aspect ratio, and pad
+    the rest with grey as ultralytics does.
+
+    Returns:
+        (padded image, scale, (pad_x, pad_y)).
+    """
+    height, width = frame.shape[:2]
+    scale = min(size / width, size / height)
+    new_width, new_height = round(width * scale), round(height * scale)
+    pad_x, pad_y = (size - new_width) / 2, (size - new_height) / 2
+    if (new_width, new_height) != (width, height):
+        frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    top, bottom = round(pad_y - 0.1), round(pad_y + 0.1)
+    left, right = round(pad_x - 0.1), round(pad_x + 0.1)
+    padded = cv2.copyMakeBorder(frame, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+    return padded, scale, (left, top)
+
+
+def preprocess(frames: Sequence[np.ndarray], size: int) -> Tuple[np.ndarray, List[Tuple[float, Tuple[float, float]]]]:
+    """Letterbox BGR frames into one NCHW float32 RGB batch scaled to [0, 1]."""
+    images, transforms = [], []
+    for frame in frames:
+        image, scale, pad = letterbox(frame, size)
+        images.append(image)
+        transforms.append((scale, pad))
+    batch = np.stack(images)[..., ::-1].transpose(0, 3, 1, 2)
+    return np.ascontiguousarray(batch, dtype=np.float32) / 255.0, transforms
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """
+    Greedy non-maximum suppression.
+
+    Returns:
+        Indices of the kept boxes, highest score first.
+    """
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1) * (y2 - y1)
+    order = np.argsort(-scores)
+    keep = []
+    while order.size:
+        best, rest = order[0], order[1:]
+        keep.append(best)
+        w = np.clip(np.minimum(x2[best], x2[rest]) - np.maximum(x1[best], x1[rest]), 0, None)
+        h = np.clip(np.minimum(y2[best], y2[rest]) - np.maximum(y1[best], y1[rest]), 0, None)
+        inter = w * h
+        iou = inter / (areas[best] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+def postprocess(
+    output: np.ndarray,
+    transform: Tuple[float, Tuple[float, float]],
+    shape: Tuple[int, int],
+    conf: float,
+    iou: float,
+    classes: Optional[List[int]] = None,
+    max_det: int = 300
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Decode one image's YOLOv8 head output (4 + num_classes, anchors) into
+    boxes in frame pixels.
+
+    Returns:
+        (xyxy, conf, cls) arrays after class-aware NMS.
+    """
+    pred = output.T
+    class_scores = pred[:, 4:]
+    cls = class_scores.argmax(axis=1)
+    scores = class_scores[np.arange(len(cls)), cls]
+    keep = scores >= conf
+    if classes is not None:
+        keep &= np.isin(cls, classes)
+    pred, cls, scores = pred[keep], cls[keep], scores[keep]
+    if not len(pred):
+        return np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32)
+
+    cx, cy, w, h = pred[:, 0], pred[:, 1], pred[:, 2], pred[:, 3]
+    boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+    kept = nms(boxes + (cls * _CLASS_OFFSET)[:, None], scores, iou)[:max_det]
+    boxes, scores, cls = boxes[kept], scores[kept], cls[kept]
+
+    scale, (pad_x, pad_y) = transform
+    boxes = (boxes - [pad_x, pad_y, pad_x, pad_y]) / scale
+    height, width = shape
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, width)
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, height)
+    return boxes.astype(np.float32), scores.astype(np.float32), cls.astype(np.float32)
+
+
+class Boxes:
+    """The subset of ultralytics' Boxes that the detectors read, over numpy arrays."""
+
+    def __init__(self, xyxy: np.ndarray, conf: np.ndarray, cls: np.ndarray):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+
+    def cpu(self) -> 'Boxes':
+        return self
+
+    def numpy(self) -> 'Boxes':
+        return self
+
+    def __len__(self) -> int:
+        return len(self.conf)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield Boxes(self.xyxy[i:i + 1], self.conf[i:i + 1], self.cls[i:i + 1])
+
+
+class Results:
+    def __init__(self, boxes: Boxes):
+        self.boxes = boxes
+
+
+def load_names(onnx_path: str, session: Any = None) -> Dict[int, str]:
+    """
+    Class names of an exported model, from the sidecar JSON written at
+    export, or the ultralytics metadata embedded in the ONNX file.
+    """
+    sidecar = os.path.splitext(onnx_path)[0] + ".json"
+    if os.path.exists(sidecar):
+        with open(sidecar) as f:
+            return {int(k): v for k, v in json.load(f)['names'].items()}
+    if session is not None:
+        names = session.get_modelmeta().custom_metadata_map.get('names')
+        if names:
+            return {int(k): v for k, v in ast.literal_eval(names).items()}
+    raise ValueError(f"No class names found for {onnx_path}")
+
+
+class OnnxDetector:
+    """
+    Runs an exported YOLOv8 ONNX model on the CPU and decodes it with our own
+    NMS.
+
+    Called like an ultralytics model, model(frames, conf=..., classes=...),
+    and returns results whose boxes expose xyxy/conf/cls arrays, so
+    CCTVSystem and FenceDefectDetector work unchanged on either backend.
+    """
+
+    def __init__(
+        self,
+        onnx_path: str,
+        backend: str = "onnxruntime",
+        image_size: int = config.INFERENCE_IMAGE_SIZE,
+        iou_threshold: float = config.INFERENCE_IOU_THRESHOLD,
+        threads: int = config.INFERENCE_THREADS
+    ):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown ONNX backend: {backend}")
+        self.onnx_path = onnx_path
+        self.backend = backend
+        self.image_size = image_size
+        self.iou_threshold = iou_threshold
+
+        session = None
+        if backend == "onnxruntime":
+            if onnxruntime is None:
+                raise ImportError("onnxruntime is not installed")
+            options = onnxruntime.SessionOptions()
+            if threads:
+                options.intra_op_num_threads = threads
+            session = onnxruntime.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+            model_input = session.get_inputs()[0]
+            self._run = lambda batch: session.run(None, {model_input.name: batch})[0]
+            batch_axis = model_input.shape[0]
+            self.fixed_batch = batch_axis if isinstance(batch_axis, int) else None
+        else:
+            if openvino is None:
+                raise ImportError("openvino is not installed")
+            properties = {"PERFORMANCE_HINT": "LATENCY"}
+            if threads:
+                properties["INFERENCE_NUM_THREADS"] = threads
+            compiled = openvino.Core().compile_model(onnx_path, "CPU", properties)
+            output = compiled.output(0)
+            self._run = lambda batch: compiled(batch)[output]
+            batch_axis = compiled.input(0).get_partial_shape()[0]
+            self.fixed_batch = batch_axis.get_length() if batch_axis.is_static else None
+
+        self.names = load_names(onnx_path, session)
+
+    def __call__(
+        self,
+        frames: Any,
+        conf: float = 0.25,
+        classes: Optional[List[int]] = None,
+        iou: Optional[float] = None,
+        verbose: bool = False
+    ) -> List[Results]:
+        if isinstance(frames, np.ndarray):
+            frames = [frames]
+        if not len(frames):
+            return []
+        batch, transforms = preprocess(frames, self.image_size)
+        if self.fixed_batch == 1 and len(frames) > 1:
+            # Exported without a dynamic batch axis
+            outputs = np.concatenate([self._run(batch[i:i + 1]) for i in range(len(frames))])
+        else:
+            outputs = self._run(batch)
+        iou = self.iou_threshold if iou is None else iou
+        return [
+            Results(Boxes(*postprocess(output, transform, frame.shape[:2], conf, iou, classes)))
+            for output, transform, frame in zip(outputs, transforms, frames)
+        ]
@@ -0,0 +1,176 @@
+"""
+ONNX Export - Converts YOLO weights to ONNX and optionally quantizes them to INT8
+"""
+import os
+import re
+import json
+import shutil
+import logging
+import tempfile
+from typing import Iterator, List, Optional
+import cv2
+import numpy as np
+import config
+from models.onnx_detector import preprocess
+
+logger = logging.getLogger(__name__)
+
+try:
+    from ultralytics import YOLO
+except ImportError:
+    YOLO = None
+
+try:
+    import onnx
+    from onnxruntime.quantization import (
+        CalibrationDataReader, CalibrationMethod, QuantFormat, QuantType, quantize_static
+    )
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+except ImportError:
+    onnx = None
+    CalibrationDataReader = object
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+def onnx_path_for(weights_path: str, int8: bool = False) -> str:
+    """Where the ONNX export of a weights file lives in ONNX_MODEL_DIR."""
+    stem = os.path.splitext(os.path.basename(weights_path))[0]
+    return os.path.join(config.ONNX_MODEL_DIR, f"{stem}{'_int8' if int8 else ''}.onnx")
+
+
+def _write_sidecar(onnx_path: str, names: dict, image_size: int, int8: bool):
+    with open(os.path.splitext(onnx_path)[0] + ".json", "w") as f:
+        json.dump({'names': {str(k): v for k, v in names.items()}, 'image_size': image_size, 'int8': int8}, f, indent=2)
+
+
+def export_onnx(weights_path: str, image_size: int = config.INFERENCE_IMAGE_SIZE, output_path: Optional[str] = None) -> str:
+    """
+    Export YOLO weights to ONNX with a dynamic batch axis and write the class
+    names next to it.
+
+    Returns:
+        Path of the exported model.
+
+    Raises:
+        ImportError: If ultralytics is not installed.
+    """
+    if YOLO is None:
+        raise ImportError("ultralytics is required to export models")
+    output_path = output_path or onnx_path_for(weights_path)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    logger.info(f"Exporting {weights_path} to ONNX ({image_size}px)...")
+    model = YOLO(weights_path)
+    exported = model.export(format="onnx", imgsz=image_size, dynamic=True, simplify=True, verbose=False)
+    if os.path.abspath(exported) != os.path.abspath(output_path):
+        shutil.move(exported, output_path)
+    _write_sidecar(output_path, model.names, image_size, int8=False)
+    logger.info(f"Exported {output_path}")
+    return output_path
+
+
+def calibration_images(directory: str, count: int) -> List[str]:
+    """Up to count images spread evenly over a directory, so calibration sees every scene."""
+    paths = sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    if len(paths) > count:
+        paths = [paths[i] for i in np.linspace(0, len(paths) - 1, count).astype(int)]
+    return paths
+
+
+class ImageCalibrationReader(CalibrationDataReader):
+    """Feeds calibration images through the same letterbox preprocessing as inference."""
+
+    def __init__(self, input_name: str, paths: List[str], image_size: int):
+        self.input_name = input_name
+        self.paths = paths
+        self.image_size = image_size
+        self._batches = self._read()
+
+    def _read(self) -> Iterator[dict]:
+        for path in self.paths:
+            frame = cv2.imread(path)
+            if frame is None:
+                logger.warning(f"Skipping unreadable calibration image {path}")
+                continue
+            batch, _ = preprocess([frame], self.image_size)
+            yield {self.input_name: batch}
+
+    def get_next(self) -> Optional[dict]:
+        return next(self._batches, None)
+
+    def rewind(self):
+        self._batches = self._read()
+
+
+def _head_nodes(model: "onnx.ModelProto") -> List[str]:
+    """
+    Box-decoding nodes of the detection head (the last /model.N/ block, minus
+    its convolutions). They combine pixel coordinates with class scores, which
+    a shared INT8 scale represents badly, so they stay in float.
+    """
+    pattern = re.compile(r"^/model\.(\d+)/")
+    blocks = [int(m.group(1)) for node in model.graph.node for m in [pattern.match(node.name)] if m]
+    if not blocks:
+        return []
+    head = f"/model.{max(blocks)}/"
+    return [node.name for node in model.graph.node if node.name.startswith(head) and node.op_type != "Conv"]
+
+
+def quantize_int8(
+    onnx_path: str,
+    output_path: Optional[str] = None,
+    calibration_dir: str = config.QUANT_CALIBRATION_DIR,
+    num_images: int = config.QUANT_CALIBRATION_IMAGES,
+    image_size: int = config.INFERENCE_IMAGE_SIZE
+) -> str:
+    """
+    Statically quantize an exported model to INT8 (QDQ, per-channel weights),
+    calibrating activation ranges on images from calibration_dir.
+
+    Returns:
+        Path of the quantized model.
+
+    Raises:
+        ImportError: If onnx/onnxruntime are not installed.
+    """
+    if onnx is None:
+        raise ImportError("onnx and onnxruntime are required for INT8 quantization")
+    output_path = output_path or os.path.splitext(onnx_path)[0] + "_int8.onnx"
+    model = onnx.load(onnx_path)
+    paths = calibration_images(calibration_dir, num_images)
+    if not paths:
+        raise ValueError(f"No calibration images in {calibration_dir}")
+
+    logger.info(f"Quantizing {onnx_path} to INT8 with {len(paths)} calibration images...")
+    reader = ImageCalibrationReader(model.graph.input[0].name, paths, image_size)
+    with tempfile.TemporaryDirectory() as tmp:
+        # Shape inference and graph folding first, as onnxruntime recommends
+        prepared = os.path.join(tmp, "prepared.onnx")
+        try:
+            quant_pre_process(onnx_path, prepared)
+        except Exception as e:
+            logger.warning(f"Quantization pre-processing failed, quantizing the raw export: {e}")
+            prepared = onnx_path
+        quantize_static(
+            prepared,
+            output_path,
+            reader,
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True,
+            calibrate_method=CalibrationMethod.MinMax,
+            nodes_to_exclude=_head_nodes(model),
+        )
+
+    sidecar = os.path.splitext(onnx_path)[0] + ".json"
+    if os.path.exists(sidecar):
+        with open(sidecar) as f:
+            names = json.load(f)['names']
+        _write_sidecar(output_path, names, image_size, int8=True)
+    logger.info(f"Quantized {output_path}")
+    return output_path
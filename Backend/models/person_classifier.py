@@ -7,6 +7,8 @@ import logging
 from typing import List, Dict, Any, Tuple
 import config
 import numpy as np
+from models.face_index import FaceIndex
+from models.face_cache import load_face_encodings
 
 logger = logging.getLogger(__name__)
 
@@ -18,10 +20,11 @@ except ImportError:
 
 class PersonClassifier:
     def __init__(self, staff_faces_dir=None, children_faces_dir=None):
-        self.staff_encodings = []
-        self.staff_names = []
-        self.child_encodings = []
-        self.child_names = []
+        self.face_index = FaceIndex(
+            tolerance=config.FACE_MATCH_TOLERANCE,
+            num_partitions=config.FACE_INDEX_PARTITIONS,
+            num_probes=config.FACE_INDEX_PROBES
+        )
         
         if staff_faces_dir:
             self._load_faces(staff_faces_dir, is_staff=True)
@@ -36,22 +39,8 @@ class PersonClassifier:
         person_type = "staff" if is_staff else "children"
         logger.info(f"Loading {person_type} faces from {directory}")
         
-        for filename in os.listdir(directory):
-            if filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-                filepath = os.path.join(directory, filename)
-                try:
-                    image = face_recognition.load_image_file(filepath)
-                    encodings = face_recognition.face_encodings(image)
-                    if encodings:
-                        name = os.path.splitext(filename)[0]
-                        if is_staff:
-                            self.staff_encodings.append(encodings[0])
-                            self.staff_names.append(name)
-                        else:
-                            self.child_encodings.append(encodings[0])
-                            self.child_names.append(name)
-                except Exception as e:
-                    logger.error(f"Error loading {filename}: {e}")
+        for name, encoding in load_face_encodings(directory):
+            self.face_index.add(encoding, name, 'staff' if is_staff else 'child')
     
     def classify_person(self, frame: Any, bbox: List[int]) -> Dict[str, Any]:
         """
@@ -64,57 +53,60 @@ class PersonClassifier:
         Returns:
             Dict with person_type, name, confidence
         """
-        x1, y1, x2, y2 = map(int, bbox)
-        height = y2 - y1
+        return self.classify_persons(frame, [bbox])[0]
+    
+    def classify_persons(self, frame: Any, bboxes: List[List[int]]) -> List[Dict[str, Any]]:
+        """
+        Classify every detected person in a frame
         
-        # Simple heuristic: smaller bounding boxes are likely children
-        if height < config.CHILD_MAX_HEIGHT:
-            person_type = "child"
-        else:
-            person_type = "adult"
+        Faces are located once for the whole frame, assigned to person bboxes
+        in a single containment pass and encoded together.
         
-        # Try face recognition if available
-        if face_recognition and (self.staff_encodings or self.child_encodings):
-            try:
-                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                face_locations = face_recognition.face_locations(rgb_frame)
-                
-                # Filter face locations to those within bbox
-                relevant_faces = [
-                    loc for loc in face_locations
-                    if self._is_face_in_bbox(loc, bbox)
-                ]
-                
-                if relevant_faces:
-                    face_encodings = face_recognition.face_encodings(rgb_frame, relevant_faces)
-                    if face_encodings:
-                        # Check staff first
-                        if self.staff_encodings:
-                            matches = face_recognition.compare_faces(self.staff_encodings, face_encodings[0])
-                            if True in matches:
-                                idx = matches.index(True)
-                                return {
-                                    'person_type': 'staff',
-                                    'name': self.staff_names[idx],
-                                    'confidence': 0.9,
-                                    'bbox': bbox
-                                }
-                        
-                        # Check children
-                        if self.child_encodings:
-                            matches = face_recognition.compare_faces(self.child_encodings, face_encodings[0])
-                            if True in matches:
-                                idx = matches.index(True)
-                                return {
-                                    'person_type': 'child',
-                                    'name': self.child_names[idx],
-                                    'confidence': 0.9,
-                                    'bbox': bbox
-                                }
-            except Exception as e:
-                logger.error(f"Face recognition error: {e}")
+        Args:
+            frame: Image frame
+            bboxes: Bounding boxes [x1, y1, x2, y2], one per person
         
+        Returns:
+            List of dicts with person_type, name, confidence, in bbox order
+        """
         # Default classification based on size
+        results = [self.classify_by_size(bbox) for bbox in bboxes]
+        
+        # Try face recognition if available
+        if not bboxes or not face_recognition or not len(self.face_index):
+            return results
+        
+        try:
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            face_locations = face_recognition.face_locations(rgb_frame)
+            assignment = self._assign_faces(face_locations, bboxes)
+            
+            if assignment:
+                person_indices = list(assignment)
+                face_encodings = face_recognition.face_encodings(
+                    rgb_frame, [face_locations[assignment[i]] for i in person_indices]
+                )
+                matches = self.face_index.match(face_encodings)
+                for person_idx, match in zip(person_indices, matches):
+                    if match:
+                        results[person_idx] = {
+                            'person_type': match['person_type'],
+                            'name': match['name'],
+                            'confidence': 0.9,
+                            'bbox': bboxes[person_idx]
+                        }
+        except Exception as e:
+            logger.error(f"Face recognition error: {e}")
+        
+        return results
+    
+    def classify_by_size(self, bbox: List[int]) -> Dict[str, Any]:
+        """Fallback classification from bbox height"""
+        x1, y1, x2, y2 = map(int, bbox)
+        height = y2 - y1
+        
+        # Simple heuristic: smaller bounding boxes are likely children
+        person_type = "child" if height < config.CHILD_MAX_HEIGHT else "adult"
         return {
             'person_type': person_type,
             'name': 'Unknown',
@@ -122,10 +114,25 @@ class PersonClassifier:
             'bbox': bbox
         }
     
-    def _is_face_in_bbox(self, face_loc: Tuple, bbox: List[int]) -> bool:
-        """Check if face location is within person bbox"""
-        top, right, bottom, left = face_loc
-        x1, y1, x2, y2 = bbox
-        return (left >= x1 and right <= x2 and top >= y1 and bottom <= y2)
-
-import os
+    @staticmethod
+    def _assign_faces(face_locations: List[Tuple], bboxes: List[List[int]]) -> Dict[int, int]:
+        """
+        Assign faces to person bboxes
+        
+        Returns:
+            Mapping of bbox index to the index of the first face fully inside it
+        """
+        if not face_locations:
+            return {}
+        
+        faces = np.asarray(face_locations, dtype=np.float32).reshape(-1, 4)
+        boxes = np.asarray(bboxes, dtype=np.float32).reshape(-1, 4)
+        
+        # (num_faces, 1) against (1, num_bboxes)
+        top, right, bottom, left = (col[:, None] for col in faces.T)
+        x1, y1, x2, y2 = (col[None, :] for col in boxes.T)
+        inside = (left >= x1) & (right <= x2) & (top >= y1) & (bottom <= y2)
+        
+        has_face = inside.any(axis=0)
+        first_face = inside.argmax(axis=0)
+        return {int(i): int(first_face[i]) for i in np.flatnonzero(has_face)}
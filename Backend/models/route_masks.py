@@ -0,0 +1,71 @@
+"""
+Route Masks - Per-camera emergency-route polygons with integral images for box coverage lookups
+"""
+import logging
+from typing import List, Optional, Sequence, Tuple
+import cv2
+import numpy as np
+import config
+
+logger = logging.getLogger(__name__)
+
+Point = Tuple[float, float]
+
+
+class RouteMasks:
+    """
+    A camera's emergency routes rasterized once into masks.
+
+    Each mask keeps a summed-area table, so the route area under any box is
+    four lookups. coverage() does those lookups for every box and route in
+    one gather.
+    """
+
+    def __init__(self, width: int, height: int, polygons: Sequence[Sequence[Point]]):
+        self.width = width
+        self.height = height
+        integrals = []
+        for polygon in polygons:
+            mask = np.zeros((height, width), dtype=np.uint8)
+            pts = np.round(np.asarray(polygon, dtype=np.float32)).astype(np.int32).reshape(-1, 1, 2)
+            cv2.fillPoly(mask, [pts], 1)
+            integrals.append(cv2.integral(mask))
+        self.integrals = np.stack(integrals) if integrals else np.zeros((0, height + 1, width + 1), dtype=np.int32)
+        self.areas = self.integrals[:, -1, -1].astype(np.float32)
+        if (self.areas == 0).any():
+            logger.warning(f"Emergency route(s) {np.flatnonzero(self.areas == 0).tolist()} lie outside the frame")
+
+    def __len__(self) -> int:
+        return len(self.integrals)
+
+    @classmethod
+    def for_camera(cls, camera_id: Optional[int], width: int, height: int) -> Optional['RouteMasks']:
+        """
+        Masks for a camera's frames of the given size, or None if it has no
+        EMERGENCY_ROUTES. Polygons are scaled from the stream resolution.
+        """
+        polygons = config.EMERGENCY_ROUTES.get(camera_id)
+        if not polygons:
+            return None
+        stream_width, stream_height = config.CAMERA_RESOLUTIONS.get(camera_id, config.SIMULATOR_RESOLUTION)
+        sx, sy = width / stream_width, height / stream_height
+        return cls(width, height, [[(x * sx, y * sy) for x, y in polygon] for polygon in polygons])
+
+    def coverage(self, bboxes: List[List[float]]) -> np.ndarray:
+        """
+        Share of each route's area inside each box.
+
+        Returns:
+            (boxes, routes) array of fractions in [0, 1].
+        """
+        if not bboxes or not len(self):
+            return np.zeros((len(bboxes), len(self)), dtype=np.float32)
+        boxes = np.asarray(bboxes, dtype=np.float32)
+        x1 = np.clip(np.floor(boxes[:, 0]).astype(np.int32), 0, self.width)
+        y1 = np.clip(np.floor(boxes[:, 1]).astype(np.int32), 0, self.height)
+        x2 = np.clip(np.ceil(boxes[:, 2]).astype(np.int32), 0, self.width)
+        y2 = np.clip(np.ceil(boxes[:, 3]).astype(np.int32), 0, self.height)
+
+        table = self.integrals
+        covered = table[:, y2, x2] - table[:, y1, x2] - table[:, y2, x1] + table[:, y1, x1]
+        return (covered / np.maximum(self.areas, 1)[:, None]).T
@@ -0,0 +1,142 @@
+"""
+Multi-Object Tracker - SORT-style IoU + Kalman tracking that gives detections stable track IDs
+"""
+import logging
+from typing import List, Dict, Any, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def iou_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU between two sets of [x1, y1, x2, y2] boxes."""
+    a = boxes_a[:, None, :]
+    b = boxes_b[None, :, :]
+    inter_w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = inter_w * inter_h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-6)
+
+
+class Track:
+    """
+    One tracked object with a constant-velocity Kalman filter over
+    [cx, cy, w, h] and the identity cached from face recognition.
+    """
+
+    # State transition and measurement matrices shared by every track
+    _F = np.eye(8)
+    _F[:4, 4:] = np.eye(4)
+    _H = np.eye(4, 8)
+    _Q = np.diag([1.0, 1.0, 1.0, 1.0, 0.01, 0.01, 0.0001, 0.0001])
+    _R = np.diag([1.0, 1.0, 10.0, 10.0])
+
+    def __init__(self, track_id: int, bbox: List[float], frame_index: int):
+        self.track_id = track_id
+        self.hits = 1
+        self.time_since_update = 0
+        self.first_seen = frame_index
+
+        # Cached face recognition result
+        self.identity: Optional[str] = None
+        self.person_type: Optional[str] = None
+        self.last_verified: Optional[int] = None
+
+        self._x = np.zeros(8)
+        self._x[:4] = self._to_measurement(bbox)
+        self._P = np.diag([10.0, 10.0, 10.0, 10.0, 1000.0, 1000.0, 1000.0, 1000.0])
+
+    @staticmethod
+    def _to_measurement(bbox: List[float]) -> np.ndarray:
+        x1, y1, x2, y2 = bbox
+        return np.array([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1])
+
+    @property
+    def bbox(self) -> List[float]:
+        cx, cy, w, h = self._x[:4]
+        return [cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2]
+
+    def predict(self):
+        self._x = self._F @ self._x
+        self._x[2:4] = np.maximum(self._x[2:4], 1.0)
+        self._P = self._F @ self._P @ self._F.T + self._Q
+        self.time_since_update += 1
+
+    def update(self, bbox: List[float]):
+        z = self._to_measurement(bbox)
+        y = z - self._H @ self._x
+        S = self._H @ self._P @ self._H.T + self._R
+        K = self._P @ self._H.T @ np.linalg.inv(S)
+        self._x = self._x + K @ y
+        self._P = (np.eye(8) - K @ self._H) @ self._P
+        self.hits += 1
+        self.time_since_update = 0
+
+    def needs_verification(self, frame_index: int, interval: int) -> bool:
+        """Whether face recognition should (re)run for this track."""
+        return self.identity is None or frame_index - self.last_verified >= interval
+
+    def set_identity(self, name: str, person_type: Optional[str], frame_index: int):
+        self.identity = name
+        self.person_type = person_type
+        self.last_verified = frame_index
+
+
+class MultiObjectTracker:
+    """
+    Associates detections across frames by IoU against Kalman-predicted boxes.
+
+    Matching is greedy on descending IoU, which is close to Hungarian
+    assignment for the sparse overlaps seen between consecutive frames.
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, max_age: int = 30):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.tracks: Dict[int, Track] = {}
+        self.frame_index = 0
+        self._next_id = 1
+
+    def update(self, detections: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Advance the tracker by one frame.
+
+        Each detection dict gets a 'track_id' key added in place.
+
+        Returns:
+            The same detections.
+        """
+        self.frame_index += 1
+        tracks = list(self.tracks.values())
+        for track in tracks:
+            track.predict()
+
+        unmatched_dets = set(range(len(detections)))
+        if tracks and detections:
+            det_boxes = np.asarray([d['bbox'] for d in detections], dtype=np.float64)
+            track_boxes = np.asarray([t.bbox for t in tracks], dtype=np.float64)
+            ious = iou_matrix(det_boxes, track_boxes)
+
+            det_idx, track_idx = np.nonzero(ious >= self.iou_threshold)
+            order = np.argsort(-ious[det_idx, track_idx])
+            matched_tracks = set()
+            for d, t in zip(det_idx[order].tolist(), track_idx[order].tolist()):
+                if d in unmatched_dets and t not in matched_tracks:
+                    tracks[t].update(detections[d]['bbox'])
+                    detections[d]['track_id'] = tracks[t].track_id
+                    unmatched_dets.discard(d)
+                    matched_tracks.add(t)
+
+        for d in sorted(unmatched_dets):
+            track = Track(self._next_id, detections[d]['bbox'], self.frame_index)
+            self.tracks[track.track_id] = track
+            detections[d]['track_id'] = track.track_id
+            self._next_id += 1
+
+        for track in tracks:
+            if track.time_since_update > self.max_age:
+                del self.tracks[track.track_id]
+
+        return detections
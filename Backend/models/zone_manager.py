@@ -1,16 +1,75 @@
 """
 Zone Manager - Handles zone-based alert routing and scenario activation
 """
-from typing import Dict, List
+from typing import Dict, List, Optional
+import cv2
+import numpy as np
 import config
 from config import Zone, AlertSeverity
 import logging
 
 logger = logging.getLogger(__name__)
 
+class CameraSubZones:
+    """
+    A camera's polygon sub-zones rasterized into a label image.
+    
+    Label 0 is the camera's own zone and label i the i-th polygon of
+    CAMERA_SUBZONES, so looking up the sub-zone of every point in a frame
+    is one array gather. scenario_masks holds the active-scenario bitmask of
+    each label.
+    """
+    
+    def __init__(
+        self,
+        camera_id: Optional[int],
+        width: int,
+        height: int,
+        zone_manager: 'ZoneManager',
+        zone: Optional[Zone] = None
+    ):
+        zone = zone or zone_manager.get_camera_zone(camera_id)
+        self.width = width
+        self.height = height
+        self.names = [zone.value]
+        self.zones = [zone]
+        self.labels = np.zeros((height, width), dtype=np.uint8)
+        
+        stream_width, stream_height = config.CAMERA_RESOLUTIONS.get(camera_id, config.SIMULATOR_RESOLUTION)
+        scale = np.array([width / stream_width, height / stream_height], dtype=np.float32)
+        for name, (zone, polygon) in config.CAMERA_SUBZONES.get(camera_id, {}).items():
+            pts = np.round(np.asarray(polygon, dtype=np.float32) * scale).astype(np.int32).reshape(-1, 1, 2)
+            cv2.fillPoly(self.labels, [pts], len(self.names))
+            self.names.append(name)
+            self.zones.append(Zone(zone))
+        
+        self.scenario_masks = np.array([zone_manager.scenario_mask(zone) for zone in self.zones], dtype=np.int64)
+        self._scenario_bit = zone_manager.scenario_bit
+    
+    def __len__(self) -> int:
+        return len(self.zones)
+    
+    def locate(self, bboxes: List[List[float]]) -> np.ndarray:
+        """Sub-zone label of each box's foot-point (bottom centre)"""
+        if len(bboxes) == 0:
+            return np.zeros(0, dtype=np.uint8)
+        boxes = np.asarray(bboxes, dtype=np.float32)
+        xs = np.clip(((boxes[:, 0] + boxes[:, 2]) / 2).astype(np.int32), 0, self.width - 1)
+        ys = np.clip(boxes[:, 3].astype(np.int32), 0, self.height - 1)
+        return self.labels[ys, xs]
+    
+    def active(self, labels: np.ndarray, scenario: str) -> np.ndarray:
+        """Whether a scenario is active in each of the given sub-zones"""
+        return (self.scenario_masks[labels] & self._scenario_bit(scenario)) != 0
+
 class ZoneManager:
     def __init__(self):
         self.active_scenarios = self._initialize_scenarios()
+        
+        # One bit per scenario, so activity checks are a single AND
+        scenarios = dict.fromkeys(name for names in self.active_scenarios.values() for name in names)
+        self._scenario_bits = {name: 1 << index for index, name in enumerate(scenarios)}
+        self._zone_masks = {zone: self._mask(names) for zone, names in self.active_scenarios.items()}
     
     def _initialize_scenarios(self) -> Dict[Zone, List[str]]:
         """Define which scenarios are active in each zone"""
@@ -44,9 +103,28 @@ class ZoneManager:
         """Get the zone for a given camera"""
         return config.CAMERA_ZONES.get(camera_id, Zone.OUTDOOR_PLAY)
     
+    def get_camera_zones(self, camera_id: int, zone: Optional[Zone] = None) -> List[Zone]:
+        """The camera's zone followed by the zones of its CAMERA_SUBZONES polygons"""
+        zone = zone or self.get_camera_zone(camera_id)
+        return [zone] + [Zone(sub_zone) for sub_zone, _ in config.CAMERA_SUBZONES.get(camera_id, {}).values()]
+    
+    def _mask(self, scenarios: List[str]) -> int:
+        mask = 0
+        for scenario in scenarios:
+            mask |= self._scenario_bits.get(scenario, 0)
+        return mask
+    
+    def scenario_bit(self, scenario: str) -> int:
+        """Bit of a scenario in active-scenario masks (0 if no zone activates it)"""
+        return self._scenario_bits.get(scenario, 0)
+    
+    def scenario_mask(self, zone: Zone) -> int:
+        """Bitmask of the scenarios active in a zone"""
+        return self._zone_masks.get(zone, 0)
+    
     def is_scenario_active(self, zone: Zone, scenario: str) -> bool:
-        """Check if a scenario is active in a given zone"""
-        return scenario in self.active_scenarios.get(zone, [])
+        """Check if a scenario is active in a given zone or sub-zone's zone"""
+        return bool(self._zone_masks.get(zone, 0) & self._scenario_bits.get(scenario, 0))
     
     def get_scenario_severity(self, scenario: str) -> AlertSeverity:
         """Get the severity level for a scenario"""
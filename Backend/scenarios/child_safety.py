@@ -2,49 +2,142 @@
 Child Safety Scenario - Handles unsupervised children and restricted area entry
 """
 import logging
+import math
 import sys
 import os
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+import config
+from config import AlertSeverity
 
 # Add parent directory to path to import models
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 from models.person_classifier import PersonClassifier
+from models.route_masks import RouteMasks
 
 logger = logging.getLogger(__name__)
 
+# Object classes that can obstruct an emergency route
+OBSTRUCTION_CLASSES = ['box', 'crate', 'furniture', 'equipment', 'vehicle']
+
+def _box_area(bbox: List[float]) -> float:
+    x1, y1, x2, y2 = bbox
+    return (x2 - x1) * (y2 - y1)
+
+def _foot_points(bboxes: List[List[float]]) -> np.ndarray:
+    boxes = np.asarray(bboxes, dtype=np.float32)
+    return np.stack([(boxes[:, 0] + boxes[:, 2]) / 2, boxes[:, 3]], axis=1)
+
+def _stream_scale(camera_id: Optional[int], frame: Any) -> float:
+    """Frame pixels per pixel of the camera's stream resolution"""
+    stream_width, stream_height = config.CAMERA_RESOLUTIONS.get(camera_id, config.SIMULATOR_RESOLUTION)
+    frame_height, frame_width = frame.shape[:2]
+    return (frame_width / stream_width + frame_height / stream_height) / 2
+
 class ChildSafetyScenario:
     def __init__(self):
-        self.person_classifier = PersonClassifier()
+        self._person_classifier = None
+        self._routes: Dict[Tuple[Optional[int], int, int], Optional[RouteMasks]] = {}
+        self._blocked_since: Dict[Tuple[Optional[int], Optional[int]], float] = {}
+        self._last_blocked: Dict[Tuple[Optional[int], Optional[int]], float] = {}
+        self._supervision: Dict[Optional[int], Dict[int, Tuple[float, float]]] = {}
     
-    def check_unsupervised_child(self, frame: Any, persons: List[Dict]) -> List[Dict[str, Any]]:
+    @property
+    def person_classifier(self) -> PersonClassifier:
+        """Loaded on first use, so cameras that never classify people skip the face database"""
+        if self._person_classifier is None:
+            self._person_classifier = PersonClassifier()
+        return self._person_classifier
+    
+    def check_unsupervised_child(
+        self,
+        frame: Any,
+        persons: List[Dict],
+        camera_id: Optional[int] = None,
+        now: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
         """
         Check if children are present without staff supervision
         
+        A child is supervised when a staff member's feet are within
+        SUPERVISION_RADIUS of its own. For tracked children the result is
+        smoothed per track, so an alert needs a sustained lack of supervision
+        rather than one frame where a staff member was missed.
+        
         Args:
             frame: Image frame
             persons: List of detected persons with classifications
+            camera_id: Camera the frame is from, scales the radius and keys the track state
+            now: Monotonic time of the frame, defaults to the current time
         
         Returns:
             List of alerts for unsupervised children
         """
         alerts = []
+        now = time.monotonic() if now is None else now
         
         children = [p for p in persons if p['person_type'] == 'child']
         staff = [p for p in persons if p['person_type'] == 'staff']
+        if not children:
+            return alerts
         
-        if children and not staff:
-            for child in children:
-                alerts.append({
-                    'scenario': 'unsupervised_child',
-                    'severity': 'CRITICAL',
-                    'event': 'Unsupervised Child Detected',
-                    'details': f"Child detected without staff supervision",
-                    'confidence': child['confidence'],
-                    'bbox': child['bbox']
-                })
+        nearest = np.full(len(children), np.inf, dtype=np.float32)
+        if staff:
+            # Child x staff foot-point distances in one broadcast
+            child_feet = _foot_points([c['bbox'] for c in children])
+            staff_feet = _foot_points([s['bbox'] for s in staff])
+            nearest = np.linalg.norm(child_feet[:, None, :] - staff_feet[None, :, :], axis=2).min(axis=1)
+            nearest /= _stream_scale(camera_id, frame)
+        unsupervised = nearest > config.SUPERVISION_RADIUS
+        
+        levels = self._supervision_levels(camera_id, children, unsupervised, now)
+        for child, distance, level in zip(children, nearest, levels):
+            if level < config.SUPERVISION_ALERT_LEVEL:
+                continue
+            details = ("Child detected without staff supervision" if np.isinf(distance) else
+                       f"Nearest staff member is {distance:.0f}px away (radius {config.SUPERVISION_RADIUS}px)")
+            alerts.append({
+                'scenario': 'unsupervised_child',
+                'severity': AlertSeverity.CRITICAL.value,
+                'event': 'Unsupervised Child Detected',
+                'details': details,
+                'confidence': child['confidence'],
+                'bbox': child['bbox'],
+                'track_id': child.get('track_id')
+            })
         
         return alerts
     
+    def _supervision_levels(
+        self,
+        camera_id: Optional[int],
+        children: List[Dict],
+        unsupervised: np.ndarray,
+        now: float
+    ) -> List[float]:
+        """
+        Exponentially smoothed unsupervised level per child track, in [0, 1].
+        Untracked children get the raw per-frame result.
+        """
+        state = self._supervision.setdefault(camera_id, {})
+        levels = []
+        for child, alone in zip(children, unsupervised.tolist()):
+            track_id = child.get('track_id')
+            if track_id is None:
+                levels.append(float(alone))
+                continue
+            level, last = state.get(track_id, (0.0, now))
+            level += (float(alone) - level) * (1 - math.exp(-(now - last) / config.SUPERVISION_TIME_CONSTANT))
+            state[track_id] = (level, now)
+            levels.append(level)
+        
+        # Forget children that left the view
+        stale = now - 10 * config.SUPERVISION_TIME_CONSTANT
+        for track_id in [t for t, (_, last) in state.items() if last < stale]:
+            del state[track_id]
+        return levels
+    
     def check_restricted_area_entry(self, frame: Any, persons: List[Dict], zone: str) -> List[Dict[str, Any]]:
         """
         Check if children entered restricted areas
@@ -67,48 +160,95 @@ class ChildSafetyScenario:
             for child in children:
                 alerts.append({
                     'scenario': 'restricted_area_entry',
-                    'severity': 'HIGH',
+                    'severity': AlertSeverity.HIGH.value,
                     'event': f'Child in Restricted Area: {zone}',
                     'details': f"Child detected in {zone} which is a restricted area",
                     'confidence': child['confidence'],
-                    'bbox': child['bbox']
+                    'bbox': child['bbox'],
+                    'track_id': child.get('track_id')
                 })
         
         return alerts
     
-    def check_emergency_route(self, frame: Any, objects: List[Dict]) -> List[Dict[str, Any]]:
+    def check_emergency_route(
+        self,
+        frame: Any,
+        objects: List[Dict],
+        camera_id: Optional[int] = None,
+        now: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
         """
-        Check if emergency routes are obstructed
+        Check if emergency routes are blocked
+        
+        A route counts as blocked when one obstruction covers at least
+        ROUTE_BLOCK_COVERAGE of it, and is only reported once it has stayed
+        blocked for ROUTE_BLOCK_PERSIST_SECONDS.
         
         Args:
             frame: Image frame
             objects: List of detected objects
+            camera_id: Camera whose EMERGENCY_ROUTES to use
+            now: Monotonic time of the frame, defaults to the current time
         
         Returns:
             List of alerts for blocked emergency routes
         """
         alerts = []
+        now = time.monotonic() if now is None else now
+        obstructions = [obj for obj in objects if obj.get('label') in OBSTRUCTION_CLASSES]
+        
+        frame_height, frame_width = frame.shape[:2]
+        routes = self._route_masks(camera_id, frame_width, frame_height)
+        if routes is None:
+            # No routes configured: any large object could block a path
+            large = [obj for obj in obstructions if _box_area(obj['bbox']) > 10000]  # Threshold in pixels
+            if self._blockage_persisted((camera_id, None), bool(large), now):
+                obj = max(large, key=lambda o: o['confidence'])
+                alerts.append({
+                    'scenario': 'emergency_route_blocked',
+                    'severity': AlertSeverity.CRITICAL.value,
+                    'event': 'Emergency Route Potentially Blocked',
+                    'details': f"Large {obj['label']} detected that may obstruct emergency exit",
+                    'confidence': obj['confidence'],
+                    'bbox': obj['bbox']
+                })
+            return alerts
         
-        # Define obstruction classes
-        obstructions = ['box', 'crate', 'furniture', 'equipment', 'vehicle']
-        
-        # TODO: Define emergency route zones
-        # For now, check for large objects that could block paths
-        for obj in objects:
-            if obj.get('label') in obstructions:
-                bbox = obj['bbox']
-                x1, y1, x2, y2 = bbox
-                obj_area = (x2 - x1) * (y2 - y1)
-                
-                # If object is large enough to block a path
-                if obj_area > 10000:  # Threshold in pixels
-                    alerts.append({
-                        'scenario': 'emergency_route_blocked',
-                        'severity': 'CRITICAL',
-                        'event': 'Emergency Route Potentially Blocked',
-                        'details': f"Large {obj['label']} detected that may obstruct emergency exit",
-                        'confidence': obj['confidence'],
-                        'bbox': bbox
-                    })
+        coverage = routes.coverage([obj['bbox'] for obj in obstructions])
+        for route in range(len(routes)):
+            blocker = int(coverage[:, route].argmax()) if obstructions else 0
+            blocked = bool(obstructions) and coverage[blocker, route] >= config.ROUTE_BLOCK_COVERAGE
+            if self._blockage_persisted((camera_id, route), blocked, now):
+                obj = obstructions[blocker]
+                alerts.append({
+                    'scenario': 'emergency_route_blocked',
+                    'severity': AlertSeverity.CRITICAL.value,
+                    'event': 'Emergency Route Blocked',
+                    'details': f"{obj['label']} covers {coverage[blocker, route]:.0%} of emergency route {route + 1}",
+                    'confidence': obj['confidence'],
+                    'bbox': obj['bbox']
+                })
         
         return alerts
+    
+    def _route_masks(self, camera_id: Optional[int], width: int, height: int) -> Optional[RouteMasks]:
+        """Route masks for a camera and frame size, built on first use"""
+        key = (camera_id, width, height)
+        if key not in self._routes:
+            self._routes[key] = RouteMasks.for_camera(camera_id, width, height)
+        return self._routes[key]
+    
+    def _blockage_persisted(self, key: Tuple[Optional[int], Optional[int]], blocked: bool, now: float) -> bool:
+        """
+        Hysteresis for one route: True once it has been blocked for
+        ROUTE_BLOCK_PERSIST_SECONDS. Gaps shorter than ROUTE_BLOCK_CLEAR_SECONDS
+        (missed detections, people walking past) do not reset the timer.
+        """
+        last_blocked = self._last_blocked.get(key)
+        if last_blocked is not None and now - last_blocked > config.ROUTE_BLOCK_CLEAR_SECONDS:
+            del self._blocked_since[key], self._last_blocked[key]
+        if not blocked:
+            return False
+        self._last_blocked[key] = now
+        since = self._blocked_since.setdefault(key, now)
+        return now - since >= config.ROUTE_BLOCK_PERSIST_SECONDS
@@ -2,15 +2,29 @@
 Fence Safety Scenario - Handles fence damage and climbing hazard detection
 """
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
 import config
+from config import AlertSeverity
 from models.fence_detector import FenceDefectDetector
+from models.fence_geometry import FenceGeometry
 
 logger = logging.getLogger(__name__)
 
+# Object classes a child could use to climb a fence
+CLIMBING_AID_CLASSES = ['chair', 'bench', 'table', 'box', 'crate']
+
 class FenceSafetyScenario:
     def __init__(self):
-        self.fence_detector = FenceDefectDetector()
+        self._fence_detector = None
+        self._geometries: Dict[Tuple[Optional[int], int, int], FenceGeometry] = {}
+    
+    @property
+    def fence_detector(self) -> FenceDefectDetector:
+        """Loaded on first use, so climbing checks alone never load the fence model"""
+        if self._fence_detector is None:
+            self._fence_detector = FenceDefectDetector()
+        return self._fence_detector
     
     def check_fence_damage(self, frame: Any) -> List[Dict[str, Any]]:
         """
@@ -25,7 +39,7 @@ class FenceSafetyScenario:
         for defect in defects:
             alerts.append({
                 'scenario': 'fence_damage',
-                'severity': 'CRITICAL',
+                'severity': AlertSeverity.CRITICAL.value,
                 'event': f"Fence Defect: {defect['type']}",
                 'details': f"Detected {defect['type']} with {defect['confidence']:.2f} confidence",
                 'confidence': defect['confidence'],
@@ -34,50 +48,45 @@ class FenceSafetyScenario:
         
         return alerts
     
-    def check_climbing_hazard(self, frame: Any, objects: List[Dict]) -> List[Dict[str, Any]]:
+    def check_climbing_hazard(self, frame: Any, objects: List[Dict], camera_id: Optional[int] = None) -> List[Dict[str, Any]]:
         """
         Check for objects near fence that could be climbing aids
         
         Args:
             frame: Image frame
             objects: List of detected objects with bboxes
+            camera_id: Camera whose FENCE_LINES to use; the frame border otherwise
         
         Returns:
             List of alerts for climbing hazards
         """
         alerts = []
         
-        # Define climbing aid classes
-        climbing_aids = ['chair', 'bench', 'table', 'box', 'crate']
+        aids = [obj for obj in objects if obj.get('label') in CLIMBING_AID_CLASSES]
+        if not aids:
+            return alerts
         
-        # TODO: Implement fence boundary detection
-        # For now, assume fence is at edges of frame
         frame_height, frame_width = frame.shape[:2]
-        fence_zones = [
-            (0, 0, frame_width, 50),  # Top
-            (0, frame_height-50, frame_width, frame_height),  # Bottom
-            (0, 0, 50, frame_height),  # Left
-            (frame_width-50, 0, frame_width, frame_height),  # Right
-        ]
+        geometry = self._fence_geometry(camera_id, frame_width, frame_height)
+        near, distances = geometry.near([obj['bbox'] for obj in aids], config.CLIMBING_HAZARD_DISTANCE)
         
-        for obj in objects:
-            if obj.get('label') in climbing_aids:
-                bbox = obj['bbox']
-                x1, y1, x2, y2 = bbox
-                obj_center = ((x1 + x2) / 2, (y1 + y2) / 2)
-                
-                # Check if object is near fence
-                for fence_zone in fence_zones:
-                    fx1, fy1, fx2, fy2 = fence_zone
-                    if (fx1 <= obj_center[0] <= fx2 and fy1 <= obj_center[1] <= fy2):
-                        alerts.append({
-                            'scenario': 'climbing_hazard',
-                            'severity': 'HIGH',
-                            'event': f"Climbing Hazard: {obj['label']} near fence",
-                            'details': f"Detected {obj['label']} positioned near boundary fence",
-                            'confidence': obj['confidence'],
-                            'bbox': bbox
-                        })
-                        break
+        for index in np.flatnonzero(near):
+            obj = aids[index]
+            alerts.append({
+                'scenario': 'climbing_hazard',
+                'severity': AlertSeverity.HIGH.value,
+                'event': f"Climbing Hazard: {obj['label']} near fence",
+                'details': f"Detected {obj['label']} {distances[index]:.0f}px from boundary fence",
+                'confidence': obj['confidence'],
+                'bbox': obj['bbox']
+            })
         
         return alerts
+    
+    def _fence_geometry(self, camera_id: Optional[int], width: int, height: int) -> FenceGeometry:
+        """Distance map for a camera and frame size, built on first use"""
+        key = (camera_id, width, height)
+        geometry = self._geometries.get(key)
+        if geometry is None:
+            geometry = self._geometries[key] = FenceGeometry.for_camera(camera_id, width, height)
+        return geometry
@@ -0,0 +1,259 @@
+"""
+Scenario Pipeline - Runs only the scenarios active in a camera's zones, with per-stage timing
+"""
+import logging
+import time
+import numpy as np
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import config
+from config import Zone
+from models.zone_manager import zone_manager, ZoneManager, CameraSubZones
+from scenarios.child_safety import ChildSafetyScenario, OBSTRUCTION_CLASSES
+from scenarios.fence_safety import FenceSafetyScenario, CLIMBING_AID_CLASSES
+
+logger = logging.getLogger(__name__)
+
+# Person types the scenarios act on; other identities are classified by size
+PERSON_TYPES = ('staff', 'child')
+
+
+class Stage:
+    """
+    One scenario check, skipped when any of its inputs is empty.
+
+    A stage sees the inputs in sub-zones where its scenario is active, plus
+    any input from elsewhere that from_any_zone accepts.
+    """
+
+    def __init__(self, name: str, inputs: Tuple[str, ...], run: Callable[[Dict[str, Any]], List[Dict]],
+                 min_interval: float = 0.0, from_any_zone: Optional[Callable[[Dict[str, Any]], bool]] = None):
+        self.name = name
+        self.inputs = inputs
+        self.run = run
+        self.min_interval = min_interval
+        self.from_any_zone = from_any_zone
+        self.last_run: Optional[float] = None
+
+        self.runs = 0
+        self.skipped = 0
+        self.total_ms = 0.0
+        self.last_ms = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'runs': self.runs,
+            'skipped': self.skipped,
+            'avg_ms': round(self.total_ms / self.runs, 2) if self.runs else 0.0,
+            'last_ms': round(self.last_ms, 2),
+        }
+
+
+class ScenarioPipeline:
+    """
+    Per-camera list of scenario stages, built once from the scenarios
+    ZoneManager activates for the camera's zone and its polygon sub-zones.
+
+    Scenario objects are shared between pipelines and load their models
+    lazily, so a model is only loaded if some camera has a stage that runs
+    it. Each frame, the detections are split into the inputs stages need
+    (persons, climbing aids, obstructions); persons are only classified if
+    a person stage is active and someone is in view. Tracked persons take
+    their identity from the caller's tracker, only untracked ones go through
+    the person classifier's face recognition. Every detection is
+    mapped to a sub-zone by its foot-point, and a stage only sees the
+    detections in sub-zones where its scenario is active (the supervision
+    check also counts staff standing in other sub-zones).
+    """
+
+    def __init__(
+        self,
+        camera_id: int,
+        zone: Optional[Zone] = None,
+        child_safety: Optional[ChildSafetyScenario] = None,
+        fence_safety: Optional[FenceSafetyScenario] = None,
+        zones: ZoneManager = zone_manager
+    ):
+        self.camera_id = camera_id
+        self.camera_name = f"CAM-{camera_id + 1:02d}"
+        self.zone = zone or zones.get_camera_zone(camera_id)
+        self.zones = zones
+        self.child_safety = child_safety or ChildSafetyScenario()
+        self.fence_safety = fence_safety or FenceSafetyScenario()
+
+        available = self._available_stages()
+        camera_zones = zones.get_camera_zones(camera_id, self.zone)
+        active = list(dict.fromkeys(name for zone in camera_zones for name in zones.active_scenarios.get(zone, [])))
+        self.stages: List[Stage] = [available[name] for name in active if name in available]
+        missing = [name for name in active if name not in available]
+        if missing:
+            logger.debug(f"{self.camera_name}: no checks implemented for {missing}")
+        self._classify = any('persons' in stage.inputs for stage in self.stages)
+        self.classify_ms = 0.0
+        self._subzones: Dict[Tuple[int, int], CameraSubZones] = {}
+        logger.info(f"{self.camera_name} ({', '.join(zone.value for zone in camera_zones)}) "
+                    f"stages: {[stage.name for stage in self.stages]}")
+
+    def _available_stages(self) -> Dict[str, Stage]:
+        child, fence = self.child_safety, self.fence_safety
+        return {
+            # Staff supervise children across sub-zone borders, so they count wherever they stand
+            'unsupervised_child': Stage(
+                'unsupervised_child', ('persons',),
+                lambda i: child.check_unsupervised_child(i['frame'], i['persons'], self.camera_id, i['now']),
+                from_any_zone=lambda person: person.get('person_type') == 'staff'),
+            'restricted_area_entry': Stage(
+                'restricted_area_entry', ('persons',),
+                lambda i: [
+                    alert
+                    for zone, persons in _group_by_zone(i['persons']).items()
+                    for alert in child.check_restricted_area_entry(i['frame'], persons, zone)
+                ]),
+            'emergency_route_blocked': Stage(
+                'emergency_route_blocked', ('obstructions',),
+                lambda i: child.check_emergency_route(i['frame'], i['obstructions'], self.camera_id, i['now'])),
+            'climbing_hazard': Stage(
+                'climbing_hazard', ('climbing_aids',),
+                lambda i: fence.check_climbing_hazard(i['frame'], i['climbing_aids'], self.camera_id)),
+            'fence_damage': Stage(
+                'fence_damage', (),
+                lambda i: fence.check_fence_damage(i['frame']),
+                min_interval=config.FENCE_CHECK_INTERVAL),
+        }
+
+    def _camera_subzones(self, width: int, height: int) -> CameraSubZones:
+        if (width, height) not in self._subzones:
+            self._subzones[width, height] = CameraSubZones(self.camera_id, width, height, self.zones, self.zone)
+        return self._subzones[width, height]
+
+    def _classify_persons(
+        self,
+        frame: Any,
+        persons: List[Dict[str, Any]],
+        zones: List[str],
+        identities: Dict[int, Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        if not persons:
+            return []
+        classifier = self.child_safety.person_classifier
+        classes: List[Optional[Dict[str, Any]]] = [None] * len(persons)
+        untracked = []
+        for i, det in enumerate(persons):
+            identity = identities.get(det.get('track_id'))
+            if identity is None:
+                untracked.append(i)
+            elif identity.get('person_type') in PERSON_TYPES:
+                classes[i] = identity
+            else:
+                # Tracked but not on the staff/children roster
+                classes[i] = {**classifier.classify_by_size(det['bbox']), 'name': identity.get('name') or 'Unknown'}
+        if untracked:
+            for i, cls in zip(untracked, classifier.classify_persons(frame, [persons[i]['bbox'] for i in untracked])):
+                classes[i] = cls
+        return [
+            {**det, 'person_type': cls['person_type'], 'name': cls.get('name'), 'zone': zone}
+            for det, cls, zone in zip(persons, classes, zones)
+        ]
+
+    def process(
+        self,
+        frame: Any,
+        detections: List[Dict[str, Any]],
+        now: Optional[float] = None,
+        identities: Optional[Dict[int, Dict[str, Any]]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Run the camera's stages on one frame's detections.
+
+        Args:
+            identities: name and person_type per track_id, for persons the
+                caller has already tracked and recognized.
+
+        Returns:
+            Scenario alerts that pass the confidence threshold of the
+            sub-zone they were raised in, tagged with that sub-zone.
+        """
+        now = time.monotonic() if now is None else now
+        frame_height, frame_width = frame.shape[:2]
+        subzones = self._camera_subzones(frame_width, frame_height)
+        labels = subzones.locate([det['bbox'] for det in detections])
+        kinds = {
+            'persons': np.array([det['label'] == 'person' for det in detections], dtype=bool),
+            'climbing_aids': np.array([det['label'] in CLIMBING_AID_CLASSES for det in detections], dtype=bool),
+            'obstructions': np.array([det['label'] in OBSTRUCTION_CLASSES for det in detections], dtype=bool),
+        }
+        items = {'persons': list(detections), 'climbing_aids': detections, 'obstructions': detections}
+        active = {stage.name: subzones.active(labels, stage.name) for stage in self.stages}
+
+        if self._classify:
+            start = time.perf_counter()
+            wanted = np.zeros(len(detections), dtype=bool)
+            for stage in self.stages:
+                if 'persons' not in stage.inputs:
+                    continue
+                if stage.from_any_zone and (kinds['persons'] & active[stage.name]).any():
+                    wanted |= kinds['persons']
+                else:
+                    wanted |= active[stage.name]
+            indices = np.flatnonzero(kinds['persons'] & wanted)
+            persons = self._classify_persons(
+                frame, [detections[i] for i in indices], [subzones.zones[labels[i]].value for i in indices],
+                identities or {}
+            )
+            for index, person in zip(indices, persons):
+                items['persons'][index] = person
+            self.classify_ms = (time.perf_counter() - start) * 1000
+
+        alerts = []
+        for stage in self.stages:
+            inputs: Dict[str, Any] = {'frame': frame, 'now': now}
+            for name in stage.inputs:
+                selected = kinds[name] & active[stage.name]
+                if stage.from_any_zone and selected.any():
+                    selected |= kinds[name] & np.array([stage.from_any_zone(item) for item in items[name]], dtype=bool)
+                inputs[name] = [items[name][i] for i in np.flatnonzero(selected)]
+            due = stage.last_run is None or now - stage.last_run >= stage.min_interval
+            if not due or not all(inputs[name] for name in stage.inputs):
+                stage.skipped += 1
+                continue
+            start = time.perf_counter()
+            alerts.extend(stage.run(inputs))
+            stage.last_ms = (time.perf_counter() - start) * 1000
+            stage.total_ms += stage.last_ms
+            stage.runs += 1
+            stage.last_run = now
+
+        raised = []
+        for alert, label in zip(alerts, subzones.locate([alert['bbox'] for alert in alerts])):
+            zone = subzones.zones[label]
+            if self.zones.should_trigger_alert(zone, alert['scenario'], alert['confidence']):
+                alert['zone'] = zone.value
+                alert['subzone'] = subzones.names[label]
+                raised.append(alert)
+        return raised
+
+    def stats(self) -> Dict[str, Any]:
+        """Run/skip counts and timings per stage, plus the last person classification time."""
+        return {
+            'camera': self.camera_name,
+            'zone': self.zone.value,
+            'subzones': list(config.CAMERA_SUBZONES.get(self.camera_id, {})),
+            'classify_ms': round(self.classify_ms, 2),
+            'stages': {stage.name: stage.stats() for stage in self.stages},
+        }
+
+
+def _group_by_zone(persons: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for person in persons:
+        groups.setdefault(person['zone'], []).append(person)
+    return groups
+
+
+def build_pipelines(camera_zones: Dict[int, Zone] = config.CAMERA_ZONES) -> Dict[int, ScenarioPipeline]:
+    """One pipeline per configured camera, sharing the scenario objects and their models."""
+    child_safety = ChildSafetyScenario()
+    fence_safety = FenceSafetyScenario()
+    return {
+        camera_id: ScenarioPipeline(camera_id, zone, child_safety=child_safety, fence_safety=fence_safety)
+        for camera_id, zone in camera_zones.items()
+    }
@@ -1,36 +1,302 @@
+"""
+WebSocket Manager - Non-blocking fan-out with a bounded send queue and sender task per client
+"""
 from fastapi import WebSocket
-from typing import List
+from collections import defaultdict, deque
+from itertools import chain
+from typing import Any, Deque, Dict, Hashable, List, Set, Tuple
+import asyncio
 import json
+import time
 import logging
+import config
+from config import AlertSeverity, Zone
 
 logger = logging.getLogger(__name__)
 
-class ConnectionManager:
+# Subscribe message field -> alert field it filters on
+FILTER_FIELDS = {'cameras': 'camera', 'zones': 'zone_key', 'scenarios': 'scenario'}
+
+SEVERITY_RANK = {
+    AlertSeverity.LOW.value: 0,
+    AlertSeverity.MEDIUM.value: 1,
+    AlertSeverity.HIGH.value: 2,
+    AlertSeverity.CRITICAL.value: 3,
+}
+
+
+def serialize(message: dict) -> str:
+    """Same encoding as WebSocket.send_json, done once per message."""
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+def parse_filters(message: dict) -> Dict[str, Any]:
+    """
+    Validate a subscribe message. A missing or empty field means "any".
+
+    Raises:
+        ValueError: On an unknown zone or severity.
+    """
+    filters: Dict[str, Any] = {}
+    for name in FILTER_FIELDS:
+        values = message.get(name) or []
+        if not isinstance(values, list):
+            values = [values]
+        if name == 'zones':
+            values = [Zone(value).value for value in values]
+        if values:
+            filters[name] = sorted({str(value) for value in values})
+    min_severity = message.get('min_severity')
+    if min_severity:
+        if not isinstance(min_severity, str) or min_severity not in SEVERITY_RANK:
+            raise ValueError(f"Unknown severity: {min_severity}")
+        filters['min_severity'] = min_severity
+    return filters
+
+
+class SubscriptionIndex:
+    """
+    Maps alert topics to subscribers so an alert reaches matching clients
+    without testing every connection.
+
+    Each filter field keeps value -> subscribers plus the set of subscribers
+    that accept any value; minimum severities are bucketed by rank. Matching
+    walks only the smallest candidate set and checks the other fields with
+    set lookups.
+    """
+
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        self._by_value: Dict[str, Dict[str, Set[Hashable]]] = {
+            field: defaultdict(set) for field in FILTER_FIELDS.values()
+        }
+        self._any: Dict[str, Set[Hashable]] = {field: set() for field in FILTER_FIELDS.values()}
+        self._by_severity: List[Set[Hashable]] = [set() for _ in SEVERITY_RANK]
+        self._min_rank: Dict[Hashable, int] = {}
+        self.filters: Dict[Hashable, Dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self.filters)
+
+    def set(self, key: Hashable, filters: Dict[str, Any]):
+        """Replace a subscriber's filters (as returned by parse_filters)."""
+        self.remove(key)
+        self.filters[key] = filters
+        for name, field in FILTER_FIELDS.items():
+            values = filters.get(name)
+            if values:
+                for value in values:
+                    self._by_value[field][value].add(key)
+            else:
+                self._any[field].add(key)
+        rank = SEVERITY_RANK.get(filters.get('min_severity'), 0)
+        self._min_rank[key] = rank
+        self._by_severity[rank].add(key)
+
+    def remove(self, key: Hashable):
+        filters = self.filters.pop(key, None)
+        if filters is None:
+            return
+        for name, field in FILTER_FIELDS.items():
+            values = filters.get(name)
+            if values:
+                for value in values:
+                    subscribers = self._by_value[field][value]
+                    subscribers.discard(key)
+                    if not subscribers:
+                        del self._by_value[field][value]
+            else:
+                self._any[field].discard(key)
+        self._by_severity[self._min_rank.pop(key)].discard(key)
+
+    def match(self, alert: Dict[str, Any]) -> List[Hashable]:
+        """Subscribers whose filters accept the alert."""
+        rank = SEVERITY_RANK.get(alert.get('severity'), len(SEVERITY_RANK) - 1)
+        fields = [
+            (self._by_value[field].get(str(alert.get(field)), ()), self._any[field])
+            for field in FILTER_FIELDS.values()
+        ]
+        severity_sets = self._by_severity[:rank + 1]
+
+        # Walk the smallest candidate set, checking the other fields with set lookups
+        source = min(fields, key=lambda sets: len(sets[0]) + len(sets[1]))
+        if sum(len(s) for s in severity_sets) < len(source[0]) + len(source[1]):
+            candidates = chain.from_iterable(severity_sets)
+        else:
+            candidates = chain(*source)
+            fields.remove(source)
+
+        matched = []
+        for key in candidates:
+            if self._min_rank[key] > rank:
+                continue
+            for values, any_value in fields:
+                if key not in values and key not in any_value:
+                    break
+            else:
+                matched.append(key)
+        return matched
+
+
+class ClientConnection:
+    """One client's pending messages, delivered in order by its own sender task."""
+
+    def __init__(self, websocket: WebSocket, queue_size: int, overflow_policy: str):
+        self.websocket = websocket
+        self.queue_size = queue_size
+        self.overflow_policy = overflow_policy
+        self.queue: Deque[Tuple[float, str]] = deque()
+        self.task: asyncio.Task = None
+        self._ready = asyncio.Event()
+
+        client = websocket.client
+        self.name = f"{client.host}:{client.port}" if client else "unknown"
+        self.sent = 0
+        self.dropped = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def enqueue(self, text: str) -> bool:
+        """
+        Queue a serialized message without waiting.
+
+        Returns:
+            False if the queue is full and the policy is to disconnect.
+        """
+        if len(self.queue) >= self.queue_size:
+            if self.overflow_policy == "disconnect":
+                return False
+            self.queue.popleft()
+            self.dropped += 1
+        self.queue.append((time.monotonic(), text))
+        self._ready.set()
+        return True
+
+    async def run(self, send_timeout: float):
+        while True:
+            while not self.queue:
+                self._ready.clear()
+                await self._ready.wait()
+            enqueued_at, text = self.queue.popleft()
+            await asyncio.wait_for(self.websocket.send_text(text), timeout=send_timeout)
+            self.sent += 1
+            self.last_lag = time.monotonic() - enqueued_at
+            self.max_lag = max(self.max_lag, self.last_lag)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'client': self.name,
+            'queued': len(self.queue),
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'lag_ms': round(self.last_lag * 1000, 1),
+            'max_lag_ms': round(self.max_lag * 1000, 1),
+        }
+
+
+class ConnectionManager:
+    """
+    Tracks connected clients in a dict for O(1) connect/disconnect.
+
+    broadcast() serializes a message once and only appends it to each
+    client's queue, so a slow client delays nobody but itself. When a queue
+    is full the client either loses its oldest message or is disconnected,
+    per WS_OVERFLOW_POLICY. Must be used from the event loop thread.
+    """
+
+    def __init__(
+        self,
+        queue_size: int = config.WS_SEND_QUEUE_SIZE,
+        overflow_policy: str = config.WS_OVERFLOW_POLICY,
+        send_timeout: float = config.WS_SEND_TIMEOUT
+    ):
+        self.queue_size = queue_size
+        self.overflow_policy = overflow_policy
+        self.send_timeout = send_timeout
+        self.clients: Dict[WebSocket, ClientConnection] = {}
+        self.subscriptions = SubscriptionIndex()
+        self.disconnected_slow = 0
+
+    def __len__(self) -> int:
+        return len(self.clients)
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
-        logger.info(f"Client connected. Total connections: {len(self.active_connections)}")
+        client = ClientConnection(websocket, self.queue_size, self.overflow_policy)
+        client.task = asyncio.create_task(self._sender(client))
+        self.clients[websocket] = client
+        self.subscriptions.set(websocket, {})  # Everything until the client subscribes
+        logger.info(f"Client connected. Total connections: {len(self.clients)}")
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-        logger.info(f"Client disconnected. Total connections: {len(self.active_connections)}")
-
-    async def broadcast(self, message: dict):
-        """Broadcast message to all connected clients"""
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except Exception as e:
-                logger.error(f"Error sending to client: {e}")
-                disconnected.append(connection)
-        
-        # Clean up disconnected clients
-        for conn in disconnected:
-            if conn in self.active_connections:
-                self.active_connections.remove(conn)
+        client = self.clients.pop(websocket, None)
+        if client is None:
+            return
+        self.subscriptions.remove(websocket)
+        if client.task is not asyncio.current_task():
+            client.task.cancel()
+        logger.info(f"Client disconnected. Total connections: {len(self.clients)}")
+
+    async def _sender(self, client: ClientConnection):
+        try:
+            await client.run(self.send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error sending to client {client.name}: {e!r}")
+            self._drop(client)
+
+    def _drop(self, client: ClientConnection):
+        """Unregister a client the server gave up on and close its socket."""
+        self.disconnect(client.websocket)
+        asyncio.create_task(self._close(client.websocket))
+
+    @staticmethod
+    async def _close(websocket: WebSocket):
+        try:
+            await websocket.close(code=1013)  # Try again later
+        except Exception:
+            pass
+
+    def send(self, websocket: WebSocket, message: dict):
+        """Queue a message for one client."""
+        client = self.clients.get(websocket)
+        if client is not None and not client.enqueue(serialize(message)):
+            self.disconnected_slow += 1
+            self._drop(client)
+
+    def subscribe(self, websocket: WebSocket, message: dict) -> Dict[str, Any]:
+        """
+        Replace a client's filters from a subscribe message.
+
+        Raises:
+            ValueError: On an unknown zone or severity.
+        """
+        filters = parse_filters(message)
+        if websocket in self.clients:
+            self.subscriptions.set(websocket, filters)
+        return filters
+
+    def broadcast(self, message: dict):
+        """Queue a message for every connected client"""
+        self._fan_out(serialize(message), list(self.clients.values()))
+
+    def broadcast_alert(self, alert: dict):
+        """Queue an alert for the clients whose subscription matches it"""
+        clients = [self.clients[key] for key in self.subscriptions.match(alert)]
+        self._fan_out(serialize(alert), clients)
+
+    def _fan_out(self, text: str, clients: List[ClientConnection]):
+        for client in clients:
+            if not client.enqueue(text):
+                logger.warning(f"Client {client.name} fell {client.queue_size} messages behind, disconnecting")
+                self.disconnected_slow += 1
+                self._drop(client)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Queue depth, sent/dropped counts, delivery lag and filters per client."""
+        return [
+            {**client.stats(), 'filters': self.subscriptions.filters.get(websocket, {})}
+            for websocket, client in self.clients.items()
+        ]
 
 manager = ConnectionManager()
@@ -129,6 +129,12 @@ function App() {
           return; // Ignore system messages
         }
 
+        // An incident changed state (e.g. resolved after its cooldown)
+        if (data.type === 'incident_update') {
+          setAlerts(prev => prev.map(a => (a.id === data.id ? { ...a, ...data } : a)));
+          return;
+        }
+
         // It's an alert
         setAlerts(prev => [data, ...prev]);
 
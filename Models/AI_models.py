@@ -1,18 +1,24 @@
 import os
+import sys
+import time
 import cv2
 import logging
-from typing import List, Optional, Dict, Any, Tuple
+from typing import Callable, List, Optional, Dict, Any, Tuple
 from collections import deque
 import config
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-try:
-    from ultralytics import YOLO
-except ImportError:
-    logger.error("ultralytics not found. Please install it using `pip install ultralytics`")
-    YOLO = None
+# Shared model components live in Backend/models
+sys.path.append(os.path.join(config.BASE_DIR, 'Backend'))
+from models.model_registry import model_registry
+from models.face_index import FaceIndex
+from models.face_cache import load_face_encodings
+from models.tracker import MultiObjectTracker
+from models.motion_gate import MotionGate
+from models.alert_throttle import AlertThrottle, region_key
+from scenarios.pipeline import ScenarioPipeline
 
 try:
     import face_recognition
@@ -27,7 +33,11 @@ class CCTVSystem:
         model_path: str = config.YOLO_MODEL_PATH,
         known_faces_dir: Optional[str] = config.KNOWN_FACES_DIR,
         critical_classes: List[str] = config.CRITICAL_CLASSES,
-        confidence_threshold: float = config.DETECTION_CONFIDENCE_THRESHOLD
+        confidence_threshold: float = config.DETECTION_CONFIDENCE_THRESHOLD,
+        classes: Optional[List[str]] = None,
+        motion_gate: Optional[MotionGate] = None,
+        scenario_pipeline: Optional[ScenarioPipeline] = None,
+        on_alert: Optional[Callable[[Dict[str, Any]], None]] = None
     ):
         """
         Initialize the CCTV System with YOLO model and Face Recognition.
@@ -37,26 +47,48 @@ class CCTVSystem:
             known_faces_dir (str, optional): Directory containing images of known faces.
             critical_classes (List[str]): List of classes that trigger alerts.
             confidence_threshold (float): Minimum confidence for a valid detection.
+            classes (List[str], optional): Only detect these classes. Detects every class when None.
+            motion_gate (MotionGate, optional): Skips inference in process_frame on static frames.
+            scenario_pipeline (ScenarioPipeline, optional): Zone scenarios to run on each frame's detections.
+            on_alert (Callable, optional): Called with every new incident, e.g. to forward it to the server.
         """
         self.critical_classes = critical_classes
         self.confidence_threshold = confidence_threshold
         self.model = self._load_yolo_model(model_path)
-        self.known_face_encodings = []
-        self.known_face_names = []
+        self.class_ids = self._resolve_class_ids(classes)
+        self.face_index = FaceIndex(
+            tolerance=config.FACE_MATCH_TOLERANCE,
+            num_partitions=config.FACE_INDEX_PARTITIONS,
+            num_probes=config.FACE_INDEX_PROBES
+        )
         self.alerts = deque(maxlen=100)  # Store last 100 alerts
+        self.alert_throttle = AlertThrottle()
+        self.tracker = MultiObjectTracker(
+            iou_threshold=config.TRACKER_IOU_THRESHOLD,
+            max_age=config.TRACKER_MAX_AGE
+        )
+        self.reverify_interval = config.FACE_REVERIFY_INTERVAL
+        self.motion_gate = motion_gate
+        self.scenario_pipeline = scenario_pipeline
+        self.on_alert = on_alert
+        self._last_results: Tuple[List[Dict[str, Any]], List[Dict[str, Any]]] = ([], [])
         
         if known_faces_dir and face_recognition:
             self._load_known_faces(known_faces_dir)
 
     def _load_yolo_model(self, model_path: str):
-        if YOLO:
-            try:
-                logger.info(f"Loading YOLO model from {model_path}...")
-                return YOLO(model_path)
-            except Exception as e:
-                logger.error(f"Failed to load YOLO model: {e}")
-                return None
-        return None
+        """Gets the YOLO model from the process-wide registry, loading it on first use."""
+        return model_registry.get(model_path)
+
+    def _resolve_class_ids(self, classes: Optional[List[str]]) -> Optional[List[int]]:
+        """Maps class names to model class ids so filtering happens inside the model call."""
+        if not classes or not self.model:
+            return None
+        name_to_id = {name: cls_id for cls_id, name in self.model.names.items()}
+        unknown = [name for name in classes if name not in name_to_id]
+        if unknown:
+            logger.warning(f"Classes not known to the model will be ignored: {unknown}")
+        return [name_to_id[name] for name in classes if name in name_to_id]
 
     def _load_known_faces(self, known_faces_dir: str):
         """Loads known face encodings from a directory."""
@@ -65,17 +97,15 @@ class CCTVSystem:
             return
 
         logger.info(f"Loading known faces from {known_faces_dir}...")
-        for filename in os.listdir(known_faces_dir):
-            if filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-                filepath = os.path.join(known_faces_dir, filename)
-                try:
-                    image = face_recognition.load_image_file(filepath)
-                    encodings = face_recognition.face_encodings(image)
-                    if encodings:
-                        self.known_face_encodings.append(encodings[0])
-                        self.known_face_names.append(os.path.splitext(filename)[0])
-                except Exception as e:
-                    logger.error(f"Error processing face image {filename}: {e}")
+        for name, encoding in load_face_encodings(known_faces_dir):
+            self.face_index.add(encoding, name, 'known')
+
+        # Staff and children rosters, so tracks carry the person types the scenarios need
+        for subdir, person_type in (('staff', 'staff'), ('children', 'child')):
+            directory = os.path.join(known_faces_dir, subdir)
+            if os.path.isdir(directory):
+                for name, encoding in load_face_encodings(directory):
+                    self.face_index.add(encoding, name, person_type)
 
     def detect_objects(self, frame: Any) -> List[Dict[str, Any]]:
         """
@@ -84,22 +114,42 @@ class CCTVSystem:
         Returns:
             List of dictionaries containing detection details.
         """
-        detections = []
-        if self.model:
-            results = self.model(frame, verbose=False)
-            for result in results:
-                for box in result.boxes:
-                    cls_id = int(box.cls[0])
-                    conf = float(box.conf[0])
-                    label = self.model.names[cls_id]
-                    
-                    if conf >= self.confidence_threshold:
-                        detections.append({
-                            'label': label,
-                            'confidence': conf,
-                            'bbox': box.xyxy[0].tolist()
-                        })
-        return detections
+        return self.detect_objects_batch([frame])[0]
+
+    def detect_objects_batch(self, frames: List[Any]) -> List[List[Dict[str, Any]]]:
+        """
+        Detects objects in several frames with a single YOLO call.
+
+        The confidence threshold and class filter are applied by the model, and
+        boxes, scores and classes are read out as whole arrays per frame.
+
+        Returns:
+            One list of detection dictionaries per input frame.
+        """
+        if not self.model or not frames:
+            return [[] for _ in frames]
+
+        with model_registry.predict_lock(self.model):
+            results = self.model(
+                frames,
+                conf=self.confidence_threshold,
+                iou=config.INFERENCE_IOU_THRESHOLD,
+                classes=self.class_ids,
+                verbose=False
+            )
+        names = self.model.names
+        batch_detections = []
+        for result in results:
+            boxes = result.boxes.cpu().numpy()
+            batch_detections.append([
+                {'label': names[cls_id], 'confidence': conf, 'bbox': bbox}
+                for cls_id, conf, bbox in zip(
+                    boxes.cls.astype(int).tolist(),
+                    boxes.conf.tolist(),
+                    boxes.xyxy.tolist()
+                )
+            ])
+        return batch_detections
 
     def recognize_faces(self, frame: Any, face_locations: List[Tuple[int, int, int, int]]) -> List[Dict[str, Any]]:
         """
@@ -113,63 +163,171 @@ class CCTVSystem:
             List of dictionaries with recognized name and location.
         """
         recognized_faces = []
-        if face_recognition and self.known_face_encodings and face_locations:
+        if face_recognition and len(self.face_index) and face_locations:
             rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
             face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
 
-            for face_encoding, face_location in zip(face_encodings, face_locations):
-                matches = face_recognition.compare_faces(self.known_face_encodings, face_encoding)
-                name = "Unknown"
-
-                if True in matches:
-                    first_match_index = matches.index(True)
-                    name = self.known_face_names[first_match_index]
-
-                recognized_faces.append({'name': name, 'location': face_location})
+            # One distance computation for every face in the frame
+            matches = self.face_index.match(face_encodings)
+            for match, face_location in zip(matches, face_locations):
+                recognized_faces.append({
+                    'name': match['name'] if match else "Unknown",
+                    'person_type': match['person_type'] if match else None,
+                    'location': face_location
+                })
         
         return recognized_faces
 
-    def trigger_alert(self, event: str, details: str, camera: str = "Cam 01"):
+    def trigger_alert(
+        self,
+        event: str,
+        details: str,
+        camera: str = "Cam 01",
+        scenario: Optional[str] = None,
+        subject: Any = None,
+        severity: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
         Logs an alert and adds it to the alerts queue.
+
+        Repeats for the same camera, scenario and subject (track ID or region)
+        within the severity's cooldown are merged into the open incident,
+        which is returned without logging or queueing anything. The severity
+        defaults to the scenario's SCENARIO_SEVERITY.
         """
-        timestamp = logging.Formatter.converter.now().strftime('%Y-%m-%d %H:%M:%S')
-        alert_message = f"ALERT: {event} - {details}"
-        logger.warning(alert_message)
-        self.alerts.appendleft({
-            "time": timestamp,
+        scenario = scenario or event.lower().replace(' ', '_')
+        alert = {
+            "time": time.strftime('%Y-%m-%d %H:%M:%S'),
             "camera": camera,
+            "scenario": scenario,
             "event": event,
             "details": details,
             "status": "Review"
-        })
+        }
+        if severity:
+            alert["severity"] = severity
+        incident, is_new = self.alert_throttle.observe(camera, scenario, subject, alert)
+        if is_new:
+            logger.warning(f"ALERT: {event} - {details}")
+            self.alerts.appendleft(incident)
+            if self.on_alert:
+                self.on_alert(incident)
+        return incident
+
+    def _expire_incidents(self):
+        for incident in self.alert_throttle.expire():
+            incident['status'] = "Resolved"
+            logger.info(f"Resolved: {incident['event']} on {incident['camera']} "
+                        f"after {incident['occurrences']} occurrences")
 
     def process_frame(self, frame: Any) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
         """
         Process a single frame for object detection and face recognition.
         Returns structured data, does not draw on the frame.
 
+        With a motion gate, frames that did not change since the last inferred
+        frame return that frame's results without running the models.
+
         Returns:
             A tuple containing (object_detections, face_recognitions).
         """
-        detections = self.detect_objects(frame)
-        person_locations = []
+        if self.motion_gate and not self.motion_gate.should_infer(frame):
+            return self._last_results
+        self._last_results = self._process_detections(frame, self.detect_objects(frame))
+        return self._last_results
+
+    def process_batch(self, frames: List[Any], track: bool = True) -> List[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+        """
+        Process several frames, running YOLO once for the whole batch.
+
+        Args:
+            frames (List): Frames to process, in order.
+            track (bool): Whether the frames are consecutive frames of one
+                stream. Pass False for unrelated still images, so persons are
+                not matched to tracks from other images and every face is
+                recognized.
+
+        Returns:
+            One (object_detections, face_recognitions) tuple per input frame.
+        """
+        return [
+            self._process_detections(frame, detections, tracked=track)
+            for frame, detections in zip(frames, self.detect_objects_batch(frames))
+        ]
+
+    def _process_detections(
+        self,
+        frame: Any,
+        detections: List[Dict[str, Any]],
+        tracked: bool = True
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Raises alerts for a frame's detections and identifies its persons.
+
+        Persons are tracked across frames and face recognition only runs for
+        new tracks or when a track is due for re-verification; otherwise the
+        identity cached on the track is reused. Untracked persons are always
+        recognized.
+        """
+        persons = [det for det in detections if det['label'] == 'person']
+        if tracked:
+            self.tracker.update(persons)
+        frame_index = self.tracker.frame_index
 
         for det in detections:
             if det['label'] in self.critical_classes:
-                self.trigger_alert("Critical Object", f"{det['label']} ({det['confidence']:.2f})")
-            # Efficiently find persons to run face recognition on them
-            if det['label'] == 'person':
-                x1, y1, x2, y2 = map(int, det['bbox'])
-                # face_recognition uses (top, right, bottom, left) format
-                person_locations.append((y1, x2, y2, x1))
-
-        recognized_faces = self.recognize_faces(frame, person_locations)
-        for face in recognized_faces:
+                subject = det.get('track_id') or f"{det['label']}@{region_key(det['bbox'])}"
+                self.trigger_alert("Critical Object", f"{det['label']} ({det['confidence']:.2f})",
+                                   scenario="critical_object", subject=subject)
+
+        recognized_faces = []
+        to_verify = []
+        for det in persons:
+            x1, y1, x2, y2 = map(int, det['bbox'])
+            # face_recognition uses (top, right, bottom, left) format
+            location = (y1, x2, y2, x1)
+            track = self.tracker.tracks[det['track_id']] if tracked else None
+            if track is None or track.needs_verification(frame_index, self.reverify_interval):
+                to_verify.append((track, location))
+            else:
+                recognized_faces.append({
+                    'name': track.identity,
+                    'person_type': track.person_type,
+                    'location': location,
+                    'track_id': track.track_id
+                })
+
+        verified = self.recognize_faces(frame, [location for _, location in to_verify])
+        for (track, location), face in zip(to_verify, verified):
+            if track is None:
+                recognized_faces.append(face)
+                if face['name'] == "Unknown":
+                    top, right, bottom, left = location
+                    self.trigger_alert("Unknown Person", "Unrecognized face detected", scenario="unknown_person",
+                                       subject=region_key([left, top, right, bottom]))
+                continue
+            identity_changed = face['name'] != track.identity
+            track.set_identity(face['name'], face['person_type'], frame_index)
+            face['track_id'] = track.track_id
+            recognized_faces.append(face)
+
+            # Only report when a track's identity is first established or changes
+            if not identity_changed:
+                continue
             if face['name'] == "Unknown":
-                self.trigger_alert("Unknown Person", "Unrecognized face detected")
+                self.trigger_alert("Unknown Person", f"Unrecognized face detected (track {track.track_id})",
+                                   scenario="unknown_person", subject=track.track_id)
             else:
-                logger.info(f"Recognized: {face['name']}")
+                logger.info(f"Recognized: {face['name']} (track {track.track_id})")
+
+        if self.scenario_pipeline:
+            # Scenarios reuse the identities cached on the tracks instead of recognizing faces again
+            identities = {face['track_id']: face for face in recognized_faces if face.get('track_id') is not None}
+            for alert in self.scenario_pipeline.process(frame, detections, identities=identities):
+                self.trigger_alert(alert['event'], alert['details'], camera=self.scenario_pipeline.camera_name,
+                                   scenario=alert['scenario'], severity=alert.get('severity'),
+                                   subject=alert.get('track_id') or region_key(alert['bbox']))
+        self._expire_incidents()
 
         return detections, recognized_faces
 
@@ -1,57 +1,254 @@
+"""
+Batch Processor - Pipelined reprocessing of still images.
+
+Images flow through three stages that run concurrently:
+  decode  - a thread pool prefetches and decodes images with cv2.imread
+  infer   - a process pool where every worker owns its own CCTVSystem
+  write   - a thread pool encodes the annotated images and writes them to disk
+"""
 import os
-import cv2
+import time
+import argparse
 import logging
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
+from typing import List, Optional, Tuple, Any
 import config
-from Models.AI_models import CCTVSystem
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+# Per-process CCTVSystem, created once by _init_worker
+_worker_system = None
+
+
+def _init_worker(threads_per_worker: int):
+    """
+    Initialize an inference worker process.
+
+    Thread counts are capped before torch/OpenCV are imported so that N workers
+    together use roughly the available cores instead of N times that.
+    """
+    global _worker_system
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads_per_worker)
+
+    import cv2
+    cv2.setNumThreads(threads_per_worker)
+    try:
+        import torch
+        torch.set_num_threads(threads_per_worker)
+    except ImportError:
+        pass
+
+    from Models.AI_models import CCTVSystem
+    _worker_system = CCTVSystem()
+
+
+def _infer(frames: List[Any]) -> List[Any]:
+    """Run detection and face recognition on a batch of frames and return them annotated."""
+    return [
+        _worker_system.draw_on_frame(frame, detections, recognized_faces)
+        for frame, (detections, recognized_faces) in zip(frames, _worker_system.process_batch(frames, track=False))
+    ]
+
+
+def _warm_face_cache(known_faces_dir: Optional[str] = config.KNOWN_FACES_DIR):
+    """
+    Encode any new roster photos once in the parent, so the workers all start
+    from a warm face cache instead of each encoding the same photos at once.
+    """
+    if not known_faces_dir:
+        return
+    import sys
+    sys.path.append(os.path.join(config.BASE_DIR, 'Backend'))
+    from models.face_cache import load_face_encodings
+    for directory in (known_faces_dir,
+                      os.path.join(known_faces_dir, 'staff'),
+                      os.path.join(known_faces_dir, 'children')):
+        load_face_encodings(directory)
+
+
+def _decode(image_path: str) -> Tuple[str, Optional[Any]]:
+    import cv2
+    return image_path, cv2.imread(image_path)
+
+
+def _write(output_path: str, frame: Any) -> bool:
+    import cv2
+    return cv2.imwrite(output_path, frame)
+
+
+def run_pipeline(
+    image_paths: List[str],
+    output_dir: str,
+    workers: int,
+    batch_size: int = 8,
+    decode_threads: int = 4,
+    write_threads: int = 4,
+    prefetch: int = 64,
+) -> dict:
+    """
+    Process images through the decode -> infer -> write pipeline.
+
+    Args:
+        image_paths: Images to process.
+        output_dir: Directory that receives the processed_<name> outputs.
+        workers: Number of inference processes.
+        batch_size: Number of frames per YOLO call.
+        decode_threads: Number of decoder threads.
+        write_threads: Number of writer threads.
+        prefetch: Maximum number of images in flight per stage.
+
+    Returns:
+        Dict with processed/failed counts, elapsed seconds and images/sec.
+    """
+    threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+    logger.info(f"Starting pipeline: {workers} inference workers x {threads_per_worker} threads, "
+                f"{decode_threads} decoders, {write_threads} writers")
+
+    _warm_face_cache()
+
+    processed = 0
+    failed = 0
+    start = time.perf_counter()
+
+    # spawn keeps the workers free of the decoder threads and lets _init_worker
+    # cap thread pools before torch is imported
+    mp_context = multiprocessing.get_context("spawn")
+
+    with ThreadPoolExecutor(max_workers=decode_threads) as decode_pool, \
+            ProcessPoolExecutor(max_workers=workers, mp_context=mp_context,
+                                initializer=_init_worker,
+                                initargs=(threads_per_worker,)) as infer_pool, \
+            ThreadPoolExecutor(max_workers=write_threads) as write_pool:
+
+        paths = iter(image_paths)
+        decoding = deque(decode_pool.submit(_decode, p) for p in islice(paths, prefetch))
+        inferring = deque()
+        writing = deque()
+        batch_paths = []
+        batch_frames = []
+
+        def finish_write():
+            nonlocal processed, failed
+            output_path, future = writing.popleft()
+            try:
+                if future.result():
+                    processed += 1
+                else:
+                    logger.error(f"Failed to write image: {output_path}")
+                    failed += 1
+            except Exception as e:
+                logger.error(f"Error writing {output_path}: {e}")
+                failed += 1
+
+        def finish_inference():
+            nonlocal failed
+            image_paths, future = inferring.popleft()
+            try:
+                frames = future.result()
+            except Exception as e:
+                logger.error(f"Error processing batch starting at {image_paths[0]}: {e}")
+                failed += len(image_paths)
+                return
+            for image_path, frame in zip(image_paths, frames):
+                output_path = os.path.join(output_dir, f"processed_{os.path.basename(image_path)}")
+                writing.append((output_path, write_pool.submit(_write, output_path, frame)))
+            while len(writing) > prefetch:
+                finish_write()
+
+        def submit_batch():
+            inferring.append((list(batch_paths), infer_pool.submit(_infer, list(batch_frames))))
+            batch_paths.clear()
+            batch_frames.clear()
+            while len(inferring) * batch_size > prefetch:
+                finish_inference()
+
+        while decoding:
+            image_path, frame = decoding.popleft().result()
+            next_path = next(paths, None)
+            if next_path is not None:
+                decoding.append(decode_pool.submit(_decode, next_path))
+
+            if frame is None:
+                logger.error(f"Failed to read image: {image_path}")
+                failed += 1
+                continue
+
+            batch_paths.append(image_path)
+            batch_frames.append(frame)
+            if len(batch_frames) >= batch_size:
+                submit_batch()
+
+        if batch_frames:
+            submit_batch()
+        while inferring:
+            finish_inference()
+        while writing:
+            finish_write()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "processed": processed,
+        "failed": failed,
+        "elapsed": elapsed,
+        "images_per_sec": processed / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def parse_args():
+    default_workers = max(1, (os.cpu_count() or 1) // 2)
+    parser = argparse.ArgumentParser(description="Reprocess still images through the CCTV pipeline.")
+    parser.add_argument('--input-dir', default=os.path.join(config.BASE_DIR, 'data', 'testing_images'),
+                        help="Directory of images to process")
+    parser.add_argument('--output-dir', default=os.path.join(config.BASE_DIR, 'data', 'output_images'),
+                        help="Directory to write processed images to")
+    parser.add_argument('--workers', type=int, default=default_workers,
+                        help=f"Number of inference worker processes (default: {default_workers})")
+    parser.add_argument('--batch-size', type=int, default=8, help="Number of frames per inference call")
+    parser.add_argument('--decode-threads', type=int, default=4, help="Number of image decoder threads")
+    parser.add_argument('--write-threads', type=int, default=4, help="Number of image writer threads")
+    parser.add_argument('--prefetch', type=int, default=64, help="Maximum images in flight per stage")
+    return parser.parse_args()
+
 
 def main():
-    # Paths
-    testing_images_dir = os.path.join(config.BASE_DIR, 'data', 'testing_images')
-    output_images_dir = os.path.join(config.BASE_DIR, 'data', 'output_images')
-    
+    args = parse_args()
+
     # Create output directory if it doesn't exist
-    os.makedirs(output_images_dir, exist_ok=True)
-    
-    # Initialize System
-    system = CCTVSystem()
-    
+    os.makedirs(args.output_dir, exist_ok=True)
+
     # Process Images
-    if not os.path.exists(testing_images_dir):
-        logger.error(f"Testing images directory not found: {testing_images_dir}")
+    if not os.path.exists(args.input_dir):
+        logger.error(f"Testing images directory not found: {args.input_dir}")
         return
 
-    images = [f for f in os.listdir(testing_images_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
-    
+    images = sorted(f for f in os.listdir(args.input_dir) if f.lower().endswith(IMAGE_EXTENSIONS))
+
     if not images:
         logger.warning("No images found in testing directory.")
         return
 
     logger.info(f"Found {len(images)} images to process.")
 
-    for image_name in images:
-        image_path = os.path.join(testing_images_dir, image_name)
-        logger.info(f"Processing {image_name}...")
-        
-        frame = cv2.imread(image_path)
-        if frame is None:
-            logger.error(f"Failed to read image: {image_path}")
-            continue
-            
-        # Process the frame to get data
-        detections, recognized_faces = system.process_frame(frame)
-        processed_frame = system.draw_on_frame(frame, detections, recognized_faces)
-        
-        # Save result
-        output_path = os.path.join(output_images_dir, f"processed_{image_name}")
-        cv2.imwrite(output_path, processed_frame)
-        logger.info(f"Saved processed image to {output_path}")
-
-    logger.info("Processing complete.")
+    result = run_pipeline(
+        [os.path.join(args.input_dir, f) for f in images],
+        args.output_dir,
+        workers=max(1, args.workers),
+        batch_size=max(1, args.batch_size),
+        decode_threads=max(1, args.decode_threads),
+        write_threads=max(1, args.write_threads),
+        prefetch=max(1, args.prefetch),
+    )
+
+    logger.info(f"Processing complete: {result['processed']} processed, {result['failed']} failed "
+                f"in {result['elapsed']:.1f}s ({result['images_per_sec']:.2f} images/sec)")
 
 if __name__ == "__main__":
     main()
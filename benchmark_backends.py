@@ -0,0 +1,176 @@
+"""
+Benchmark Backends - Latency and accuracy of the detection model on each inference backend.
+
+    python export_models.py --int8
+    python benchmark_backends.py
+
+Every variant runs the same images with the same NMS IoU
+(INFERENCE_IOU_THRESHOLD). Latency is measured one frame per call at
+DETECTION_CONFIDENCE_THRESHOLD. Accuracy is COCO-style AP of one class
+(default "car") against the box labels in data/train_solution_bounding_boxes.
+"""
+import os
+import sys
+import csv
+import time
+import argparse
+import logging
+from collections import defaultdict
+from typing import Dict, List, Tuple
+import cv2
+import numpy as np
+import config
+
+sys.path.append(os.path.join(config.BASE_DIR, 'Backend'))
+from models.onnx_detector import OnnxDetector, BACKENDS as ONNX_BACKENDS
+from models.onnx_export import onnx_path_for, IMAGE_EXTENSIONS
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+VARIANTS = ['ultralytics'] + [f"{backend}{suffix}" for backend in ONNX_BACKENDS for suffix in ('', '-int8')]
+
+
+def load_variant(variant: str, weights_path: str):
+    """Model for a variant name like "onnxruntime-int8", called the same way for every backend."""
+    backend, _, precision = variant.partition('-')
+    if backend == 'ultralytics':
+        from ultralytics import YOLO
+        return YOLO(weights_path)
+    return OnnxDetector(onnx_path_for(weights_path, int8=precision == 'int8'), backend=backend)
+
+
+def load_labels(csv_path: str) -> Dict[str, np.ndarray]:
+    """Ground-truth boxes per image name."""
+    boxes = defaultdict(list)
+    with open(csv_path, newline='') as f:
+        for row in csv.DictReader(f):
+            boxes[row['image']].append([float(row[k]) for k in ('xmin', 'ymin', 'xmax', 'ymax')])
+    return {name: np.array(b, dtype=np.float32) for name, b in boxes.items()}
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of (N, 4) and (M, 4) xyxy boxes."""
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(rb - lt, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def average_precision(
+    predictions: List[Tuple[np.ndarray, np.ndarray]],
+    labels: List[np.ndarray],
+    iou_threshold: float
+) -> float:
+    """
+    AP with 101-point interpolation. predictions and labels hold, per image,
+    (boxes, scores) and ground-truth boxes.
+    """
+    scores, hits = [], []
+    total = sum(len(gt) for gt in labels)
+    for (boxes, conf), gt in zip(predictions, labels):
+        order = np.argsort(-conf)
+        boxes, conf = boxes[order], conf[order]
+        matched = np.zeros(len(gt), dtype=bool)
+        ious = box_iou(boxes, gt) if len(gt) and len(boxes) else np.zeros((len(boxes), 0))
+        for i in range(len(boxes)):
+            candidates = np.where(~matched & (ious[i] >= iou_threshold))[0] if ious.shape[1] else []
+            hit = len(candidates) > 0
+            if hit:
+                matched[candidates[ious[i, candidates].argmax()]] = True
+            scores.append(conf[i])
+            hits.append(hit)
+    if not total or not scores:
+        return 0.0
+
+    hits = np.array(hits)[np.argsort(-np.array(scores))]
+    tp = np.cumsum(hits)
+    recall = tp / total
+    precision = tp / np.arange(1, len(tp) + 1)
+    precision = np.maximum.accumulate(precision[::-1])[::-1]  # Monotone envelope
+    points = np.linspace(0, 1, 101)
+    index = np.searchsorted(recall, points, side='left')
+    return float(np.mean([precision[i] if i < len(precision) else 0.0 for i in index]))
+
+
+def benchmark(model, frames: List[np.ndarray], labels: List[np.ndarray], class_id: int,
+              latency_frames: int, warmup: int) -> Dict[str, float]:
+    for frame in frames[:warmup]:
+        model(frame, conf=config.DETECTION_CONFIDENCE_THRESHOLD, iou=config.INFERENCE_IOU_THRESHOLD, verbose=False)
+
+    timings = []
+    for frame in frames[:latency_frames]:
+        start = time.perf_counter()
+        model(frame, conf=config.DETECTION_CONFIDENCE_THRESHOLD, iou=config.INFERENCE_IOU_THRESHOLD, verbose=False)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    predictions = []
+    for frame in frames:
+        boxes = model(frame, conf=0.001, iou=config.INFERENCE_IOU_THRESHOLD, classes=[class_id],
+                      verbose=False)[0].boxes.cpu().numpy()
+        predictions.append((np.asarray(boxes.xyxy, dtype=np.float32), np.asarray(boxes.conf, dtype=np.float32)))
+
+    return {
+        'p50_ms': float(np.percentile(timings, 50)),
+        'p95_ms': float(np.percentile(timings, 95)),
+        'fps': 1000 / float(np.mean(timings)),
+        'map50': average_precision(predictions, labels, 0.5),
+        'map50_95': float(np.mean([average_precision(predictions, labels, t) for t in np.arange(0.5, 0.96, 0.05)])),
+    }
+
+
+def parse_args():
+    data_dir = os.path.join(config.BASE_DIR, 'data')
+    parser = argparse.ArgumentParser(description="Compare detection latency and mAP across inference backends.")
+    parser.add_argument('--weights', default=config.YOLO_MODEL_PATH, help="Weights file exported by export_models.py")
+    parser.add_argument('--variants', nargs='+', default=VARIANTS, choices=VARIANTS, help="Backends to compare")
+    parser.add_argument('--images', default=os.path.join(data_dir, 'training_images'), help="Evaluation images")
+    parser.add_argument('--labels', default=os.path.join(data_dir, 'train_solution_bounding_boxes (1).csv'),
+                        help="CSV of image,xmin,ymin,xmax,ymax ground-truth boxes")
+    parser.add_argument('--label-class', default='car', help="Model class the labels are for")
+    parser.add_argument('--limit', type=int, default=0, help="Evaluate only the first N images (0 = all)")
+    parser.add_argument('--latency-frames', type=int, default=100, help="Frames timed per variant")
+    parser.add_argument('--warmup', type=int, default=5, help="Untimed frames run first")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    # Load every variant first, so a bad --label-class fails before any images are decoded
+    models = {}
+    for variant in args.variants:
+        try:
+            model = load_variant(variant, args.weights)
+        except Exception as e:
+            logger.warning(f"Skipping {variant}: {e}")
+            continue
+        class_ids = {name: cls_id for cls_id, name in model.names.items()}
+        if args.label_class not in class_ids:
+            sys.exit(f"--label-class {args.label_class!r} is not a class of {variant}. "
+                     f"Valid classes: {', '.join(sorted(class_ids))}")
+        models[variant] = (model, class_ids[args.label_class])
+
+    names = sorted(n for n in os.listdir(args.images) if n.lower().endswith(IMAGE_EXTENSIONS))
+    if args.limit:
+        names = names[:args.limit]
+    ground_truth = load_labels(args.labels)
+    frames = [cv2.imread(os.path.join(args.images, name)) for name in names]
+    labels = [ground_truth.get(name, np.zeros((0, 4), dtype=np.float32)) for name in names]
+    logger.info(f"Evaluating on {len(frames)} images with {sum(len(l) for l in labels)} labelled boxes")
+
+    results = {}
+    for variant, (model, class_id) in models.items():
+        logger.info(f"Benchmarking {variant}...")
+        results[variant] = benchmark(model, frames, labels, class_id, args.latency_frames, args.warmup)
+
+    print(f"\n{'backend':<20}{'p50 ms':>10}{'p95 ms':>10}{'fps':>8}{'mAP50':>9}{'mAP50-95':>10}")
+    for variant, r in results.items():
+        print(f"{variant:<20}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['fps']:>8.1f}"
+              f"{r['map50']:>9.3f}{r['map50_95']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Camera Monitor - Runs detection and face recognition on the live camera streams.
+
+    python camera_monitor.py
+
+Every camera in CAMERA_SOURCES gets its own CCTVSystem with its own motion
+gate, so static frames reuse the camera's last results instead of running
+the models, and the scenario pipeline of its zone, built once at startup.
+New incidents are posted to the server's POST /alerts (MONITOR_ALERT_URL),
+which stores and broadcasts them like any other alert.
+GET /health on MONITOR_PORT reports the inferred/gated frame counts and
+per-stage scenario timings of every camera, for tuning the MOTION_GATE_*
+settings.
+"""
+import os
+import sys
+import json
+import queue
+import datetime
+import logging
+import threading
+import urllib.request
+from typing import Any, Dict, List, Optional, Union
+import cv2
+import uvicorn
+from fastapi import FastAPI
+import config
+from Models.AI_models import CCTVSystem
+
+sys.path.append(os.path.join(config.BASE_DIR, 'Backend'))
+from models.motion_gate import MotionGate
+from models.zone_manager import zone_manager
+from config import ZONE_LABELS
+from scenarios.pipeline import build_pipelines
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+RECONNECT_SECONDS = 5.0
+ALERT_QUEUE_SIZE = 1000
+ALERT_POST_TIMEOUT = 5.0
+
+
+class CameraMonitor:
+    """
+    One processing thread per live camera, each with its own CCTVSystem,
+    motion gate and scenario pipeline, plus one thread posting new incidents
+    to the server so inference never waits on the network.
+    """
+
+    def __init__(
+        self,
+        sources: Dict[int, Union[int, str]] = config.CAMERA_SOURCES,
+        alert_url: Optional[str] = config.MONITOR_ALERT_URL
+    ):
+        self.sources = sources
+        self.alert_url = alert_url
+        self.zones = {camera_id: zone_manager.get_camera_zone(camera_id) for camera_id in sources}
+        pipelines = build_pipelines(self.zones)
+        self.systems: Dict[int, CCTVSystem] = {
+            camera_id: CCTVSystem(
+                motion_gate=MotionGate(),
+                scenario_pipeline=pipelines[camera_id],
+                on_alert=lambda incident, camera_id=camera_id: self._queue_alert(camera_id, incident)
+            )
+            for camera_id in sources
+        }
+        self.frames: Dict[int, int] = {camera_id: 0 for camera_id in sources}
+        self.alerts_posted = 0
+        self.alerts_dropped = 0
+        self._alert_queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=ALERT_QUEUE_SIZE)
+        self._stop_event = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        for camera_id, source in self.sources.items():
+            thread = threading.Thread(target=self._run, args=(camera_id, source),
+                                      name=f"camera-{camera_id}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        if self.alert_url:
+            thread = threading.Thread(target=self._post_alerts, name="alert-poster", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Monitoring {len(self.sources)} cameras")
+
+    def _queue_alert(self, camera_id: int, incident: Dict[str, Any]):
+        """Called by a camera's CCTVSystem with every new incident; queues it in the server's alert format."""
+        if not self.alert_url:
+            return
+        zone = self.zones[camera_id]
+        alert = {
+            'timestamp': datetime.datetime.now().isoformat(),
+            'camera': f"CAM-{camera_id + 1:02d}",
+            'zone': ZONE_LABELS.get(zone, zone.value),
+            'zone_key': zone.value,
+            'scenario': incident['scenario'],
+            'event': incident['event'],
+            'severity': incident['severity'],
+            'details': incident['details'],
+            'status': 'active',
+        }
+        try:
+            self._alert_queue.put_nowait(alert)
+        except queue.Full:
+            self.alerts_dropped += 1
+            logger.warning(f"Alert queue full, dropped: {alert['event']} on {alert['camera']}")
+
+    def _post_alerts(self):
+        while not self._stop_event.is_set():
+            try:
+                alert = self._alert_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            request = urllib.request.Request(
+                self.alert_url, data=json.dumps(alert).encode(), method="POST",
+                headers={"Content-Type": "application/json"}
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=ALERT_POST_TIMEOUT):
+                    self.alerts_posted += 1
+            except OSError as e:
+                self.alerts_dropped += 1
+                logger.error(f"Could not post alert to {self.alert_url}: {e}")
+
+    def _run(self, camera_id: int, source: Union[int, str]):
+        system = self.systems[camera_id]
+        while not self._stop_event.is_set():
+            capture = cv2.VideoCapture(source)
+            if not capture.isOpened():
+                logger.error(f"Camera {camera_id}: cannot open {source}, retrying in {RECONNECT_SECONDS:.0f}s")
+                self._stop_event.wait(RECONNECT_SECONDS)
+                continue
+            while not self._stop_event.is_set():
+                ret, frame = capture.read()
+                if not ret:
+                    logger.warning(f"Camera {camera_id}: stream ended, reconnecting in {RECONNECT_SECONDS:.0f}s")
+                    break
+                system.process_frame(frame)
+                self.frames[camera_id] += 1
+            capture.release()
+            self._stop_event.wait(RECONNECT_SECONDS)
+
+    def stop(self):
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join(timeout=2)
+        self._threads = []
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Frames read, motion gate counts and scenario stage timings for every camera."""
+        return [
+            {
+                'camera_id': camera_id,
+                'frames': self.frames[camera_id],
+                'motion_gate': system.motion_gate.stats(),
+                'scenarios': system.scenario_pipeline.stats(),
+            }
+            for camera_id, system in self.systems.items()
+        ]
+
+    def alert_stats(self) -> Dict[str, int]:
+        return {
+            'posted': self.alerts_posted,
+            'dropped': self.alerts_dropped,
+            'queued': self._alert_queue.qsize(),
+        }
+
+
+# Built on startup, so importing this module does not load the models
+monitor: Optional[CameraMonitor] = None
+app = FastAPI(title="CCTV Camera Monitor")
+
+
+@app.on_event("startup")
+async def startup_event():
+    global monitor
+    monitor = CameraMonitor()
+    monitor.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if monitor:
+        monitor.stop()
+
+
+@app.get("/health")
+async def health_check():
+    """Per-camera frame, motion gate and scenario stage counts"""
+    return {
+        "status": "healthy",
+        "timestamp": datetime.datetime.now().isoformat(),
+        "cameras": monitor.stats() if monitor else [],
+        "alerts": monitor.alert_stats() if monitor else {}
+    }
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host=config.SERVER_HOST, port=config.MONITOR_PORT, log_level="info")
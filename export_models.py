@@ -0,0 +1,49 @@
+"""
+Export Models - Converts the detection models to ONNX for the CPU inference backends.
+
+    python export_models.py           # ONNX exports of YOLO_MODEL_PATH and FENCE_MODEL_PATH
+    python export_models.py --int8    # ...plus INT8 versions calibrated on data/training_images
+
+Set INFERENCE_BACKEND to "onnxruntime" or "openvino" (and INFERENCE_INT8) in
+config.py to use them.
+"""
+import os
+import sys
+import argparse
+import logging
+import config
+
+sys.path.append(os.path.join(config.BASE_DIR, 'Backend'))
+from models.onnx_export import export_onnx, quantize_int8, onnx_path_for
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def parse_args():
+    default_weights = [config.YOLO_MODEL_PATH]
+    if os.path.exists(config.FENCE_MODEL_PATH):
+        default_weights.append(config.FENCE_MODEL_PATH)
+    parser = argparse.ArgumentParser(description="Export detection models to ONNX, optionally quantized to INT8.")
+    parser.add_argument('--weights', nargs='+', default=default_weights,
+                        help="Weights files to export (default: the YOLO and fence models)")
+    parser.add_argument('--int8', action='store_true', help="Also write statically quantized INT8 models")
+    parser.add_argument('--image-size', type=int, default=config.INFERENCE_IMAGE_SIZE, help="Model input size")
+    parser.add_argument('--calibration-dir', default=config.QUANT_CALIBRATION_DIR,
+                        help="Images used to calibrate INT8 activation ranges")
+    parser.add_argument('--calibration-images', type=int, default=config.QUANT_CALIBRATION_IMAGES,
+                        help="Number of calibration images")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    for weights_path in args.weights:
+        onnx_path = export_onnx(weights_path, args.image_size, onnx_path_for(weights_path))
+        if args.int8:
+            quantize_int8(onnx_path, onnx_path_for(weights_path, int8=True), args.calibration_dir,
+                          args.calibration_images, args.image_size)
+
+
+if __name__ == "__main__":
+    main()
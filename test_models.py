@@ -2,7 +2,29 @@ import unittest
 import numpy as np
 import cv2
 import os
+import tempfile
+from unittest import mock
 from Models.AI_models import CCTVSystem
+from scenarios.pipeline import ScenarioPipeline
+from scenarios.fence_safety import FenceSafetyScenario
+from scenarios.child_safety import ChildSafetyScenario
+from models.onnx_detector import postprocess
+from models.face_index import FaceIndex
+from models import face_cache
+from models.motion_gate import MotionGate
+from models.heatmap import HeatmapAccumulator
+import asyncio
+import datetime
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.orm import sessionmaker
+from database import Base, Alert, ActivityLog, ActivityRollup
+import alert_persistence
+from alert_persistence import AlertWriter, query_alerts, encode_cursor
+from alert_store import AlertStore
+import activity_recorder
+from activity_recorder import ActivityRecorder
+from websocket_manager import ConnectionManager, SubscriptionIndex, parse_filters
 import config
 
 class TestCCTVSystem(unittest.TestCase):
@@ -25,6 +47,17 @@ class TestCCTVSystem(unittest.TestCase):
         self.assertIsInstance(detections, list)
         self.assertEqual(len(detections), 0)
 
+    def test_detect_objects_batch_dummy(self):
+        """Test batched detection returns one result list per frame."""
+        batch = self.system.detect_objects_batch([self.dummy_frame, self.dummy_frame.copy()])
+        self.assertEqual(len(batch), 2)
+        for detections in batch:
+            self.assertIsInstance(detections, list)
+            self.assertEqual(len(detections), 0)
+
+        results = self.system.process_batch([self.dummy_frame])
+        self.assertEqual(len(results), 1)
+
     def test_process_frame_and_draw_no_crash(self):
         """Test that processing and drawing on a frame does not crash."""
         detections, faces = self.system.process_frame(self.dummy_frame)
@@ -59,5 +92,547 @@ class TestCCTVSystem(unittest.TestCase):
         self.assertEqual(self.system.alerts[0]['event'], 'Critical Object')
         self.system.detect_objects = original_detect # restore original method
 
+    def test_tracking_keeps_ids_across_frames(self):
+        """Test that a person moving slightly keeps the same track id."""
+        original_detect = self.system.detect_objects
+        track_ids = []
+        for offset in range(3):
+            self.system.detect_objects = lambda frame, o=offset: [{
+                'label': 'person',
+                'confidence': 0.9,
+                'bbox': [100 + o, 100, 160 + o, 250]
+            }]
+            detections, _ = self.system.process_frame(self.dummy_frame)
+            track_ids.append(detections[0]['track_id'])
+        self.system.detect_objects = original_detect
+
+        self.assertEqual(len(set(track_ids)), 1)
+
+    def test_untracked_batch_skips_tracker(self):
+        """Test that still images processed without tracking never share track ids."""
+        original_detect = self.system.detect_objects_batch
+        self.system.detect_objects_batch = lambda frames: [[{
+            'label': 'person',
+            'confidence': 0.9,
+            'bbox': [100, 100, 160, 250]
+        }] for _ in frames]
+        results = self.system.process_batch([self.dummy_frame, self.dummy_frame], track=False)
+        self.system.detect_objects_batch = original_detect
+
+        self.assertEqual(len(self.system.tracker.tracks), 0)
+        self.assertTrue(all('track_id' not in det for detections, _ in results for det in detections))
+
+    def test_repeated_alerts_coalesce(self):
+        """Test that a critical object seen on every frame raises one incident."""
+        original_detect = self.system.detect_objects
+        self.system.detect_objects = lambda frame: [{
+            'label': 'knife',
+            'confidence': 0.9,
+            'bbox': [300, 200, 340, 260]
+        }]
+        self.system.alerts.clear()
+        for _ in range(5):
+            self.system.process_frame(self.dummy_frame)
+        self.system.detect_objects = original_detect
+
+        critical = [alert for alert in self.system.alerts if alert['event'] == 'Critical Object']
+        self.assertEqual(len(critical), 1)
+        self.assertEqual(critical[0]['occurrences'], 5)
+
+    def test_scenario_pipeline_runs_zone_stages_only(self):
+        """Test that a classroom camera has no fence stages and skips stages without people."""
+        pipeline = ScenarioPipeline(1, zone=config.Zone.CLASSROOM)
+        self.assertNotIn('fence_damage', [stage.name for stage in pipeline.stages])
+
+        alerts = pipeline.process(self.dummy_frame, [{'label': 'chair', 'confidence': 0.9, 'bbox': [0, 0, 40, 40]}])
+        self.assertEqual(alerts, [])
+        for stage in pipeline.stats()['stages'].values():
+            self.assertEqual(stage['runs'], 0)
+            self.assertEqual(stage['skipped'], 1)
+
+    def test_scenario_pipeline_reuses_track_identities(self):
+        """Test that tracked persons take their type from the tracker and only untracked ones are classified."""
+        pipeline = ScenarioPipeline(1, zone=config.Zone.CLASSROOM)
+        classifier = pipeline.child_safety.person_classifier
+        classified = []
+        classify_persons = classifier.classify_persons
+        classifier.classify_persons = lambda frame, bboxes: classified.extend(bboxes) or classify_persons(frame, bboxes)
+        teacher = {'label': 'person', 'confidence': 0.9, 'bbox': [100, 200, 160, 400], 'track_id': 7}
+        child = {'label': 'person', 'confidence': 0.9, 'bbox': [200, 320, 230, 400]}
+
+        as_staff = pipeline.process(self.dummy_frame, [teacher, child], now=0.0,
+                                    identities={7: {'name': "Ms. Lee", 'person_type': 'staff'}})
+        as_adult = pipeline.process(self.dummy_frame, [teacher, child], now=1.0,
+                                    identities={7: {'name': "Unknown", 'person_type': None}})
+
+        self.assertEqual(classified, [child['bbox'], child['bbox']])
+        self.assertEqual(as_staff, [])
+        self.assertEqual([alert['scenario'] for alert in as_adult], ['unsupervised_child'])
+        self.assertIsNone(as_adult[0]['track_id'])
+
+    def test_climbing_hazard_uses_fence_lines(self):
+        """Test that only climbing aids within CLIMBING_HAZARD_DISTANCE of a configured fence alert."""
+        width, height = config.CAMERA_RESOLUTIONS.get(0, config.SIMULATOR_RESOLUTION)
+        original_lines = config.FENCE_LINES
+        config.FENCE_LINES = {0: [[(0, height // 2), (width, height // 2)]]}
+        try:
+            frame = np.zeros((height, width, 3), dtype=np.uint8)
+            y = height // 2 + config.CLIMBING_HAZARD_DISTANCE // 2
+            objects = [
+                {'label': 'chair', 'confidence': 0.8, 'bbox': [100, y - 10, 120, y + 10]},
+                {'label': 'chair', 'confidence': 0.8, 'bbox': [200, 10, 220, 30]},
+            ]
+            alerts = FenceSafetyScenario().check_climbing_hazard(frame, objects, camera_id=0)
+        finally:
+            config.FENCE_LINES = original_lines
+
+        self.assertEqual(len(alerts), 1)
+        self.assertEqual(alerts[0]['bbox'], objects[0]['bbox'])
+        self.assertEqual(alerts[0]['severity'], config.AlertSeverity.HIGH.value)
+
+        incident = self.system.trigger_alert(alerts[0]['event'], alerts[0]['details'], scenario=alerts[0]['scenario'],
+                                             severity=alerts[0]['severity'], subject='climb')
+        self.assertEqual(incident['severity'], 'high')
+        self.assertEqual(self.system.alert_throttle.cooldowns[incident['severity']],
+                         config.ALERT_COOLDOWN_SECONDS[config.AlertSeverity.HIGH])
+
+    def test_emergency_route_blockage_must_persist(self):
+        """Test that an obstruction over a configured route only alerts after ROUTE_BLOCK_PERSIST_SECONDS."""
+        width, height = config.CAMERA_RESOLUTIONS.get(0, config.SIMULATOR_RESOLUTION)
+        original_routes = config.EMERGENCY_ROUTES
+        config.EMERGENCY_ROUTES = {0: [[(0, 0), (100, 0), (100, height), (0, height)]]}
+        try:
+            frame = np.zeros((height, width, 3), dtype=np.uint8)
+            crate = [{'label': 'crate', 'confidence': 0.8, 'bbox': [0, 0, 100, height // 2]}]
+            scenario = ChildSafetyScenario()
+            persist = config.ROUTE_BLOCK_PERSIST_SECONDS
+            early = scenario.check_emergency_route(frame, crate, camera_id=0, now=0.0)
+            step = config.ROUTE_BLOCK_CLEAR_SECONDS / 2
+            now = step
+            while now < persist:
+                scenario.check_emergency_route(frame, crate, camera_id=0, now=now)
+                now += step
+            late = scenario.check_emergency_route(frame, crate, camera_id=0, now=persist)
+        finally:
+            config.EMERGENCY_ROUTES = original_routes
+
+        self.assertEqual(early, [])
+        self.assertEqual(len(late), 1)
+        self.assertEqual(late[0]['scenario'], 'emergency_route_blocked')
+
+    def test_subzone_scenarios(self):
+        """Test that a hallway sub-zone in a classroom camera flags children only inside it."""
+        width, height = config.CAMERA_RESOLUTIONS.get(1, config.SIMULATOR_RESOLUTION)
+        original_subzones = config.CAMERA_SUBZONES
+        door = [(width - 100, 0), (width, 0), (width, height), (width - 100, height)]
+        config.CAMERA_SUBZONES = {1: {'hall_door': (config.Zone.HALLWAY, door)}}
+        try:
+            pipeline = ScenarioPipeline(1, zone=config.Zone.CLASSROOM)
+            frame = np.zeros((height, width, 3), dtype=np.uint8)
+            children = [
+                {'label': 'person', 'confidence': 0.9, 'bbox': [width - 60, 200, width - 30, 280]},
+                {'label': 'person', 'confidence': 0.9, 'bbox': [100, 200, 130, 280]},
+            ]
+            alerts = pipeline.process(frame, children)
+        finally:
+            config.CAMERA_SUBZONES = original_subzones
+
+        restricted = [alert for alert in alerts if alert['scenario'] == 'restricted_area_entry']
+        self.assertEqual(len(restricted), 1)
+        self.assertEqual(restricted[0]['subzone'], 'hall_door')
+        self.assertEqual(restricted[0]['bbox'], children[0]['bbox'])
+
+    def test_staff_in_other_subzone_supervise(self):
+        """Test that staff in a sub-zone without the supervision check still supervise nearby children."""
+        width, height = config.CAMERA_RESOLUTIONS.get(1, config.SIMULATOR_RESOLUTION)
+        original_subzones = config.CAMERA_SUBZONES
+        door = [(width - 100, 0), (width, 0), (width, height), (width - 100, height)]
+        config.CAMERA_SUBZONES = {1: {'hall_door': (config.Zone.HALLWAY, door)}}
+        try:
+            pipeline = ScenarioPipeline(1, zone=config.Zone.CLASSROOM)
+            frame = np.zeros((height, width, 3), dtype=np.uint8)
+            child = {'label': 'person', 'confidence': 0.9, 'bbox': [width - 200, 300, width - 170, 380]}
+            staff = {'label': 'person', 'confidence': 0.9, 'bbox': [width - 80, 150, width - 20, 380], 'track_id': 3}
+            alone = pipeline.process(frame, [child], now=0.0)
+            supervised = pipeline.process(frame, [child, staff], now=1.0,
+                                          identities={3: {'name': "Ms. Lee", 'person_type': 'staff'}})
+        finally:
+            config.CAMERA_SUBZONES = original_subzones
+
+        self.assertEqual([alert['scenario'] for alert in alone], ['unsupervised_child'])
+        self.assertEqual(supervised, [])
+
+    def test_supervision_uses_distance_and_persists(self):
+        """Test that a child far from staff only alerts once unsupervised for a sustained time."""
+        scenario = ChildSafetyScenario()
+        child = {'person_type': 'child', 'confidence': 0.9, 'bbox': [10, 300, 40, 400], 'track_id': 1}
+        far_staff = {'person_type': 'staff', 'confidence': 0.9,
+                     'bbox': [10 + 2 * config.SUPERVISION_RADIUS, 200, 70 + 2 * config.SUPERVISION_RADIUS, 400]}
+        frame = np.zeros((480, 2 * config.SUPERVISION_RADIUS + 100, 3), dtype=np.uint8)
+
+        first = scenario.check_unsupervised_child(frame, [child, far_staff], camera_id=0, now=0.0)
+        sustained = []
+        for step in range(1, 11):
+            sustained = scenario.check_unsupervised_child(frame, [child, far_staff], camera_id=0,
+                                                          now=step * config.SUPERVISION_TIME_CONSTANT)
+        self.assertEqual(first, [])
+        self.assertEqual(len(sustained), 1)
+
+    def test_onnx_postprocess_nms(self):
+        """Test that ONNX head decoding suppresses overlapping boxes per class and undoes the letterbox."""
+        output = np.zeros((4 + 2, 4), dtype=np.float32)
+        output[:, 0] = [100, 100, 40, 40, 0.9, 0.0]   # class 0
+        output[:, 1] = [102, 100, 40, 40, 0.8, 0.0]   # class 0, overlaps the first
+        output[:, 2] = [100, 100, 40, 40, 0.0, 0.7]   # class 1, same place
+        output[:, 3] = [300, 300, 40, 40, 0.1, 0.0]   # below the threshold
+        boxes, conf, cls = postprocess(output, (0.5, (0, 80)), (480, 640), conf=0.25, iou=0.45)
+
+        self.assertEqual(cls.tolist(), [0, 1])
+        np.testing.assert_allclose(conf, [0.9, 0.7], rtol=1e-6)
+        np.testing.assert_allclose(boxes[0], [160, 0, 240, 80])
+
+    def _face_roster(self, index, count=300):
+        rng = np.random.default_rng(1)
+        encodings = rng.normal(0, 0.5, (count, 128)).astype(np.float32)
+        for i, encoding in enumerate(encodings):
+            index.add(encoding, f"person_{i}", 'staff' if i % 2 else 'child')
+        return encodings, rng
+
+    def test_face_index_exact_matching(self):
+        """Test that noisy known encodings match their own name and far queries match nothing."""
+        index = FaceIndex(tolerance=0.6)
+        encodings, rng = self._face_roster(index)
+        queries = encodings[::25] + rng.normal(0, 0.01, (len(encodings[::25]), 128))
+        matches = index.match(list(queries))
+
+        self.assertEqual([m['name'] for m in matches], [f"person_{i}" for i in range(0, 300, 25)])
+        self.assertEqual(matches[1]['person_type'], 'staff')  # person_25
+        self.assertEqual(index.match([np.full(128, 10.0)]), [None])
+
+    def test_face_index_partitioned_matching(self):
+        """Test that the partitioned search finds the same names as the exact search."""
+        index = FaceIndex(tolerance=0.6, num_partitions=8, num_probes=2, partition_threshold=100)
+        encodings, rng = self._face_roster(index)
+        queries = encodings[::25] + rng.normal(0, 0.01, (len(encodings[::25]), 128))
+        matches = index.match(list(queries))
+
+        self.assertIsNotNone(index._centroids)
+        self.assertEqual([m['name'] for m in matches], [f"person_{i}" for i in range(0, 300, 25)])
+        self.assertEqual(index.match([np.full(128, 10.0)]), [None])
+
+    def test_face_index_picks_closest_across_staff_and_children(self):
+        """Test that a face within tolerance of both a staff member and a child resolves to the closer one."""
+        index = FaceIndex(tolerance=0.6)
+        staff, child = np.zeros(128, dtype=np.float32), np.zeros(128, dtype=np.float32)
+        child[0] = 0.5
+        index.add(staff, "teacher", 'staff')
+        index.add(child, "pupil", 'child')
+        query = np.zeros(128, dtype=np.float32)
+        query[0] = 0.4
+
+        match = index.match([query])[0]
+        self.assertEqual((match['name'], match['person_type']), ("pupil", 'child'))
+        self.assertAlmostEqual(match['distance'], 0.1, places=5)
+
+    def test_face_cache_retries_unreadable_images(self):
+        """Test that read errors are retried on the next load while "no face" results stay cached."""
+        encoding = np.ones(128, dtype=np.float32)
+        results = {'face.jpg': (True, encoding), 'blank.jpg': (True, None), 'broken.jpg': (False, None)}
+        encode = mock.Mock(side_effect=lambda path: results[os.path.basename(path)])
+        with tempfile.TemporaryDirectory() as directory:
+            for filename in results:
+                open(os.path.join(directory, filename), 'wb').close()
+            with mock.patch.object(face_cache, 'face_recognition', True), \
+                    mock.patch.object(face_cache, '_encode_image', encode):
+                first = face_cache.load_face_encodings(directory, workers=1)
+                encode.reset_mock()
+                second = face_cache.load_face_encodings(directory, workers=1)
+
+            self.assertEqual([name for name, _ in first], ['face'])
+            self.assertEqual([name for name, _ in second], ['face'])
+            encode.assert_called_once_with(os.path.join(directory, 'broken.jpg'))
+            self.assertEqual(sorted(f for f in os.listdir(directory) if f.endswith('.tmp')), [])
+
+    def test_motion_gate_skips_static_frames(self):
+        """Test that unchanged frames are gated until motion or the refresh interval forces inference."""
+        gate = MotionGate(refresh_interval=5.0)
+        moved = self.dummy_frame.copy()
+        cv2.rectangle(moved, (200, 200), (300, 300), (255, 255, 255), -1)
+
+        decisions = [
+            gate.should_infer(self.dummy_frame, now=0.0),
+            gate.should_infer(self.dummy_frame, now=1.0),
+            gate.should_infer(self.dummy_frame, now=2.0),
+            gate.should_infer(moved, now=3.0),
+            gate.should_infer(moved, now=4.0),
+            gate.should_infer(moved, now=8.0),
+        ]
+        self.assertEqual(decisions, [True, False, False, True, False, True])
+        self.assertEqual(gate.stats(), {'inferred_frames': 3, 'gated_frames': 3, 'gated_ratio': 0.5})
+
+    def test_motion_gate_reuses_last_results(self):
+        """Test that process_frame does not run detection on a gated frame."""
+        calls = []
+        system = CCTVSystem(motion_gate=MotionGate())
+        system.detect_objects = lambda frame: calls.append(frame) or []
+        for _ in range(3):
+            system.process_frame(self.dummy_frame)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(system.motion_gate.stats()['gated_frames'], 2)
+
+    def test_alert_pages_have_no_gaps_or_duplicates(self):
+        """Test that keyset pages cover every alert exactly once when timestamps tie."""
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        db = sessionmaker(bind=engine)()
+        base = datetime.datetime(2024, 1, 1, 12, 0, 0)
+        db.add_all([
+            Alert(id=i, timestamp=base + datetime.timedelta(minutes=i // 4), camera="CAM-01",
+                  scenario="unsupervised_child", status="Review")
+            for i in range(1, 24)
+        ])
+        db.commit()
+
+        seen, cursor, pages = [], None, 0
+        while True:
+            alerts, cursor = query_alerts(db, limit=5, cursor=cursor)
+            seen.extend(alert['id'] for alert in alerts)
+            pages += 1
+            if cursor is None:
+                break
+        db.close()
+
+        self.assertEqual(pages, 5)
+        self.assertEqual(seen, sorted(range(1, 24), key=lambda i: (i // 4, i), reverse=True))
+
+    def test_alert_query_rejects_malformed_cursor(self):
+        """Test that a malformed cursor raises ValueError, which /alerts turns into a 400."""
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        db = sessionmaker(bind=engine)()
+        for cursor in ["not-a-cursor", encode_cursor(datetime.datetime(2024, 1, 1), 1)[:-4]]:
+            with self.assertRaises(ValueError):
+                query_alerts(db, cursor=cursor)
+        db.close()
+
+    def test_alert_store_evicts_oldest_and_keeps_counters(self):
+        """Test that the ring buffer evicts the oldest alerts and the breakdowns only count what is kept."""
+        store = AlertStore(capacity=3)
+        for severity, camera in [('critical', 'CAM-01'), ('high', 'CAM-01'), ('high', 'CAM-02'),
+                                 ('low', 'CAM-02'), ('critical', 'CAM-03')]:
+            store.add({'severity': severity, 'status': 'active', 'camera': camera, 'zone_key': 'classroom'})
+
+        self.assertEqual(len(store), 3)
+        self.assertEqual(store.total_recorded, 5)
+        self.assertIsNone(store.get(1))
+        self.assertIsNone(store.get(2))
+        self.assertEqual([alert['id'] for alert in store.recent(10)], [5, 4, 3])
+        self.assertEqual(store.breakdown('camera'), {'CAM-02': 2, 'CAM-03': 1})
+        self.assertEqual(store.breakdown('zone_key'), {'classroom': 3})
+
+        store.update_status(4, 'resolved')
+        stats = store.get_stats()
+        self.assertEqual((stats['critical'], stats['high'], stats['low'], stats['medium']), (1, 1, 1, 0))
+        self.assertEqual((stats['active'], stats['resolved']), (2, 1))
+        self.assertIsNone(store.update_status(1, 'resolved'))
+
+        store.continue_after(100)
+        self.assertEqual(store.add({'severity': 'low'})['id'], 101)
+        self.assertEqual(store.get_stats()['resolved'], 1)  # Evicting alert 3 left alert 4's status alone
+
+    def _writer_engine(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(engine)
+        return engine
+
+    @staticmethod
+    def _stored_alerts(engine):
+        with engine.connect() as conn:
+            return conn.execute(select(func.count()).select_from(Alert)).scalar()
+
+    def test_alert_writer_batches_inserts(self):
+        """Test that queued alerts are written in batches of at most batch_size."""
+        engine = self._writer_engine()
+
+        async def run():
+            writer = AlertWriter(batch_size=3, flush_interval=0.05)
+            for i in range(1, 8):
+                writer.enqueue({'id': i, 'camera': 'CAM-01', 'severity': 'high', 'status': 'active'})
+            writer.start()
+            await asyncio.sleep(0.3)
+            stats = writer.stats()
+            await writer.stop()
+            return stats
+
+        with mock.patch.object(alert_persistence, 'engine', engine):
+            stats = asyncio.run(run())
+        self.assertEqual((stats['written'], stats['batches'], stats['queue_depth']), (7, 3, 0))
+        self.assertEqual(self._stored_alerts(engine), 7)
+
+    def test_alert_writer_flushes_on_stop(self):
+        """Test that stop() writes a partly collected batch and everything still queued."""
+        engine = self._writer_engine()
+
+        async def run():
+            writer = AlertWriter(batch_size=100, flush_interval=60)
+            writer.start()
+            for i in range(1, 6):
+                writer.enqueue({'id': i, 'camera': 'CAM-01', 'status': 'active'})
+            await asyncio.sleep(0.05)  # The flush task is now holding a partial batch
+            writer.enqueue_update({'id': 1, 'status': 'resolved', 'occurrences': 4})
+            await writer.stop()
+            return writer.stats()
+
+        with mock.patch.object(alert_persistence, 'engine', engine):
+            stats = asyncio.run(run())
+        self.assertEqual(stats['written'], 6)
+        self.assertEqual(self._stored_alerts(engine), 5)
+        with engine.connect() as conn:
+            self.assertEqual(conn.execute(select(Alert.status, Alert.occurrences).where(Alert.id == 1)).one(),
+                             ('resolved', 4))
+
+    def test_heatmap_decays_lazily(self):
+        """Test that activity fades by decay_rate per second without touching the grid on update."""
+        heatmap = HeatmapAccumulator(160, 160, cell_size=8, decay_rate=0.5, sigma=1.0)
+        heatmap.add_points([(80, 80)], now=0.0)
+        self.assertAlmostEqual(float(heatmap.snapshot(now=0.0).sum()), 1.0, places=4)
+        self.assertAlmostEqual(float(heatmap.snapshot(now=1.0).sum()), 0.5, places=4)
+
+        heatmap.add_points([(40, 40)], now=1.0)
+        self.assertEqual(heatmap._ref_time, 0.0)  # Not rebased, the new splat was weighted up instead
+        self.assertAlmostEqual(float(heatmap.snapshot(now=1.0).sum()), 1.5, places=4)
+        self.assertAlmostEqual(float(heatmap.snapshot(now=2.0).sum()), 0.75, places=4)
+        self.assertEqual(heatmap.snapshot(now=1.0)[5, 5], heatmap.snapshot(now=1.0).max())
+
+    def test_heatmap_rebases_large_weights(self):
+        """Test that the grid is rebased once new splats would be weighted up past 1e6."""
+        heatmap = HeatmapAccumulator(160, 160, cell_size=8, decay_rate=0.5, sigma=1.0)
+        heatmap.add_points([(80, 80)], now=0.0)
+        heatmap.add_points([(80, 80)], now=19.0)  # 2^19 < 1e6
+        self.assertEqual(heatmap._ref_time, 0.0)
+        heatmap.add_points([(80, 80)], now=25.0)  # 2^25 > 1e6
+        self.assertEqual(heatmap._ref_time, 25.0)
+        self.assertLess(float(heatmap._grid.max()), 2.0)
+
+        expected = 0.5 ** 30 + 0.5 ** 11 + 0.5 ** 5
+        self.assertAlmostEqual(float(heatmap.snapshot(now=30.0).sum()), expected, places=6)
+
+    class _StalledWebSocket:
+        """WebSocket whose sends never complete, like a client that stopped reading."""
+        client = None
+
+        def __init__(self):
+            self.close_code = None
+
+        async def accept(self):
+            pass
+
+        async def send_text(self, text):
+            await asyncio.Event().wait()
+
+        async def close(self, code=1000):
+            self.close_code = code
+
+    def _overflow(self, policy):
+        """Broadcast five messages to a stalled client with room for two."""
+        async def run():
+            manager = ConnectionManager(queue_size=2, overflow_policy=policy)
+            websocket = self._StalledWebSocket()
+            await manager.connect(websocket)
+            client = manager.clients[websocket]
+            for i in range(5):
+                manager.broadcast({'n': i})
+            queued = [text for _, text in client.queue]
+            await asyncio.sleep(0.01)
+            connected = websocket in manager.clients
+            for other in list(manager.clients):
+                manager.disconnect(other)
+            return manager, client, websocket, queued, connected
+        return asyncio.run(run())
+
+    def test_websocket_drop_oldest_policy(self):
+        """Test that a full client queue loses its oldest messages and the client stays connected."""
+        manager, client, websocket, queued, connected = self._overflow("drop_oldest")
+        self.assertEqual(queued, ['{"n":3}', '{"n":4}'])
+        self.assertEqual(client.dropped, 3)
+        self.assertTrue(connected)
+        self.assertEqual(manager.disconnected_slow, 0)
+
+    def test_websocket_disconnect_policy(self):
+        """Test that a full client queue disconnects the client and closes its socket."""
+        manager, client, websocket, queued, connected = self._overflow("disconnect")
+        self.assertFalse(connected)
+        self.assertEqual(manager.disconnected_slow, 1)
+        self.assertEqual(websocket.close_code, 1013)
+        self.assertEqual(len(manager.subscriptions), 0)
+
+    def test_subscription_index_matching(self):
+        """Test that alerts reach exactly the subscribers whose zone, camera and severity filters accept them."""
+        index = SubscriptionIndex()
+        index.set('everything', parse_filters({}))
+        index.set('classroom', parse_filters({'zones': ['classroom']}))
+        index.set('urgent', parse_filters({'min_severity': 'high'}))
+        index.set('urgent_cam2', parse_filters({'cameras': 'CAM-02', 'zones': ['classroom', 'hallway'],
+                                                'min_severity': 'critical'}))
+
+        def match(**alert):
+            return sorted(index.match(alert))
+
+        self.assertEqual(match(zone_key='classroom', camera='CAM-01', severity='low'), ['classroom', 'everything'])
+        self.assertEqual(match(zone_key='hallway', camera='CAM-02', severity='high'), ['everything', 'urgent'])
+        self.assertEqual(match(zone_key='hallway', camera='CAM-02', severity='critical'),
+                         ['everything', 'urgent', 'urgent_cam2'])
+        self.assertEqual(match(zone_key='classroom', camera='CAM-02', severity='critical'),
+                         ['classroom', 'everything', 'urgent', 'urgent_cam2'])
+
+        index.set('classroom', parse_filters({'zones': ['entrance']}))  # Resubscribing replaces the filters
+        index.remove('everything')
+        self.assertEqual(match(zone_key='classroom', camera='CAM-01', severity='low'), [])
+        self.assertEqual(match(zone_key='entrance', camera='CAM-01', severity='medium'), ['classroom'])
+
+        for bad in [{'zones': ['moon']}, {'min_severity': 'HIGH'}, {'min_severity': 3}]:
+            with self.assertRaises(ValueError):
+                parse_filters(bad)
+
+    def test_activity_rollup_counts_late_positions(self):
+        """Test that positions written after their minute was rolled up are still counted, and only then pruned."""
+        engine = self._writer_engine()
+        minute = datetime.datetime(2024, 1, 1, 12, 0)
+        with mock.patch.object(activity_recorder, 'engine', engine):
+            recorder = ActivityRecorder(grid_size=100, retention_hours=1)
+            recorder.add_samples('CAM-01', 'classroom', [(1, 'child', 10, 10), (2, 'child', 20, 20)],
+                                 timestamp=minute + datetime.timedelta(seconds=5))
+            recorder.flush()
+            recorder.rollup()
+            recorder.add_samples('CAM-01', 'classroom', [(3, 'staff', 30, 30)],
+                                 timestamp=minute + datetime.timedelta(seconds=50))
+            recorder.flush()
+            recorder.rollup()
+            recorder.rollup()  # Nothing new
+            recorder.prune(now=minute + datetime.timedelta(hours=2))
+
+            with engine.connect() as conn:
+                counts = conn.execute(
+                    select(ActivityRollup.minute, func.sum(ActivityRollup.count)).group_by(ActivityRollup.minute)
+                ).all()
+                remaining = conn.execute(select(func.count()).select_from(ActivityLog)).scalar()
+        self.assertEqual(counts, [(minute, 3)])
+        self.assertEqual(remaining, 0)
+        self.assertEqual(recorder.stats()['rollup_rows'], 2)
+
+    def test_activity_flush_keeps_batch_on_error(self):
+        """Test that a batch whose insert fails goes back to the buffer in order."""
+        engine = self._writer_engine()
+        recorder = ActivityRecorder(batch_size=2)
+        recorder.add_samples('CAM-01', None, [(i, 'child', i, i) for i in range(3)])
+        with mock.patch.object(activity_recorder, 'engine', create_engine("sqlite://")):  # No tables
+            with self.assertRaises(Exception):
+                recorder.flush()
+        self.assertEqual([row['track_id'] for row in recorder._buffer], [0, 1, 2])
+        with mock.patch.object(activity_recorder, 'engine', engine):
+            recorder.flush()
+        self.assertEqual((recorder.written, recorder.stats()['buffered']), (3, 0))
+
 if __name__ == '__main__':
     unittest.main()